@@ -1,12 +1,12 @@
 import matplotlib
 matplotlib.use('tkagg')
 import matplotlib.pyplot as plt
-import csv
 import json
 import numpy as np
 import pandas as pd
 from math import ceil
-from scipy.spatial.distance import euclidean
+from track_store import load_movement_tracks
+from trajectory import stationary_segments, gather_segments, step_speeds, kinetic_energies
 
 with open('processed_data/video_data.json', 'r') as file:
     data = json.load(file)
@@ -21,43 +21,14 @@ stationary_time = ceil(track_max_age / time_steps)
 stationary_distance = frame_size * 0.01
 
 
-tracks = []
-with open('processed_data/movement_data.csv', 'r') as file:
-    reader = csv.reader(file, delimiter=',')
-    for row in reader:
-        if len(row[3:]) > stationary_time * 2:
-            temp = []
-            data = row[3:]
-            for i in range(0, len(data), 2):
-                temp.append([int(data[i]), int(data[i+1])])
-            tracks.append(temp)
+store = load_movement_tracks()
 
-print("Tracks recorded: " + str(len(tracks)))
+print("Tracks recorded: " + str(len(store.select(min_points=stationary_time + 1))))
 
-useful_tracks = []
-for movement in tracks:
-    check_index = stationary_time
-    start_point = 0
-    track = movement[:check_index]
-    while check_index < len(movement):
-        for i in movement[check_index:]:
-            if euclidean(movement[start_point], i) > stationary_distance:
-                track.append(i)
-                start_point += 1
-                check_index += 1
-            else:
-                start_point += 1
-                check_index += 1
-                break
-        useful_tracks.append(track)
-        track = movement[start_point:check_index]
-
-energies = []
-for movement in useful_tracks:
-    for i in range(len(movement) - 1):
-        speed = round(euclidean(movement[i], movement[i+1]) / time_steps , 2)
-        energy = int(0.5 * speed ** 2)
-        energies.append(energy)
+# Keep the moving segments of the tracks and compute their energy levels
+starts, ends = stationary_segments(store.x, store.y, store.offsets, stationary_time, stationary_distance)
+x, y, offsets = gather_segments(store.x, store.y, starts, ends)
+energies = kinetic_energies(step_speeds(x, y, offsets, time_steps)).tolist()
 
 c = len(energies)
 print()
@@ -0,0 +1,117 @@
+import os
+import json
+import datetime
+import functools
+import dataclasses
+from dataclasses import dataclass
+
+# Entries of VIDEO_CONFIG, the other fields are read from the constant of the same name in config.py
+VIDEO_FIELDS = ("video_cap", "is_cam", "cam_approx_fps", "high_cam", "start_time")
+
+@dataclass(frozen=True)
+class AnalysisConfig:
+	"""Settings of one analysis, passed to the pipeline instead of read from config.py.
+
+	The defaults come from config.py with `from_config`, `load` reads a JSON
+	or YAML file and `override` applies KEY=VALUE pairs from the command line.
+	Field names are the lower case config.py names, the upper case names are
+	accepted as well. The object is immutable so pipelines running at the
+	same time in one process can each keep their own settings.
+	"""
+
+	video_cap: str
+	is_cam: bool
+	cam_approx_fps: int
+	high_cam: bool
+	start_time: datetime.datetime
+	show_processing_output: bool
+	show_detect: bool
+	data_record: bool
+	data_record_rate: int
+	re_check: bool
+	re_start_time: datetime.time
+	re_end_time: datetime.time
+	sd_check: bool
+	show_violation_count: bool
+	show_tracking_id: bool
+	social_distance: float
+	abnormal_check: bool
+	abnormal_min_people: int
+	abnormal_energy: float
+	abnormal_thresh: float
+	min_conf: float
+	nms_thresh: float
+	frame_size: int
+	track_max_age: float
+
+	@classmethod
+	def from_config(cls, module=None):
+		if module is None:
+			import config as module
+		values = {}
+		for field in dataclasses.fields(cls):
+			if field.name in VIDEO_FIELDS:
+				values[field.name] = module.VIDEO_CONFIG[field.name.upper()]
+			else:
+				values[field.name] = getattr(module, field.name.upper())
+		return cls(**values)
+
+	@classmethod
+	def load(cls, path, base=None):
+		"""Settings of a JSON or YAML file, the missing ones are taken from `base` or config.py"""
+		with open(path, 'r') as settings_file:
+			if os.path.splitext(path)[1].lower() in ('.yaml', '.yml'):
+				import yaml
+				values = yaml.safe_load(settings_file)
+			else:
+				values = json.load(settings_file)
+		return (base or default_config()).replace(**(values or {}))
+
+	def replace(self, **changes):
+		# A copy with some settings changed, string values are converted to the type of the setting
+		values = {}
+		for name, value in changes.items():
+			key = name.lower()
+			if key not in self.__dataclass_fields__:
+				raise ValueError("Unknown analysis setting: {}".format(name))
+			values[key] = _convert(getattr(self, key), value)
+		return dataclasses.replace(self, **values)
+
+	def override(self, assignments):
+		# Apply "KEY=VALUE" strings, e.g. the --set options of main.py
+		changes = {}
+		for assignment in assignments:
+			name, separator, value = assignment.partition('=')
+			if not separator:
+				raise ValueError("Expected KEY=VALUE, got {}".format(assignment))
+			changes[name.strip()] = value.strip()
+		return self.replace(**changes)
+
+	def as_dict(self):
+		return dataclasses.asdict(self)
+
+def _convert(current, value):
+	if not isinstance(value, str) or isinstance(current, str) or current is None:
+		if isinstance(current, datetime.datetime) and isinstance(value, datetime.date) \
+			and not isinstance(value, datetime.datetime):
+			return datetime.datetime.combine(value, datetime.time())
+		return value
+	if isinstance(current, bool):
+		if value.lower() in ('1', 'true', 'yes', 'on'):
+			return True
+		if value.lower() in ('0', 'false', 'no', 'off'):
+			return False
+		raise ValueError("Expected a boolean, got {}".format(value))
+	if isinstance(current, datetime.datetime):
+		return datetime.datetime.fromisoformat(value)
+	if isinstance(current, datetime.time):
+		return datetime.time.fromisoformat(value)
+	try:
+		return int(value)
+	except ValueError:
+		return float(value)
+
+@functools.lru_cache(maxsize=None)
+def default_config():
+	# Settings of config.py, read once per process
+	return AnalysisConfig.from_config()
@@ -0,0 +1,197 @@
+import math
+import queue
+import traceback
+import multiprocessing
+from multiprocessing import shared_memory
+from config import FRAME_SIZE, YOLO_CONFIG
+
+# Slots of the frame channel, one being read, one holding the newest frame and one being written
+FRAME_SLOTS = 3
+
+class FrameChannel:
+	"""Latest annotated frame shared between the analysis worker and the GUI.
+
+	Frames are written to shared memory slots in turn. The writer never
+	waits for the reader, it overwrites the slot that is neither the newest
+	frame nor being read, so a GUI falling behind skips to the newest frame
+	and a frame is never read while it is being written. A sequence counter
+	tells the reader whether a newer frame arrived since its last `take`.
+	"""
+
+	def __init__(self, block, shapes, state):
+		self.block = block
+		self.shapes = shapes
+		# Newest slot, slot being read and sequence number of the newest frame
+		self.state = state
+		self.slot_size = block.size // FRAME_SLOTS
+		self.taken = 0
+
+	@classmethod
+	def create(cls, context, max_bytes):
+		block = shared_memory.SharedMemory(create=True, size=max_bytes * FRAME_SLOTS)
+		return cls(block, context.Array('i', 3 * FRAME_SLOTS, lock=False), context.Array('i', [-1, -1, 0]))
+
+	def handles(self):
+		return self.block.name, self.shapes, self.state
+
+	@classmethod
+	def attach(cls, handles):
+		name, shapes, state = handles
+		return cls(shared_memory.SharedMemory(name=name), shapes, state)
+
+	def _slot(self, slot, shape):
+		import numpy as np
+		return np.ndarray(shape, dtype=np.uint8, buffer=self.block.buf, offset=slot * self.slot_size)
+
+	def publish(self, frame):
+		# Worker side, write the frame to a free slot and make it the newest one
+		if frame.nbytes > self.slot_size:
+			import cv2
+			scale = math.sqrt(self.slot_size / frame.nbytes)
+			frame = cv2.resize(frame, (int(frame.shape[1] * scale), int(frame.shape[0] * scale)))
+		with self.state.get_lock():
+			newest, reading = self.state[0], self.state[1]
+		slot = next(index for index in range(FRAME_SLOTS) if index not in (newest, reading))
+		self._slot(slot, frame.shape)[:] = frame
+		self.shapes[slot * 3:slot * 3 + 3] = frame.shape
+		with self.state.get_lock():
+			self.state[0] = slot
+			self.state[2] += 1
+		return True
+
+	def take(self):
+		# Reader side, a copy of the newest frame or None when there is no new one
+		with self.state.get_lock():
+			sequence = self.state[2]
+			if sequence == self.taken:
+				return None
+			slot = self.state[0]
+			self.state[1] = slot
+		frame = self._slot(slot, tuple(self.shapes[slot * 3:slot * 3 + 3])).copy()
+		with self.state.get_lock():
+			self.state[1] = -1
+		self.taken = sequence
+		return frame
+
+	def close(self, unlink=False):
+		self.block.close()
+		if unlink:
+			self.block.unlink()
+
+def _run_on_server(request, channel, events, stop):
+	# Forward a request to the model server, decoding the frames it streams back
+	from model_server import submit, decode_frame
+	jobs = submit(request["video"], resume=request.get("resume", False), frames=True, settings=request.get("settings"))
+	try:
+		for kind, value in jobs:
+			if kind == "frame":
+				channel.publish(decode_frame(value))
+			elif kind == "progress":
+				events.put(("progress", value))
+			elif kind == "done":
+				events.put(("done", {"video_data": value, "stopped": stop.is_set()}))
+			else:
+				events.put((kind, value))
+			if stop.is_set() and kind not in ("done", "error"):
+				# Closing the connection stops the job on the server
+				events.put(("done", {"video_data": None, "stopped": True}))
+				break
+	finally:
+		jobs.close()
+
+def _engine_worker(requests, events, stop, channel_handles):
+	channel = FrameChannel.attach(channel_handles)
+	# A running model server already has warm models, otherwise load them here once
+	from model_server import server_available
+	models = None
+	if not server_available():
+		# The models and TensorFlow are only imported in the worker process
+		try:
+			from models import load_detector, load_encoder
+			from analysis_run import analyze_video
+			net, ln = load_detector(YOLO_CONFIG["CONFIG_PATH"], YOLO_CONFIG["WEIGHTS_PATH"])
+			models = (net, ln, load_encoder())
+		except Exception:
+			events.put(("error", traceback.format_exc()))
+			channel.close()
+			return
+	events.put(("ready", None))
+
+	def on_frame(frame, stats):
+		channel.publish(frame)
+		events.put(("progress", stats))
+		return not stop.is_set()
+
+	while True:
+		request = requests.get()
+		if request is None:
+			break
+		try:
+			if models is None:
+				_run_on_server(request, channel, events, stop)
+				continue
+			video_data = analyze_video(*models, request["video"], resume=request.get("resume", False),
+				frame_callback=on_frame, settings=request.get("settings"))
+			events.put(("done", {"video_data": video_data, "stopped": stop.is_set()}))
+		except Exception:
+			events.put(("error", traceback.format_exc()))
+	channel.close()
+
+class AnalysisEngine:
+	"""Analysis worker process hosting the detection models for the GUI.
+
+	The models are loaded once when the worker starts and reused by every
+	`start`, or the videos are handed to the model server when one runs.
+	While a video is analysed the worker sends ("progress", stats) events
+	with the real frame count and crowd statistics, and "done" or
+	"error" at the end, which `poll` returns. The annotated frames are read
+	with `frame` from a shared memory channel.
+	"""
+
+	def __init__(self, frame_size=FRAME_SIZE):
+		# Spawn a fresh interpreter instead of forking the GUI and its threads
+		context = multiprocessing.get_context('spawn')
+		# Room for frames up to twice as high as wide
+		self.channel = FrameChannel.create(context, frame_size * frame_size * 2 * 3)
+		self.requests = context.Queue()
+		self.events = context.Queue()
+		self.stop_event = context.Event()
+		self.process = context.Process(target=_engine_worker, daemon=True,
+			args=(self.requests, self.events, self.stop_event, self.channel.handles()))
+		self.process.start()
+
+	def is_alive(self):
+		return self.process.is_alive()
+
+	def start(self, video_path, resume=False, settings=None):
+		# `settings` is the AnalysisConfig of this video, config.py when None
+		self.stop_event.clear()
+		self.channel.take()
+		self.requests.put({"video": video_path, "resume": resume, "settings": settings})
+
+	def stop(self):
+		# The worker saves the results of the frames analysed so far and sends "done"
+		self.stop_event.set()
+
+	def poll(self, timeout=0.0):
+		"""Events sent since the last poll, waiting up to `timeout` seconds for the first one"""
+		events = []
+		try:
+			events.append(self.events.get(timeout=timeout) if timeout else self.events.get_nowait())
+			while True:
+				events.append(self.events.get_nowait())
+		except queue.Empty:
+			pass
+		return events
+
+	def frame(self):
+		return self.channel.take()
+
+	def close(self, timeout=5.0):
+		self.stop_event.set()
+		self.requests.put(None)
+		self.process.join(timeout)
+		if self.process.is_alive():
+			self.process.terminate()
+			self.process.join()
+		self.channel.close(unlink=True)
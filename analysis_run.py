@@ -0,0 +1,138 @@
+import datetime
+import time
+import cv2
+from config import CHECKPOINT_INTERVAL, BUFFERED_WRITERS, \
+	ANALYTICS_DB, ANALYTICS_DB_PATH, CAMERA_NAME, PARTITION_PERIOD, PARTITION_COMPRESSION, \
+	LIVE_MAP, LIVE_MAP_PATH, LIVE_MAP_HALF_LIFE, LIVE_MAP_INTERVAL, ENERGY_CALIBRATION
+from video_process import video_process
+from models import tracker_for
+from data_writer import open_data_writers, close_data_writers, write_video_data, TeeWriter
+from checkpoint import Checkpointer, load_checkpoint, restore_tracker
+from track_store import convert_csv, convert_rows
+from partitioned_writer import read_partitions
+from analytics_db import AnalyticsStore, video_clock
+from movement_maps import LiveOccupancyMap
+from energy_calibration import load_calibrator, save_calibrator
+from analysis_config import default_config
+
+CHECKPOINT_PATH = 'processed_data/checkpoint.pkl'
+
+def analyze_video(net, ln, encoder, video_path=None, checkpoint_path=CHECKPOINT_PATH, resume=False, frame_callback=None, settings=None):
+	"""Analyse a video or camera feed with loaded models and save the results to processed_data.
+
+	`settings` is the AnalysisConfig of the run, config.py when None, and
+	its `video_cap` is analysed when `video_path` is None. With
+	`frame_callback`, every annotated frame and its crowd statistics are
+	passed to it instead of the OpenCV window, returning False stops the
+	analysis. Returns the video data saved next to the results.
+	"""
+	settings = settings or default_config()
+	IS_CAM = settings.is_cam
+	FRAME_SIZE = settings.frame_size
+	video_path = settings.video_cap if video_path is None else video_path
+	cap = cv2.VideoCapture(video_path)
+
+	#initialize deep sort object
+	tracker = tracker_for(settings)
+
+	# Restore the tracker and the data files from the last checkpoint
+	checkpoint = load_checkpoint(checkpoint_path) if resume else None
+	start_frame = 0
+	start_display_frame = 0
+	if checkpoint:
+		restore_tracker(tracker, checkpoint["tracker"])
+		start_frame = checkpoint["frame_count"]
+		start_display_frame = checkpoint["display_frame_count"]
+		if not IS_CAM:
+			cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+		print("Resuming from frame", start_frame)
+	elif resume:
+		print("No checkpoint found, starting from the beginning")
+
+	data_files, movement_data_writer, crowd_data_writer = open_data_writers('processed_data', live=IS_CAM,
+		offsets=checkpoint["offsets"] if checkpoint else None, buffered=BUFFERED_WRITERS,
+		partition=PARTITION_PERIOD, compression=PARTITION_COMPRESSION)
+
+	# Store the run in the analytics database next to the CSV files
+	analytics = None
+	if ANALYTICS_DB:
+		analytics = AnalyticsStore(ANALYTICS_DB_PATH)
+		clock = None if IS_CAM else video_clock(settings.start_time, cap.get(cv2.CAP_PROP_FPS))
+		run_id = None
+		if checkpoint:
+			run_id = analytics.resume_run(CAMERA_NAME, None if IS_CAM else clock(start_frame),
+				checkpoint.get("analytics_rows"))
+		if run_id is None:
+			run_id = analytics.start_run(CAMERA_NAME, video_path, IS_CAM)
+		movement_data_writer = TeeWriter(movement_data_writer, analytics.movement_writer(run_id, CAMERA_NAME, clock))
+		crowd_data_writer = TeeWriter(crowd_data_writer, analytics.crowd_writer(run_id, CAMERA_NAME, clock))
+
+	checkpointer = Checkpointer(tracker, data_files, checkpoint_path, CHECKPOINT_INTERVAL,
+		writers=[movement_data_writer, crowd_data_writer], analytics=analytics)
+
+	live_map = LiveOccupancyMap(FRAME_SIZE, half_life=LIVE_MAP_HALF_LIFE, export_path=LIVE_MAP_PATH,
+		export_interval=LIVE_MAP_INTERVAL) if LIVE_MAP else None
+
+	# Continue calibrating the abnormal energy threshold of this camera
+	calibrator = None
+	if ENERGY_CALIBRATION:
+		time_step = 1 if IS_CAM else int(cap.get(cv2.CAP_PROP_FPS) / settings.data_record_rate) / cap.get(cv2.CAP_PROP_FPS)
+		calibrator = load_calibrator(CAMERA_NAME, time_step, FRAME_SIZE)
+
+	START_TIME = time.time()
+
+	total_frames = None if IS_CAM else int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+	processing_FPS = video_process(cap, FRAME_SIZE, net, ln, encoder, tracker, movement_data_writer, crowd_data_writer,
+		total_frames=total_frames, start_frame=start_frame, start_display_frame=start_display_frame,
+		checkpointer=checkpointer, live_map=live_map, calibrator=calibrator, frame_callback=frame_callback, settings=settings)
+	if not frame_callback:
+		cv2.destroyAllWindows()
+	if live_map:
+		live_map.close()
+		if live_map.shape:
+			live_map.export(LIVE_MAP_PATH)
+	if calibrator:
+		save_calibrator(CAMERA_NAME, calibrator)
+		print("Calibrated abnormal energy: ", calibrator.threshold)
+	if BUFFERED_WRITERS and not ANALYTICS_DB:
+		print("Crowd data writer: ", crowd_data_writer.metrics())
+	close_data_writers(data_files, movement_data_writer, crowd_data_writer)
+	if analytics:
+		analytics.close()
+	# Save the tracks in the columnar store read by the analysis scripts
+	if IS_CAM and PARTITION_PERIOD:
+		convert_rows(read_partitions('processed_data', 'movement_data'), 'processed_data/movement_tracks')
+	else:
+		convert_csv('processed_data/movement_data.csv', 'processed_data/movement_tracks')
+
+	END_TIME = time.time()
+	PROCESS_TIME = END_TIME - START_TIME
+	print("Time elapsed: ", PROCESS_TIME)
+	if IS_CAM:
+		print("Processed FPS: ", processing_FPS)
+		VID_FPS = processing_FPS
+		DATA_RECORD_FRAME = 1
+	else:
+		print("Processed FPS: ", round(cap.get(cv2.CAP_PROP_FRAME_COUNT) / PROCESS_TIME, 2))
+		VID_FPS = cap.get(cv2.CAP_PROP_FPS)
+		DATA_RECORD_FRAME = int(VID_FPS / settings.data_record_rate)
+		START_TIME = settings.start_time
+		time_elapsed = round(cap.get(cv2.CAP_PROP_FRAME_COUNT) / VID_FPS)
+		END_TIME = START_TIME + datetime.timedelta(seconds=time_elapsed)
+
+
+	cap.release()
+
+	video_data = {
+		"IS_CAM": IS_CAM,
+		"DATA_RECORD_FRAME" : DATA_RECORD_FRAME,
+		"VID_FPS" : VID_FPS,
+		"PROCESSED_FRAME_SIZE": FRAME_SIZE,
+		"TRACK_MAX_AGE": settings.track_max_age,
+		"START_TIME": START_TIME.strftime("%d/%m/%Y, %H:%M:%S"),
+		"END_TIME": END_TIME.strftime("%d/%m/%Y, %H:%M:%S"),
+		"VIDEO_PATH": video_path if isinstance(video_path, str) else None
+	}
+
+	write_video_data('processed_data', video_data)
+	return video_data
@@ -0,0 +1,199 @@
+import os
+import time
+import sqlite3
+import datetime
+import numpy as np
+
+ANALYTICS_DB_PATH = 'processed_data/analytics.db'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+	run_id INTEGER PRIMARY KEY,
+	camera TEXT NOT NULL,
+	source TEXT,
+	started_at REAL NOT NULL,
+	is_cam INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS crowd (
+	run_id INTEGER NOT NULL,
+	camera TEXT NOT NULL,
+	time REAL NOT NULL,
+	human_count INTEGER NOT NULL,
+	violate_count INTEGER NOT NULL,
+	restricted_entry INTEGER NOT NULL,
+	abnormal_activity INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tracks (
+	run_id INTEGER NOT NULL,
+	camera TEXT NOT NULL,
+	track_id INTEGER NOT NULL,
+	entry REAL NOT NULL,
+	exit REAL NOT NULL,
+	points INTEGER NOT NULL,
+	positions BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS crowd_camera_time ON crowd (camera, time);
+CREATE INDEX IF NOT EXISTS crowd_run ON crowd (run_id);
+CREATE INDEX IF NOT EXISTS tracks_track_id ON tracks (track_id);
+CREATE INDEX IF NOT EXISTS tracks_run ON tracks (run_id);
+"""
+
+def video_clock(start_time, fps):
+	# Epoch seconds of a frame number of a video that started at `start_time`
+	start = start_time.timestamp()
+	return lambda frame: start + int(frame) / fps
+
+def _epoch(value, clock):
+	# Camera rows carry datetimes, video rows carry frame numbers
+	if isinstance(value, datetime.datetime):
+		return value.timestamp()
+	if clock is None:
+		return float(value)
+	return clock(value)
+
+class AnalyticsStore:
+	"""SQLite database collecting the crowd and movement data of every analysis run.
+
+	The database is opened in WAL mode so the GUI can query it while an
+	analysis writes to it. Rows are written in batches through the sinks
+	returned by `crowd_writer` and `movement_writer`.
+	"""
+
+	def __init__(self, path=ANALYTICS_DB_PATH):
+		directory = os.path.dirname(path)
+		if directory and not os.path.exists(directory):
+			os.makedirs(directory)
+		self.path = path
+		self.conn = sqlite3.connect(path)
+		self.conn.execute("PRAGMA journal_mode=WAL")
+		self.conn.execute("PRAGMA synchronous=NORMAL")
+		self.conn.executescript(_SCHEMA)
+
+	def start_run(self, camera, source=None, is_cam=False):
+		with self.conn:
+			cursor = self.conn.execute("INSERT INTO runs (camera, source, started_at, is_cam) VALUES (?, ?, ?, ?)",
+				(camera, str(source), time.time(), int(is_cam)))
+		return cursor.lastrowid
+
+	def row_marks(self):
+		# Last rowid of the crowd and tracks tables, saved in checkpoints
+		return {table: self.conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM " + table).fetchone()[0]
+			for table in ('crowd', 'tracks')}
+
+	def resume_run(self, camera, since=None, marks=None):
+		"""Continue the last run of a camera, dropping the rows written after its checkpoint.
+
+		`marks` are the row marks saved in the checkpoint. Checkpoints saved
+		without them fall back to dropping the rows recorded after `since`,
+		which keeps the tracks closed when the analysis was stopped.
+		"""
+		row = self.conn.execute("SELECT MAX(run_id) FROM runs WHERE camera = ?", (camera,)).fetchone()
+		if row[0] is None:
+			return None
+		run_id = row[0]
+		if marks is not None:
+			with self.conn:
+				for table in ('crowd', 'tracks'):
+					self.conn.execute("DELETE FROM " + table + " WHERE run_id = ? AND rowid > ?", (run_id, marks[table]))
+		elif since is not None:
+			with self.conn:
+				self.conn.execute("DELETE FROM crowd WHERE run_id = ? AND time > ?", (run_id, since))
+				self.conn.execute("DELETE FROM tracks WHERE run_id = ? AND exit > ?", (run_id, since))
+		return run_id
+
+	def latest_run(self, camera=None):
+		if camera is None:
+			row = self.conn.execute("SELECT MAX(run_id) FROM runs").fetchone()
+		else:
+			row = self.conn.execute("SELECT MAX(run_id) FROM runs WHERE camera = ?", (camera,)).fetchone()
+		return row[0]
+
+	def crowd_writer(self, run_id, camera, clock=None, batch_size=500):
+		return _CrowdSink(self.conn, run_id, camera, clock, batch_size)
+
+	def movement_writer(self, run_id, camera, clock=None, batch_size=200):
+		return _MovementSink(self.conn, run_id, camera, clock, batch_size)
+
+	def crowd_summary(self, run_id=None):
+		# Aggregates of one run, or of every run when `run_id` is None
+		query = ("SELECT COUNT(*), MAX(human_count), AVG(human_count), MAX(violate_count), AVG(violate_count), "
+			"SUM(violate_count), MIN(time), MAX(time) FROM crowd")
+		params = ()
+		if run_id is not None:
+			query += " WHERE run_id = ?"
+			params = (run_id,)
+		row = self.conn.execute(query, params).fetchone()
+		if not row[0]:
+			return None
+		keys = ['rows', 'max_people', 'avg_people', 'max_violations', 'avg_violations', 'total_violations', 'start', 'end']
+		summary = dict(zip(keys, row))
+		last = self.conn.execute("SELECT human_count, violate_count FROM crowd" +
+			(" WHERE run_id = ?" if run_id is not None else "") + " ORDER BY rowid DESC LIMIT 1", params).fetchone()
+		summary['last_people'], summary['last_violations'] = last
+		return summary
+
+	def peak_count_per_hour(self, since=None, until=None, camera=None):
+		# Highest human count of every camera in every hour, in local time
+		query = ("SELECT camera, strftime('%Y-%m-%d %H:00', time, 'unixepoch', 'localtime') AS hour, "
+			"MAX(human_count) FROM crowd WHERE time >= ? AND time < ?")
+		params = [since.timestamp() if since else 0, until.timestamp() if until else float('inf')]
+		if camera is not None:
+			query += " AND camera = ?"
+			params.append(camera)
+		query += " GROUP BY camera, hour ORDER BY camera, hour"
+		return self.conn.execute(query, params).fetchall()
+
+	def track_positions(self, track_id, run_id=None):
+		# Centroids of a track as an (n, 2) array, None if it was never recorded
+		query = "SELECT positions FROM tracks WHERE track_id = ?"
+		params = [track_id]
+		if run_id is not None:
+			query += " AND run_id = ?"
+			params.append(run_id)
+		row = self.conn.execute(query + " ORDER BY rowid DESC LIMIT 1", params).fetchone()
+		if row is None:
+			return None
+		return np.frombuffer(row[0], dtype=np.int32).reshape(-1, 2)
+
+	def close(self):
+		self.conn.close()
+
+class _Sink:
+	# Collect rows and insert them in a single transaction once `batch_size` of them are waiting
+
+	def __init__(self, conn, run_id, camera, clock, batch_size):
+		self.conn = conn
+		self.run_id = run_id
+		self.camera = camera
+		self.clock = clock
+		self.batch_size = batch_size
+		self._rows = []
+
+	def writerow(self, row):
+		self._rows.append(self._convert(row))
+		if len(self._rows) >= self.batch_size:
+			self.sync()
+
+	def sync(self):
+		if not self._rows:
+			return
+		with self.conn:
+			self.conn.executemany(self._insert, self._rows)
+		self._rows = []
+
+	def close(self):
+		self.sync()
+
+class _CrowdSink(_Sink):
+	_insert = "INSERT INTO crowd VALUES (?, ?, ?, ?, ?, ?, ?)"
+
+	def _convert(self, row):
+		return (self.run_id, self.camera, _epoch(row[0], self.clock), int(row[1]), int(row[2]), int(row[3]), int(row[4]))
+
+class _MovementSink(_Sink):
+	_insert = "INSERT INTO tracks VALUES (?, ?, ?, ?, ?, ?, ?)"
+
+	def _convert(self, row):
+		positions = np.asarray(row[3:], dtype=np.int32)
+		return (self.run_id, self.camera, int(row[0]), _epoch(row[1], self.clock), _epoch(row[2], self.clock),
+			len(positions) // 2, positions.tobytes())
@@ -0,0 +1,156 @@
+import time
+import threading
+from collections import deque
+from tracking import detect_humans_batch
+
+class Histogram:
+	"""Counts of recorded values over fixed bin edges"""
+
+	def __init__(self, edges):
+		self.edges = list(edges)
+		self.counts = [0] * (len(self.edges) + 1)
+		self.total = 0
+		self.sum = 0.0
+
+	def record(self, value):
+		index = 0
+		while index < len(self.edges) and value > self.edges[index]:
+			index += 1
+		self.counts[index] += 1
+		self.total += 1
+		self.sum += value
+
+	def mean(self):
+		return self.sum / self.total if self.total else 0.0
+
+	def as_dict(self):
+		labels = ["<={}".format(edge) for edge in self.edges] + [">{}".format(self.edges[-1])]
+		return dict(zip(labels, self.counts))
+
+class BatchScheduler:
+	"""Collect frames submitted by many streams and detect them in batches.
+
+	A batch is flushed once it holds `max_batch` frames or once its oldest
+	frame has waited `max_wait` seconds, which bounds the latency a stream
+	sees when only a few cameras are producing frames. The person crops of a
+	flushed batch are encoded together in batches of `crop_batch`.
+	"""
+
+	def __init__(self, net, ln, encoder, max_batch=8, max_wait=0.05, crop_batch=64, max_pending_per_stream=2):
+		self.net = net
+		self.ln = ln
+		self.encoder = encoder
+		self.max_batch = max_batch
+		self.max_wait = max_wait
+		self.crop_batch = crop_batch
+		self.max_pending_per_stream = max_pending_per_stream
+
+		self._queue = deque()
+		self._pending = {}
+		self._cancelled = set()
+		self._condition = threading.Condition()
+
+		self.batch_sizes = Histogram([1, 2, 4, 8, 16, 32])
+		self.wait_times = Histogram([0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5])
+		self.crop_batch_sizes = Histogram([0, 8, 16, 32, 64, 128])
+
+	def submit(self, stream, frame, record_time):
+		# Block the stream reader while it already has enough frames waiting,
+		# frames of one stream are flushed in the order they were submitted
+		with self._condition:
+			while self._pending.get(stream, 0) >= self.max_pending_per_stream and stream not in self._cancelled:
+				self._condition.wait()
+			if stream in self._cancelled:
+				return
+			self._queue.append((stream, frame, record_time, time.time()))
+			self._pending[stream] = self._pending.get(stream, 0) + 1
+			self._condition.notify_all()
+
+	def cancel(self, stream):
+		# Drop the waiting frames of a stream and ignore its later ones, waking its blocked reader
+		with self._condition:
+			self._cancelled.add(stream)
+			self._queue = deque(item for item in self._queue if item[0] is not stream)
+			self._pending[stream] = 0
+			self._condition.notify_all()
+
+	def pending(self, stream=None):
+		with self._condition:
+			if stream is None:
+				return len(self._queue)
+			return self._pending.get(stream, 0)
+
+	def _deadline(self):
+		return self._queue[0][3] + self.max_wait
+
+	def wait_ready(self, timeout=None):
+		# Wait until a batch is full or the oldest frame reached its deadline
+		end = None if timeout is None else time.time() + timeout
+		with self._condition:
+			while True:
+				now = time.time()
+				if self._queue and (len(self._queue) >= self.max_batch or now >= self._deadline()):
+					return True
+				if end is not None and now >= end:
+					return False
+				wait = self._deadline() - now if self._queue else None
+				if end is not None:
+					wait = end - now if wait is None else min(wait, end - now)
+				self._condition.wait(wait)
+
+	def flush(self):
+		# Detect the queued frames, at most one frame per stream in a batch as
+		# every frame has to see the tracker state left by the previous one
+		with self._condition:
+			batch = []
+			seen = set()
+			for item in list(self._queue):
+				if len(batch) >= self.max_batch:
+					break
+				if item[0] in seen:
+					continue
+				seen.add(item[0])
+				batch.append(item)
+			for item in batch:
+				self._queue.remove(item)
+		if not batch:
+			return []
+
+		now = time.time()
+		for item in batch:
+			self.wait_times.record(now - item[3])
+		self.batch_sizes.record(len(batch))
+
+		encoder = _CropBatchEncoder(self.encoder, self.crop_batch, self.crop_batch_sizes)
+		results = detect_humans_batch(self.net, self.ln, [item[1] for item in batch], encoder,
+			[item[0].tracker for item in batch], [item[2] for item in batch])
+
+		with self._condition:
+			for item in batch:
+				self._pending[item[0]] -= 1
+			self._condition.notify_all()
+		return [(item[0], item[2], result) for item, result in zip(batch, results)]
+
+	def stats(self):
+		return {
+			"batch_size": self.batch_sizes.as_dict(),
+			"mean_batch_size": round(self.batch_sizes.mean(), 2),
+			"wait_time": self.wait_times.as_dict(),
+			"mean_wait_time": round(self.wait_times.mean(), 4),
+			"crop_batch_size": self.crop_batch_sizes.as_dict()
+		}
+
+class _CropBatchEncoder:
+	# Encoder wrapper recording how many crops every encoder batch carried
+	def __init__(self, encoder, batch_size, histogram):
+		self.encoder = encoder
+		self.batch_size = batch_size
+		self.histogram = histogram
+
+	def extract_patches(self, image, boxes):
+		return self.encoder.extract_patches(image, boxes)
+
+	def encode_patches(self, patches):
+		for start in range(0, len(patches), self.batch_size):
+			self.histogram.record(len(patches[start:start + self.batch_size]))
+		return self.encoder.encode_patches(patches, self.batch_size)
@@ -0,0 +1,87 @@
+import os
+import time
+import pickle
+from deep_sort.track import Track
+
+CHECKPOINT_PATH = 'processed_data/checkpoint.pkl'
+
+def tracker_state(tracker):
+	# Kalman state, trails and features of every track plus the appearance gallery
+	return {
+		"tracks": [dict(vars(track)) for track in tracker.tracks],
+		"samples": tracker.metric.samples,
+		"next_id": tracker._next_id
+	}
+
+def restore_tracker(tracker, state):
+	tracks = []
+	for attributes in state["tracks"]:
+		track = Track.__new__(Track)
+		track.__dict__.update(attributes)
+		tracks.append(track)
+	tracker.tracks = tracks
+	tracker.metric.samples = state["samples"]
+	tracker._next_id = state["next_id"]
+
+def file_offsets(data_files):
+	# Flush the data files to disk and return the size of each of them
+	offsets = {}
+	for data_file in data_files:
+		# Partitioned writers save their segments and the position in the open one
+		if hasattr(data_file, 'checkpoint_state'):
+			offsets[data_file.name] = data_file.checkpoint_state()
+			continue
+		data_file.flush()
+		os.fsync(data_file.fileno())
+		offsets[os.path.basename(data_file.name)] = data_file.tell()
+	return offsets
+
+def load_checkpoint(path=CHECKPOINT_PATH):
+	if not os.path.exists(path):
+		return None
+	with open(path, 'rb') as checkpoint_file:
+		return pickle.load(checkpoint_file)
+
+class Checkpointer:
+	"""Periodically save the progress of a video analysis so it can be resumed"""
+
+	def __init__(self, tracker, data_files, path=CHECKPOINT_PATH, interval=60, writers=(), analytics=None):
+		self.tracker = tracker
+		self.analytics = analytics
+		self.data_files = data_files
+		self.writers = writers
+		self.path = path
+		self.interval = interval
+		self.last_save = time.time()
+
+	def save(self, frame_count, display_frame_count):
+		# Rows still waiting in buffered writers belong before the saved offsets
+		for writer in self.writers:
+			if hasattr(writer, 'sync'):
+				writer.sync()
+		state = {
+			"frame_count": frame_count,
+			"display_frame_count": display_frame_count,
+			"tracker": tracker_state(self.tracker),
+			"offsets": file_offsets(self.data_files)
+		}
+		# The database rows written so far, later ones are dropped on resume
+		if self.analytics:
+			state["analytics_rows"] = self.analytics.row_marks()
+		# Write next to the old checkpoint first so a crash never leaves a partial one
+		temp_path = self.path + '.tmp'
+		with open(temp_path, 'wb') as checkpoint_file:
+			pickle.dump(state, checkpoint_file)
+			checkpoint_file.flush()
+			os.fsync(checkpoint_file.fileno())
+		os.replace(temp_path, self.path)
+		self.last_save = time.time()
+
+	def maybe_save(self, frame_count, display_frame_count):
+		if time.time() - self.last_save >= self.interval:
+			self.save(frame_count, display_frame_count)
+
+	def finish(self):
+		# The analysis reached the end of the video, there is nothing to resume
+		if os.path.exists(self.path):
+			os.remove(self.path)
@@ -0,0 +1,246 @@
+import os
+import time
+import datetime
+import argparse
+import multiprocessing
+import numpy as np
+import imutils
+import cv2
+from scipy.optimize import linear_sum_assignment
+from config import YOLO_CONFIG, VIDEO_CONFIG, DATA_RECORD, DATA_RECORD_RATE, FRAME_SIZE, TRACK_MAX_AGE
+from data_writer import open_data_writers, write_video_data
+from track_store import TrackStoreWriter
+
+# Maximum appearance distance for two tracks to be stitched at a chunk boundary
+STITCH_MAX_COSINE_DISTANCE = 0.7
+# Maximum mean centroid distance of two tracks over their common frames (ratio of frame size)
+STITCH_MAX_POSITION_DISTANCE = 0.05
+
+def plan_chunks(total_frames, chunks, overlap_frames):
+	# Split the video into chunks of (warmup start, start, end) frame counts.
+	# A chunk records frames start+1 ... end, frames after the warmup start
+	# are only used to bring the tracker up to date.
+	chunks = max(1, min(chunks, total_frames))
+	bounds = np.linspace(0, total_frames, chunks + 1).astype(int)
+	plan = []
+	for start, end in zip(bounds[:-1], bounds[1:]):
+		plan.append((max(0, int(start) - overlap_frames), int(start), int(end)))
+	return plan
+
+def _track_record(track, times, features, is_open):
+	first_feature, last_feature = features.get(track.track_id, (None, None))
+	return {
+		"entry": track.entry,
+		"exit": track.exit,
+		"positions": [[int(x), int(y)] for x, y in track.positions],
+		"times": list(times.get(track.track_id, [])),
+		"first_feature": first_feature,
+		"last_feature": last_feature,
+		"open": is_open
+	}
+
+def process_chunk(video_path, warmup_start, start, end, frame_size):
+	"""Process one chunk of a video with its own detector and tracker"""
+	from tracking import detect_human
+	from models import load_detector, load_encoder, tracker_max_age, create_tracker
+	from video_process import _crowd_status
+
+	net, ln = load_detector(YOLO_CONFIG["CONFIG_PATH"], YOLO_CONFIG["WEIGHTS_PATH"])
+	encoder = load_encoder()
+	tracker = create_tracker(tracker_max_age(False, VIDEO_CONFIG["CAM_APPROX_FPS"], DATA_RECORD_RATE, TRACK_MAX_AGE))
+
+	cap = cv2.VideoCapture(video_path)
+	vid_fps = cap.get(cv2.CAP_PROP_FPS)
+	data_record_frame = max(int(vid_fps / DATA_RECORD_RATE), 1)
+	time_step = data_record_frame / vid_fps
+	cap.set(cv2.CAP_PROP_POS_FRAMES, warmup_start)
+
+	crowd_rows = []
+	tracks = []
+	# Frame of every recorded centroid, and first and last appearance feature of each track
+	times = {}
+	features = {}
+	frame_count = warmup_start
+	while frame_count < end:
+		(ret, frame) = cap.read()
+		if not ret:
+			break
+		frame_count += 1
+		# Skip frames according to given rate
+		if frame_count % data_record_frame != 0:
+			continue
+
+		frame = imutils.resize(frame, width=frame_size)
+		[humans_detected, expired] = detect_human(net, ln, frame, encoder, tracker, frame_count)
+
+		for track in tracker.tracks:
+			# Frames without detections skip the tracker update, only centroids added on this frame get its time
+			track_times = times.setdefault(track.track_id, [])
+			if len(track_times) == len(track.positions):
+				continue
+			track_times += [frame_count] * (len(track.positions) - len(track_times))
+			samples = tracker.metric.samples.get(track.track_id)
+			if samples:
+				first_feature = features.get(track.track_id, (samples[0], None))[0]
+				features[track.track_id] = (first_feature, samples[-1])
+		for movement in expired:
+			tracks.append(_track_record(movement, times, features, False))
+
+		if DATA_RECORD and frame_count > start:
+			violate_count, restricted_entry, abnormal = _crowd_status(humans_detected, datetime.datetime.now(), time_step)
+			crowd_rows.append([frame_count, len(humans_detected), violate_count, int(restricted_entry), int(abnormal)])
+
+	# Tracks still on screen at the end of the chunk may continue in the next one
+	for track in tracker.tracks:
+		if track.is_confirmed():
+			track.exit = frame_count
+			tracks.append(_track_record(track, times, features, True))
+	cap.release()
+	return crowd_rows, tracks
+
+def _process_chunk_args(args):
+	return process_chunk(*args)
+
+def _cosine_distance(a, b):
+	if a is None or b is None:
+		return np.inf
+	return 1. - np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+
+def _position_distance(track_a, track_b):
+	# Mean centroid distance over the frames both tracks have seen
+	points_a = dict(zip(track_a["times"], track_a["positions"]))
+	distances = [np.hypot(points_a[t][0] - p[0], points_a[t][1] - p[1])
+		for t, p in zip(track_b["times"], track_b["positions"]) if t in points_a]
+	if not distances:
+		return np.inf
+	return float(np.mean(distances))
+
+def _trim_before(track, boundary):
+	# Keep only the part of a track recorded after the chunk boundary
+	keep = [i for i, t in enumerate(track["times"]) if t > boundary]
+	if not keep:
+		return None
+	trimmed = dict(track)
+	trimmed["positions"] = [track["positions"][i] for i in keep]
+	trimmed["times"] = [track["times"][i] for i in keep]
+	trimmed["entry"] = trimmed["times"][0]
+	return trimmed
+
+def stitch_tracks(open_tracks, next_tracks, boundary, frame_size):
+	"""Join the tracks left open by a chunk with the tracks of the next chunk.
+
+	The next chunk started its tracker `overlap` frames before the boundary,
+	candidates are the tracks it started during that warmup. Pairs are gated
+	on the centroid distance over their common frames and assigned on the
+	appearance distance. Returns the finished tracks and the tracks of the
+	next chunk with their warmup part removed.
+	"""
+	candidates = [i for i, t in enumerate(next_tracks)
+		if t["times"] and t["times"][0] <= boundary and t["exit"] > boundary]
+	gate = frame_size * STITCH_MAX_POSITION_DISTANCE
+	matches = {}
+	if open_tracks and candidates:
+		cost = np.full((len(open_tracks), len(candidates)), 1e5)
+		for i, track_a in enumerate(open_tracks):
+			for j, index in enumerate(candidates):
+				if _position_distance(track_a, next_tracks[index]) < gate:
+					cost[i, j] = _cosine_distance(track_a["last_feature"], next_tracks[index]["first_feature"])
+		rows, cols = linear_sum_assignment(cost)
+		for row, col in zip(rows, cols):
+			if cost[row, col] <= STITCH_MAX_COSINE_DISTANCE:
+				matches[candidates[col]] = row
+
+	finished = [t for i, t in enumerate(open_tracks) if i not in matches.values()]
+	merged = []
+	for index, track in enumerate(next_tracks):
+		if index in matches:
+			track_a = open_tracks[matches[index]]
+			rest = _trim_before(track, boundary)
+			joined = dict(track)
+			joined["entry"] = track_a["entry"]
+			joined["positions"] = track_a["positions"] + (rest["positions"] if rest else [])
+			joined["times"] = track_a["times"] + (rest["times"] if rest else [])
+			joined["first_feature"] = track_a["first_feature"]
+			merged.append(joined)
+		else:
+			rest = _trim_before(track, boundary)
+			if rest is not None:
+				merged.append(rest)
+	return finished, merged
+
+def chunked_process(video_path, output_dir='processed_data', workers=None, overlap_seconds=10, frame_size=FRAME_SIZE):
+	"""Process a video in parallel chunks and merge them as if processed in one pass"""
+	workers = workers or os.cpu_count() or 1
+	cap = cv2.VideoCapture(video_path)
+	total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+	vid_fps = cap.get(cv2.CAP_PROP_FPS)
+	cap.release()
+	data_record_frame = max(int(vid_fps / DATA_RECORD_RATE), 1)
+
+	plan = plan_chunks(total_frames, workers, int(overlap_seconds * vid_fps))
+	jobs = [(video_path, warmup_start, start, end, frame_size) for warmup_start, start, end in plan]
+
+	crowd_rows = []
+	movements = []
+	open_tracks = []
+	# Each worker loads its own models, spawn keeps them out of the parent process
+	context = multiprocessing.get_context("spawn")
+	with context.Pool(processes=min(workers, len(jobs))) as pool:
+		for (warmup_start, start, end), (chunk_rows, chunk_tracks) in zip(plan, pool.imap(_process_chunk_args, jobs)):
+			print("Chunk of frames {} - {} done".format(start + 1, end))
+			crowd_rows += chunk_rows
+			finished, chunk_tracks = stitch_tracks(open_tracks, chunk_tracks, start, frame_size)
+			movements += finished
+			open_tracks = [t for t in chunk_tracks if t["open"]]
+			movements += [t for t in chunk_tracks if not t["open"]]
+	movements += open_tracks
+
+	# Number the tracks in order of appearance and write them as they would have expired
+	movements.sort(key=lambda t: t["entry"])
+	for track_id, track in enumerate(movements, start=1):
+		track["track_id"] = track_id
+	movements.sort(key=lambda t: (t["exit"], t["track_id"]))
+
+	data_files, movement_data_writer, crowd_data_writer = open_data_writers(output_dir)
+	track_store = TrackStoreWriter(os.path.join(output_dir, 'movement_tracks'))
+	for row in crowd_rows:
+		crowd_data_writer.writerow(row)
+	for track in movements:
+		positions = list(np.array(track["positions"]).flatten())
+		movement_data_writer.writerow([track["track_id"], track["entry"], track["exit"]] + positions)
+		track_store.add(track["track_id"], track["entry"], track["exit"], track["positions"])
+	for data_file in data_files:
+		data_file.close()
+	track_store.close()
+
+	start_time = VIDEO_CONFIG["START_TIME"]
+	end_time = start_time + datetime.timedelta(seconds=round(total_frames / vid_fps))
+	write_video_data(output_dir, {
+		"IS_CAM": False,
+		"DATA_RECORD_FRAME": data_record_frame,
+		"VID_FPS": vid_fps,
+		"PROCESSED_FRAME_SIZE": frame_size,
+		"TRACK_MAX_AGE": TRACK_MAX_AGE,
+		"START_TIME": start_time.strftime("%d/%m/%Y, %H:%M:%S"),
+		"END_TIME": end_time.strftime("%d/%m/%Y, %H:%M:%S")
+	})
+	return len(crowd_rows), len(movements)
+
+def parse_args():
+	parser = argparse.ArgumentParser(description="Process a long video in parallel chunks")
+	parser.add_argument("--video", default=VIDEO_CONFIG["VIDEO_CAP"], help="Video file to analyse.")
+	parser.add_argument("--workers", type=int, default=None, help="Number of worker processes, defaults to the core count.")
+	parser.add_argument("--overlap", type=float, default=10,
+		help="Seconds each chunk starts early to warm up its tracker and stitch tracks.")
+	parser.add_argument("--output", default="processed_data", help="Output directory.")
+	return parser.parse_args()
+
+def main():
+	args = parse_args()
+	START_TIME = time.time()
+	crowd_count, track_count = chunked_process(args.video, args.output, args.workers, args.overlap)
+	print("Crowd data rows: {}, movement tracks: {}".format(crowd_count, track_count))
+	print("Time elapsed: ", time.time() - START_TIME)
+
+if __name__ == "__main__":
+	main()
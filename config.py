@@ -41,6 +41,8 @@ ABNORMAL_CHECK = True
 ABNORMAL_MIN_PEOPLE = 5
 # Abnormal energy level threshold
 ABNORMAL_ENERGY = 1866
+# Keep calibrating the abnormal energy threshold of every camera from the analysed movement
+ENERGY_CALIBRATION = False
 # Abnormal activity ratio threhold
 ABNORMAL_THRESH = 0.66
 # Threshold for human detection minumun confindence
@@ -51,4 +53,34 @@ NMS_THRESH = 0.2
 FRAME_SIZE = 1080
 # Tracker max missing age before removing (seconds)
 TRACK_MAX_AGE = 3
+# Interval between saved checkpoints of a running analysis (seconds)
+CHECKPOINT_INTERVAL = 60
+# Write data rows on a background thread instead of inside the processing loop
+BUFFERED_WRITERS = True
+# Also store the results of every run in the SQLite analytics database
+ANALYTICS_DB = False
+ANALYTICS_DB_PATH = "processed_data/analytics.db"
+# Name of the configured feed in the analytics database
+CAMERA_NAME = "camera"
+# Split the data of a live camera into "hour" or "day" segments, None keeps single files
+PARTITION_PERIOD = None
+# Compression of closed segments, "zstd" or "gzip", None picks zstd when it is installed
+PARTITION_COMPRESSION = None
+# Keep a decaying occupancy, dwell and trail map of the analysis and export it while it runs
+LIVE_MAP = True
+LIVE_MAP_PATH = "processed_data/live_heatmap.png"
+# Half life of the live map (seconds) and interval between its exports (seconds)
+LIVE_MAP_HALF_LIFE = 300
+LIVE_MAP_INTERVAL = 5
+# Resolution of the generated plots, quick previews for the dashboard and high resolution exports for reports
+PLOT_TIERS = {
+	"preview": {"dpi": 80, "max_width": 800},
+	"export": {"dpi": 300, "max_width": None}
+}
+PLOT_EXPORT_DIR = "generated_plots/export"
+# Address of the model server, None uses a Unix socket, or a local TCP port on Windows
+MODEL_SERVER_ADDRESS = None
+# Re-ID encoder of the tracker, "tensorflow" runs the frozen graph, "opencv" an ONNX export without importing TensorFlow
+REID_BACKEND = "tensorflow"
+REID_ONNX_MODEL = "model_data/mars-small128.onnx"
 VIDEO_CAP = "/Users/levi/Videos/7.mp4"
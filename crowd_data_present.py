@@ -2,11 +2,11 @@ import matplotlib
 matplotlib.use('tkagg')
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
-import matplotlib.dates as mdates
 import csv
 import json
 import datetime
 from math import floor
+from crowd_timeline import row_times, draw_count_line, draw_flag_spans
 
 human_count = []
 violate_count = []
@@ -32,24 +32,16 @@ start_time= datetime.datetime.strptime(start_time, "%d/%m/%Y, %H:%M:%S")
 time_steps = data_record_frame/vid_fps
 data_length = len(human_count)
 
-time_axis = []
+time_axis = row_times(start_time, time_steps, data_length)
 graph_height = max(human_count)
 
 fig, ax = plt.subplots()
-time = start_time
-for i in range(data_length):
-	time += datetime.timedelta(seconds= time_steps)
-	time_axis.append(time)
-	next_time = time + datetime.timedelta(seconds= time_steps)
-	rect_width = mdates.date2num(next_time) - mdates.date2num(time)
-	if restricted_entry[i]:
-		ax.add_patch(patches.Rectangle((mdates.date2num(time), 0), rect_width, graph_height / 10, facecolor = 'red', fill=True))
-	if abnormal_activity[i]:
-		ax.add_patch(patches.Rectangle((mdates.date2num(time), 0), rect_width, graph_height / 20, facecolor = 'blue', fill=True))
+# Consecutive flagged rows are drawn as one span
+draw_flag_spans(ax, time_axis, restricted_entry, time_steps, graph_height / 10, 'red')
+draw_flag_spans(ax, time_axis, abnormal_activity, time_steps, graph_height / 20, 'blue')
 
-
-violate_line, = plt.plot(time_axis, violate_count, linewidth=3, label="Violation Count")
-crowd_line, =  plt.plot(time_axis, human_count, linewidth=3, label="Crowd Count")
+violate_line = draw_count_line(ax, time_axis, violate_count, linewidth=3, label="Violation Count")
+crowd_line = draw_count_line(ax, time_axis, human_count, linewidth=3, label="Crowd Count")
 plt.title("Crowd Data versus Time")
 plt.xlabel("Time")
 plt.ylabel("Count")
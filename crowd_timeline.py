@@ -0,0 +1,64 @@
+import numpy as np
+import matplotlib.dates as mdates
+
+# Points kept per count line when a timeline is downsampled
+TIMELINE_POINTS = 5000
+
+def row_times(start_time, time_step, length, offset=1):
+	"""Time of every data row as datetime64, the first row being recorded `offset` steps after the start"""
+	steps = np.arange(offset, length + offset, dtype=np.float64) * time_step
+	return np.datetime64(start_time, 'us') + np.round(steps * 1e6).astype('timedelta64[us]')
+
+def flag_runs(flags):
+	# Start index and length of every run of consecutive set flags
+	flags = np.asarray(flags, dtype=bool)
+	padded = np.concatenate(([False], flags, [False]))
+	changes = np.flatnonzero(padded[1:] != padded[:-1])
+	return changes[::2], changes[1::2] - changes[::2]
+
+def lttb(y, max_points):
+	"""Indexes of the points kept by Largest-Triangle-Three-Buckets downsampling of evenly spaced values.
+
+	The first and last points are always kept and every bucket in between
+	keeps the point forming the largest triangle with the point kept in the
+	previous bucket and the mean of the next one, which preserves the peaks
+	of the counts.
+	"""
+	y = np.asarray(y, dtype=np.float64)
+	length = len(y)
+	if max_points is None or length <= max_points or max_points < 3:
+		return np.arange(length)
+	edges = np.linspace(1, length - 1, max_points - 1).astype(np.int64)
+	# Mean of every bucket, the last point is the target of the final bucket
+	sums = np.add.reduceat(y[:length - 1], edges[:-1])
+	means_y = np.append(sums / np.diff(edges), y[-1])
+	means_x = np.append((edges[:-1] + edges[1:] - 1) / 2, length - 1)
+	kept = np.empty(max_points, dtype=np.int64)
+	kept[0], kept[-1] = 0, length - 1
+	for bucket in range(max_points - 2):
+		start, end = edges[bucket], edges[bucket + 1]
+		x0, y0 = kept[bucket], y[kept[bucket]]
+		xs = np.arange(start, end)
+		areas = np.abs((x0 - means_x[bucket + 1]) * (y[start:end] - y0) - (x0 - xs) * (means_y[bucket + 1] - y0))
+		kept[bucket + 1] = start + np.argmax(areas)
+	return kept
+
+def draw_count_line(ax, times, counts, max_points=TIMELINE_POINTS, **kwargs):
+	# Plot a count line, downsampled to `max_points` points (None keeps all of them)
+	kept = lttb(counts, max_points)
+	line, = ax.plot(times[kept], np.asarray(counts)[kept], **kwargs)
+	return line
+
+def draw_flag_spans(ax, times, flags, time_step, height, color):
+	"""Draw the rows with a set flag as bars, merging consecutive rows into one span"""
+	starts, lengths = flag_runs(flags)
+	if len(starts) == 0:
+		return None
+	width = time_step / 86400
+	spans = np.column_stack((mdates.date2num(times[starts]), lengths * width))
+	return ax.broken_barh(spans, (0, height), facecolor=color)
+
+def format_time_axis(ax, time_format='%H:%M:%S'):
+	# Let the locator pick the tick interval so day long timelines keep a handful of ticks
+	ax.xaxis.set_major_locator(mdates.AutoDateLocator())
+	ax.xaxis.set_major_formatter(mdates.DateFormatter(time_format))
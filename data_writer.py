@@ -0,0 +1,225 @@
+import os
+import csv
+import json
+import time
+import threading
+from partitioned_writer import PartitionedWriter
+
+MOVEMENT_HEADER = ['Track ID', 'Entry time', 'Exit Time', 'Movement Tracks']
+CROWD_HEADER = ['Time', 'Human Count', 'Social Distance violate', 'Restricted Entry', 'Abnormal Activity']
+# Frame counters recorded by live cameras, which drop frames when processing falls behind
+LIVE_CROWD_HEADER = CROWD_HEADER + ['Dropped Frames', 'Processed Frames']
+
+class BufferedRowWriter:
+	"""A csv writer that collects rows in memory and writes them on a background thread.
+
+	Rows are flushed once `max_rows` of them are waiting or `max_delay` seconds
+	after the oldest one arrived, and every flush reaches the file so partial
+	results stay readable while the analysis runs. When the disk falls behind
+	and `max_pending` rows are waiting, `writerow` blocks until they are written.
+	An error of the background thread is raised again by the next `writerow`,
+	`sync` or `close`.
+	"""
+
+	def __init__(self, data_file, max_rows=256, max_delay=1.0, max_pending=20000):
+		self.data_file = data_file
+		self.max_rows = max_rows
+		self.max_delay = max_delay
+		self.max_pending = max_pending
+		# Rows go to a file, or to another row writer such as a PartitionedWriter
+		self._writer = data_file if hasattr(data_file, 'writerow') else csv.writer(data_file)
+		self._rows = []
+		self._first_row_time = None
+		self._closed = False
+		self._error = None
+		self._condition = threading.Condition()
+		self._write_lock = threading.Lock()
+
+		self.rows_written = 0
+		self.flushes = 0
+		self.flush_time = 0.0
+		self.max_flush_time = 0.0
+		self.max_queued = 0
+		self.blocked_time = 0.0
+
+		self._thread = threading.Thread(target=self._flush_loop, daemon=True)
+		self._thread.start()
+
+	def writerow(self, row):
+		with self._condition:
+			if len(self._rows) >= self.max_pending:
+				# Backpressure, wait for the flush thread to catch up
+				start = time.time()
+				self._condition.notify_all()
+				while len(self._rows) >= self.max_pending and not self._closed and self._error is None:
+					self._condition.wait()
+				self.blocked_time += time.time() - start
+			self._raise_error()
+			if not self._rows:
+				self._first_row_time = time.time()
+			self._rows.append(row)
+			self.max_queued = max(self.max_queued, len(self._rows))
+			if len(self._rows) >= self.max_rows:
+				self._condition.notify_all()
+
+	def _write_pending(self):
+		# Take the waiting rows and write them, callers hold the write lock so
+		# rows reach the file in the order they were given
+		with self._condition:
+			rows = self._rows
+			self._rows = []
+			self._first_row_time = None
+			self._condition.notify_all()
+		if not rows:
+			return
+		start = time.time()
+		self._writer.writerows(rows)
+		self.data_file.flush()
+		elapsed = time.time() - start
+		self.rows_written += len(rows)
+		self.flushes += 1
+		self.flush_time += elapsed
+		self.max_flush_time = max(self.max_flush_time, elapsed)
+
+	def _flush_loop(self):
+		while True:
+			with self._condition:
+				while not self._closed:
+					if len(self._rows) >= self.max_rows:
+						break
+					if self._rows and time.time() - self._first_row_time >= self.max_delay:
+						break
+					timeout = self.max_delay
+					if self._rows:
+						timeout = max(self._first_row_time + self.max_delay - time.time(), 0)
+					self._condition.wait(timeout)
+				closed = self._closed
+			try:
+				with self._write_lock:
+					self._write_pending()
+			except Exception as error:
+				# Keep the error for the caller instead of leaving it blocked on a dead thread
+				with self._condition:
+					self._error = error
+					self._condition.notify_all()
+				return
+			if closed:
+				return
+
+	def _raise_error(self):
+		if self._error is not None:
+			raise self._error
+
+	def sync(self):
+		# Write every waiting row and make sure it reached the disk, used by checkpoints
+		with self._write_lock:
+			self._raise_error()
+			self._write_pending()
+			if self._writer is self.data_file:
+				self.data_file.sync()
+			else:
+				os.fsync(self.data_file.fileno())
+
+	def close(self):
+		# Flush the remaining rows and stop the background thread, a file stays open
+		# while a row writer is closed with it
+		with self._condition:
+			self._closed = True
+			self._condition.notify_all()
+		self._thread.join()
+		if self._writer is self.data_file:
+			self.data_file.close()
+		self._raise_error()
+
+	def metrics(self):
+		with self._condition:
+			pending = len(self._rows)
+		return {
+			"pending_rows": pending,
+			"max_queued_rows": self.max_queued,
+			"rows_written": self.rows_written,
+			"flushes": self.flushes,
+			"mean_flush_time": self.flush_time / self.flushes if self.flushes else 0.0,
+			"max_flush_time": self.max_flush_time,
+			"blocked_time": self.blocked_time
+		}
+
+class TeeWriter:
+	"""Pass every row to several writers, e.g. a CSV file and the analytics database"""
+
+	def __init__(self, *writers):
+		self.writers = writers
+
+	def writerow(self, row):
+		for writer in self.writers:
+			writer.writerow(row)
+
+	def sync(self):
+		for writer in self.writers:
+			if hasattr(writer, 'sync'):
+				writer.sync()
+
+	def close(self):
+		for writer in self.writers:
+			if hasattr(writer, 'close'):
+				writer.close()
+
+def _open_data_file(path, offsets):
+	# Start a new file, or continue one from the offset saved in a checkpoint
+	if offsets is None:
+		return open(path, 'w')
+	name = os.path.basename(path)
+	if os.path.exists(path):
+		os.truncate(path, min(offsets.get(name, 0), os.path.getsize(path)))
+	return open(path, 'a')
+
+def open_data_writers(output_dir='processed_data', live=False, offsets=None, buffered=False, partition=None, compression=None):
+	# Open the movement and crowd data files of one analysis and write their headers
+	if not os.path.exists(output_dir):
+		os.makedirs(output_dir)
+
+	# Live feeds can split their data into hourly or daily segments instead of two growing files
+	if live and partition:
+		# The writers are returned as data files too, so checkpoints save their segments and positions
+		offsets = offsets or {}
+		movement_partitions = PartitionedWriter(output_dir, 'movement_data', MOVEMENT_HEADER, 2, partition, compression,
+			resume=offsets.get('movement_data'))
+		crowd_partitions = PartitionedWriter(output_dir, 'crowd_data', LIVE_CROWD_HEADER, 0, partition, compression,
+			resume=offsets.get('crowd_data'))
+		movement_data_writer, crowd_data_writer = movement_partitions, crowd_partitions
+		if buffered:
+			movement_data_writer = BufferedRowWriter(movement_data_writer)
+			crowd_data_writer = BufferedRowWriter(crowd_data_writer)
+		return [movement_partitions, crowd_partitions], movement_data_writer, crowd_data_writer
+
+	movement_path = os.path.join(output_dir, 'movement_data.csv')
+	crowd_path = os.path.join(output_dir, 'crowd_data.csv')
+	movement_data_file = _open_data_file(movement_path, offsets)
+	crowd_data_file = _open_data_file(crowd_path, offsets)
+
+	movement_data_writer = csv.writer(movement_data_file)
+	crowd_data_writer = csv.writer(crowd_data_file)
+
+	if os.path.getsize(movement_path) == 0:
+		movement_data_writer.writerow(MOVEMENT_HEADER)
+	if os.path.getsize(crowd_path) == 0:
+		crowd_data_writer.writerow(LIVE_CROWD_HEADER if live else CROWD_HEADER)
+
+	# Keep file writes out of the processing loop, the writers have to be closed before their files
+	if buffered:
+		movement_data_writer = BufferedRowWriter(movement_data_file)
+		crowd_data_writer = BufferedRowWriter(crowd_data_file)
+
+	return [movement_data_file, crowd_data_file], movement_data_writer, crowd_data_writer
+
+def close_data_writers(data_files, *writers):
+	# Flush the buffered writers and sinks, then close the files they write to
+	for writer in writers:
+		if hasattr(writer, 'close'):
+			writer.close()
+	for data_file in data_files:
+		data_file.close()
+
+def write_video_data(output_dir, video_data):
+	with open(os.path.join(output_dir, 'video_data.json'), 'w') as video_data_file:
+		json.dump(video_data, video_data_file)
@@ -4,13 +4,26 @@ import errno
 import argparse
 import numpy as np
 import cv2
-import os
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
-import tensorflow.compat.v1 as tf
-    
-physical_devices = tf.config.experimental.list_physical_devices('GPU')
-if len(physical_devices) > 0:
-    tf.config.experimental.set_memory_growth(physical_devices[0], True)
+
+_tf = None
+
+
+def _tensorflow():
+    """Import TensorFlow on first use.
+
+    Importing it takes seconds, so it is only loaded once a TensorFlow
+    encoder is created and never when the OpenCV encoder is used.
+
+    """
+    global _tf
+    if _tf is None:
+        import tensorflow.compat.v1 as tf
+        physical_devices = tf.config.experimental.list_physical_devices('GPU')
+        if len(physical_devices) > 0:
+            tf.config.experimental.set_memory_growth(physical_devices[0], True)
+        _tf = tf
+    return _tf
 
 def _run_in_batches(f, data_dict, out, batch_size):
     data_len = len(out)
@@ -76,6 +89,7 @@ def extract_image_patch(image, bbox, patch_shape):
 class ImageEncoder(object):
 
     def __init__(self, checkpoint_filename, input_name="images", output_name="features"):
+        tf = _tensorflow()
         self.session = tf.Session()
         with tf.gfile.GFile(checkpoint_filename, "rb") as file_handle:
             graph_def = tf.GraphDef()
@@ -102,22 +116,74 @@ class ImageEncoder(object):
         return out
 
 
-def create_box_encoder(model_filename, input_name="images:0", output_name="features:0", batch_size=32):
-    image_encoder = ImageEncoder(model_filename, input_name, output_name)
-    image_shape = image_encoder.image_shape
+class OpenCVImageEncoder(object):
+    """Run an ONNX export of the re-ID network with OpenCV's dnn module.
+
+    Gives the same interface as `ImageEncoder` without TensorFlow. The
+    network takes the uint8 patches in NHWC order like the frozen graph.
+
+    """
+
+    def __init__(self, model_filename, image_shape=(128, 64, 3)):
+        self.net = cv2.dnn.readNetFromONNX(model_filename)
+        self.image_shape = list(image_shape)
+        # Run one patch through the network to learn the feature size
+        dummy = np.zeros([1] + self.image_shape, np.float32)
+        self.net.setInput(dummy)
+        self.feature_dim = self.net.forward().reshape(1, -1).shape[1]
+
+    def __call__(self, data_x, batch_size=32):
+        out = np.zeros((len(data_x), self.feature_dim), np.float32)
+        for s in range(0, len(data_x), batch_size):
+            batch = data_x[s:s + batch_size]
+            self.net.setInput(batch.astype(np.float32))
+            out[s:s + batch_size] = self.net.forward().reshape(len(batch), -1)
+        return out
+
+
+class BoxEncoder(object):
+    """Extract image patches for bounding boxes and compute their features.
+
+    Patch extraction and encoding are exposed separately so that patches
+    coming from several frames can be encoded in a single batch.
+
+    """
+
+    def __init__(self, image_encoder, batch_size=32):
+        self.image_encoder = image_encoder
+        self.image_shape = image_encoder.image_shape
+        self.feature_dim = image_encoder.feature_dim
+        self.batch_size = batch_size
 
-    def encoder(image, boxes):
+    def extract_patches(self, image, boxes):
         image_patches = []
         for box in boxes:
-            patch = extract_image_patch(image, box, image_shape[:2])
+            patch = extract_image_patch(image, box, self.image_shape[:2])
             if patch is None:
                 print("WARNING: Failed to extract image patch: %s." % str(box))
-                patch = np.random.uniform(0., 255., image_shape).astype(np.uint8)
+                patch = np.random.uniform(
+                    0., 255., self.image_shape).astype(np.uint8)
             image_patches.append(patch)
-        image_patches = np.asarray(image_patches)
-        return image_encoder(image_patches, batch_size)
+        return image_patches
+
+    def encode_patches(self, image_patches, batch_size=None):
+        if len(image_patches) == 0:
+            return np.zeros((0, self.feature_dim), np.float32)
+        return self.image_encoder(
+            np.asarray(image_patches), batch_size or self.batch_size)
+
+    def __call__(self, image, boxes):
+        return self.encode_patches(self.extract_patches(image, boxes))
+
+
+def create_box_encoder(model_filename, input_name="images:0", output_name="features:0", batch_size=32):
+    image_encoder = ImageEncoder(model_filename, input_name, output_name)
+    return BoxEncoder(image_encoder, batch_size)
+
 
-    return encoder
+def create_opencv_box_encoder(model_filename, image_shape=(128, 64, 3), batch_size=32):
+    image_encoder = OpenCVImageEncoder(model_filename, image_shape)
+    return BoxEncoder(image_encoder, batch_size)
 
 
 def generate_detections(encoder, mot_dir, output_dir, detection_dir=None):
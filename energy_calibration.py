@@ -0,0 +1,184 @@
+import os
+import json
+import math
+from config import ABNORMAL_ENERGY
+
+ENERGY_CALIBRATION_PATH = 'processed_data/energy_thresholds.json'
+
+class P2Quantile:
+	"""Streaming estimate of the `p` quantile with the P-square algorithm, in constant memory"""
+
+	def __init__(self, p):
+		self.p = p
+		self.count = 0
+		self.initial = []
+		self.heights = None
+
+	def add(self, x):
+		self.count += 1
+		if self.heights is None:
+			self.initial.append(x)
+			if len(self.initial) == 5:
+				p = self.p
+				self.heights = sorted(self.initial)
+				self.positions = [0, 1, 2, 3, 4]
+				self.desired = [0, 2 * p, 4 * p, 2 + 2 * p, 4]
+				self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+			return
+
+		q, n = self.heights, self.positions
+		# Find the cell of the new value, extending the extremes when needed
+		if x < q[0]:
+			q[0] = x
+			k = 0
+		elif x >= q[4]:
+			q[4] = x
+			k = 3
+		else:
+			k = next(i for i in range(4) if x < q[i + 1])
+		for i in range(k + 1, 5):
+			n[i] += 1
+		for i in range(5):
+			self.desired[i] += self.increments[i]
+
+		# Move the middle markers towards their desired positions
+		for i in range(1, 4):
+			d = self.desired[i] - n[i]
+			if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+				d = 1 if d > 0 else -1
+				height = q[i] + d / (n[i + 1] - n[i - 1]) * (
+					(n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+					(n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+				if not q[i - 1] < height < q[i + 1]:
+					height = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+				q[i] = height
+				n[i] += d
+
+	def value(self):
+		if self.heights is not None:
+			return self.heights[2]
+		if not self.initial:
+			return None
+		ordered = sorted(self.initial)
+		return ordered[min(int(self.p * len(ordered)), len(ordered) - 1)]
+
+class EnergyCalibrator:
+	"""Keep the abnormal energy threshold of a camera up to date while it is analysed.
+
+	Like `abnormal_data_process.py`, only the energies of moving individuals
+	are used, outliers are trimmed and the threshold is the mean energy to the
+	power of `exponent`. Energies above the streaming `trim_quantile` quantile
+	are trimmed and the mean and variance are kept with Welford's method, so
+	memory stays constant. The first `min_samples` energies are held back
+	until the quantile estimate is usable and trimmed with it as well.
+	`initial` is used until `min_samples` energies were kept.
+	"""
+
+	def __init__(self, time_step, frame_size, initial=ABNORMAL_ENERGY, trim_quantile=0.99, exponent=1.05,
+		min_samples=500, track_max_age=3):
+		self.stationary_time = math.ceil(track_max_age / time_step)
+		self.stationary_distance = frame_size * 0.01
+		self.exponent = exponent
+		self.min_samples = min_samples
+		self.quantile = P2Quantile(trim_quantile)
+		self.count = 0
+		self.mean = 0.0
+		self.m2 = 0.0
+		self.trimmed = 0
+		self.warmup = []
+		self.threshold = initial
+
+	def add(self, energy):
+		self.quantile.add(energy)
+		if self.warmup is not None:
+			# Hold the first energies back until the quantile can trim them
+			self.warmup.append(energy)
+			if self.quantile.count < self.min_samples:
+				return
+			warmup, self.warmup = self.warmup, None
+			for value in warmup:
+				self._accumulate(value)
+		else:
+			self._accumulate(energy)
+		if self.count >= self.min_samples:
+			self.threshold = int(self.mean ** self.exponent)
+
+	def _accumulate(self, energy):
+		# Welford update of the mean and variance with the energies below the quantile
+		if energy > self.quantile.value():
+			self.trimmed += 1
+			return
+		self.count += 1
+		delta = energy - self.mean
+		self.mean += delta / self.count
+		self.m2 += delta * (energy - self.mean)
+
+	def update(self, tracks, energies):
+		# Skip the individuals that stayed within the stationary distance
+		for track, energy in zip(tracks, energies):
+			positions = track.positions
+			if len(positions) <= self.stationary_time:
+				continue
+			(x, y), (x0, y0) = positions[-1], positions[-1 - self.stationary_time]
+			if math.hypot(x - x0, y - y0) > self.stationary_distance:
+				self.add(float(energy))
+
+	def std(self):
+		return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+	def state(self):
+		quantile = self.quantile
+		return {
+			"threshold": self.threshold,
+			"count": self.count,
+			"mean": self.mean,
+			"m2": self.m2,
+			"trimmed": self.trimmed,
+			"warmup": self.warmup,
+			"quantile": {
+				"count": quantile.count,
+				"initial": quantile.initial,
+				"heights": quantile.heights,
+				"positions": getattr(quantile, 'positions', None),
+				"desired": getattr(quantile, 'desired', None)
+			}
+		}
+
+	def restore(self, state):
+		self.threshold = state["threshold"]
+		self.count = state["count"]
+		self.mean = state["mean"]
+		self.m2 = state["m2"]
+		self.trimmed = state["trimmed"]
+		quantile = state["quantile"]
+		# States saved before the warm-up was held back already counted those energies
+		self.warmup = state.get("warmup", [] if quantile["count"] < self.min_samples and not self.count else None)
+		self.quantile.count = quantile["count"]
+		self.quantile.initial = quantile["initial"]
+		if quantile["heights"] is not None:
+			p = self.quantile.p
+			self.quantile.heights = quantile["heights"]
+			self.quantile.positions = quantile["positions"]
+			self.quantile.desired = quantile["desired"]
+			self.quantile.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+def load_calibrator(camera, time_step, frame_size, path=ENERGY_CALIBRATION_PATH):
+	"""Calibrator of a camera, continuing from the state saved by earlier runs"""
+	calibrator = EnergyCalibrator(time_step, frame_size)
+	if os.path.exists(path):
+		with open(path, 'r') as state_file:
+			states = json.load(state_file)
+		if camera in states:
+			calibrator.restore(states[camera])
+	return calibrator
+
+def save_calibrator(camera, calibrator, path=ENERGY_CALIBRATION_PATH):
+	states = {}
+	if os.path.exists(path):
+		with open(path, 'r') as state_file:
+			states = json.load(state_file)
+	states[camera] = calibrator.state()
+	temp_path = path + '.tmp'
+	with open(temp_path, 'w') as state_file:
+		json.dump(states, state_file)
+	os.replace(temp_path, path)
@@ -6,19 +6,30 @@ import matplotlib
 matplotlib.use('Agg')  # Use non-interactive backend to avoid display issues
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
-import matplotlib.dates as mdates
-import csv
+import os
 import json
+import argparse
 import datetime
 import numpy as np
 import pandas as pd
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import cv2
 import imutils
 from math import ceil, floor
 from scipy.spatial.distance import euclidean
-from colors import RGB_COLORS, gradient_color_RGB
-from config import VIDEO_CONFIG
+from colors import RGB_COLORS
+from crowd_timeline import row_times, draw_count_line, draw_flag_spans, format_time_axis
+from config import VIDEO_CONFIG, PLOT_TIERS, PLOT_EXPORT_DIR
+from plot_dataset import PlotDataset, load_plot_dataset, refresh_track_store, CROWD_DATA_PATH, VIDEO_DATA_PATH
+from plot_cache import PlotCache, split_stale
+from track_store import TRACK_STORE_DIR
+from movement_maps import render_heatmap, draw_trails
+from trajectory import stationary_segments, gather_segments, step_speeds, kinetic_energies
+import crowd_timeline
+import movement_maps
+import trajectory
 
 def create_output_directory():
     """Create output directory for generated plots"""
@@ -26,59 +37,67 @@ def create_output_directory():
     output_dir.mkdir(exist_ok=True)
     return output_dir
 
-def generate_crowd_data_plots(output_dir):
+def save_figure(path, tier):
+    # Save and close the current figure at the resolution of the tier
+    plt.savefig(path, dpi=PLOT_TIERS[tier]["dpi"], bbox_inches='tight')
+    plt.close()
+
+def save_image(path, image, tier):
+    # Previews shrink frame sized images, exports keep the processed frame size
+    max_width = PLOT_TIERS[tier]["max_width"]
+    if max_width and image.shape[1] > max_width:
+        height = round(image.shape[0] * max_width / image.shape[1])
+        image = cv2.resize(image, (max_width, height), interpolation=cv2.INTER_AREA)
+    cv2.imwrite(str(path), image)
+
+def source_video(video_data=None):
+    # Video of the last analysis, the configured one for results saved before it was recorded
+    if video_data is None and os.path.exists(VIDEO_DATA_PATH):
+        with open(VIDEO_DATA_PATH, 'r') as file:
+            video_data = json.load(file)
+    return (video_data or {}).get("VIDEO_PATH") or VIDEO_CONFIG["VIDEO_CAP"]
+
+def generate_crowd_data_plots(output_dir, dataset=None, tier='preview'):
     """Generate crowd data visualization plots using original method"""
     print("📊 Generating crowd data plots...")
     
     try:
-        # Load crowd data exactly as in original system
-        human_count = []
-        violate_count = []
-        restricted_entry = []
-        abnormal_activity = []
-        
-        with open('processed_data/crowd_data.csv', 'r') as file:
-            reader = csv.reader(file, delimiter=',')
-            next(reader)  # Skip header
-            for row in reader:
-                human_count.append(int(row[1]))
-                violate_count.append(int(row[2]))
-                restricted_entry.append(bool(int(row[3])))
-                abnormal_activity.append(bool(int(row[4])))
-
-        # Load video metadata using original format
-        with open('processed_data/video_data.json', 'r') as file:
-            data = json.load(file)
-            data_record_frame = data["DATA_RECORD_FRAME"]
-            is_cam = data["IS_CAM"]
-            vid_fps = data["VID_FPS"]
-            start_time = data["START_TIME"]
+        dataset = dataset or load_plot_dataset()
+        dataset.require('crowd', 'video_data')
+
+        # Crowd data columns as parsed by the shared loader
+        human_count = dataset.crowd['human_count']
+        violate_count = dataset.crowd['violate_count']
+        restricted_entry = dataset.crowd['restricted_entry'].astype(bool)
+        abnormal_activity = dataset.crowd['abnormal_activity'].astype(bool)
+
+        # Video metadata using original format
+        data = dataset.video_data
+        data_record_frame = data["DATA_RECORD_FRAME"]
+        is_cam = data["IS_CAM"]
+        vid_fps = data["VID_FPS"]
+        start_time = data["START_TIME"]
 
         start_time = datetime.datetime.strptime(start_time, "%d/%m/%Y, %H:%M:%S")
         time_steps = data_record_frame / vid_fps
         data_length = len(human_count)
 
         # Create time axis
-        time_axis = []
-        graph_height = max(human_count) if human_count else 10
+        time_axis = row_times(start_time, time_steps, data_length)
+        graph_height = human_count.max() if data_length else 10
 
         fig, ax = plt.subplots(figsize=(12, 8))
-        time = start_time
         
-        for i in range(data_length):
-            time += datetime.timedelta(seconds=time_steps)
-            time_axis.append(time)
-            next_time = time + datetime.timedelta(seconds=time_steps)
-            rect_width = mdates.date2num(next_time) - mdates.date2num(time)
-            
-            if restricted_entry[i]:
-                ax.add_patch(patches.Rectangle((mdates.date2num(time), 0), rect_width, graph_height / 10, facecolor='red', fill=True))
-            if abnormal_activity[i]:
-                ax.add_patch(patches.Rectangle((mdates.date2num(time), 0), rect_width, graph_height / 20, facecolor='blue', fill=True))
+        # Flagged rows as merged spans and count lines with a few points per pixel
+        draw_flag_spans(ax, time_axis, restricted_entry, time_steps, graph_height / 10, 'red')
+        draw_flag_spans(ax, time_axis, abnormal_activity, time_steps, graph_height / 20, 'blue')
+        max_points = int(fig.get_figwidth() * PLOT_TIERS[tier]["dpi"]) * 2
 
         # Plot lines
-        violate_line, = plt.plot(time_axis, violate_count, linewidth=3, label="Violation Count", color='orange')
-        crowd_line, = plt.plot(time_axis, human_count, linewidth=3, label="Crowd Count", color='green')
+        violate_line = draw_count_line(ax, time_axis, violate_count, max_points,
+            linewidth=3, label="Violation Count", color='orange')
+        crowd_line = draw_count_line(ax, time_axis, human_count, max_points,
+            linewidth=3, label="Crowd Count", color='green')
         
         plt.title("Crowd Data Analysis Over Time", fontsize=16, fontweight='bold')
         plt.xlabel("Time", fontsize=12)
@@ -90,15 +109,13 @@ def generate_crowd_data_plots(output_dir):
         plt.legend(handles=[crowd_line, violate_line, re_legend, an_legend], loc='upper right')
         
         # Format x-axis
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
-        ax.xaxis.set_major_locator(mdates.SecondLocator(interval=max(1, int(len(time_axis) / 10))))
+        format_time_axis(ax)
         plt.xticks(rotation=45)
         plt.tight_layout()
         
         # Save plot
         crowd_plot_path = output_dir / 'crowd_data_analysis.png'
-        plt.savefig(crowd_plot_path, dpi=300, bbox_inches='tight')
-        plt.close()
+        save_figure(crowd_plot_path, tier)
         
         print(f"   ✅ Saved: {crowd_plot_path}")
         
@@ -108,41 +125,29 @@ def generate_crowd_data_plots(output_dir):
         print(f"   ❌ Error generating crowd data plots: {str(e)}")
         return False
 
-def generate_movement_plots(output_dir):
+def generate_movement_plots(output_dir, dataset=None, tier='preview'):
     """Generate movement data visualizations"""
     print("🚶 Generating movement plots...")
     
     try:
+        dataset = dataset or load_plot_dataset()
+        dataset.require('video_data')
+
         # Load movement data
-        tracks = []
-        with open('processed_data/movement_data.csv', 'r') as file:
-            reader = csv.reader(file, delimiter=',')
-            for row in reader:
-                if len(row[3:]) > 4:
-                    temp = []
-                    data = row[3:]
-                    for i in range(0, len(data), 2):
-                        if i + 1 < len(data):
-                            try:
-                                temp.append([int(data[i]), int(data[i+1])])
-                            except ValueError:
-                                break
-                    if len(temp) > 2:
-                        tracks.append(temp)
+        tracks = dataset.tracks.point_lists(min_points=3)
 
         if not tracks:
             print("   ⚠️ No movement data available")
             return False
 
-        # Load video metadata
-        with open('processed_data/video_data.json', 'r') as file:
-            data = json.load(file)
-            vid_fps = data["VID_FPS"]
-            data_record_frame = data["DATA_RECORD_FRAME"]
-            frame_size = data["PROCESSED_FRAME_SIZE"]
+        # Video metadata
+        data = dataset.video_data
+        vid_fps = data["VID_FPS"]
+        data_record_frame = data["DATA_RECORD_FRAME"]
+        frame_size = data["PROCESSED_FRAME_SIZE"]
 
         # Get a frame from the video for background
-        cap = cv2.VideoCapture(VIDEO_CONFIG["VIDEO_CAP"])
+        cap = cv2.VideoCapture(source_video(data))
         cap.set(1, 100)  # Set to frame 100
         ret, background_frame = cap.read()
         cap.release()
@@ -153,20 +158,15 @@ def generate_movement_plots(output_dir):
             # Create a blank background if video frame not available
             background_frame = np.zeros((int(frame_size * 0.5625), frame_size, 3), dtype=np.uint8)
 
-        # 1. Generate Optical Flow Visualization
-        tracks_frame = np.copy(background_frame)
-        color1 = (255, 96, 0)
-        color2 = (0, 28, 255)
-        
-        for track in tracks:
-            if len(track) > 1:
-                for i in range(len(track) - 1):
-                    color = gradient_color_RGB(color1, color2, len(track) - 1, i)
-                    cv2.line(tracks_frame, tuple(track[i]), tuple(track[i+1]), color, 2)
+        # 1. Generate Optical Flow Visualization, batched by gradient color over the flat track arrays
+        store = dataset.tracks
+        selected = store.select(min_points=3)
+        x, y, offsets = gather_segments(store.x, store.y, store.offsets[selected], store.offsets[selected + 1])
+        tracks_frame = draw_trails(np.copy(background_frame), x, y, offsets)
 
         # Save optical flow
         optical_flow_path = output_dir / 'optical_flow.png'
-        cv2.imwrite(str(optical_flow_path), tracks_frame)
+        save_image(optical_flow_path, tracks_frame, tier)
         print(f"   ✅ Saved: {optical_flow_path}")
 
         # 2. Generate Heatmap Visualization
@@ -194,56 +194,11 @@ def generate_movement_plots(output_dir):
                 stationary_points.append([last_stationary, stationary_count])
 
         # Create heatmap
-        heatmap_frame = np.copy(background_frame)
-        heatmap = np.zeros((heatmap_frame.shape[0], heatmap_frame.shape[1]), dtype=np.uint8)
-        
-        max_stationary_time = 120
-        blob_layer = 50
-        max_blob_size = frame_size * 0.1
-        layer_size = max_blob_size / blob_layer
-        color_start = 210
-        color_steps = int((color_start - 0) / blob_layer)
-        scale = 1.5
-
-        def draw_blob(frame, coordinates, time):
-            if time >= max_stationary_time:
-                layer = blob_layer
-            else:
-                layer = ceil(time * scale / layer_size)
-            for x in reversed(range(layer)):
-                color = color_start - (color_steps * x)
-                size = x * layer_size
-                cv2.circle(frame, coordinates, int(size), (color, color, color), -1)
-
-        for points in stationary_points:
-            draw_heatmap = np.zeros((heatmap_frame.shape[0], heatmap_frame.shape[1]), dtype=np.uint8)
-            draw_blob(draw_heatmap, tuple(points[0]), points[1])
-            heatmap = cv2.add(heatmap, draw_heatmap)
-
-        # Apply colormap
-        lo = np.array([color_start])
-        hi = np.array([255])
-        mask = cv2.inRange(heatmap, lo, hi)
-        heatmap[mask > 0] = color_start
-
-        heatmap = cv2.applyColorMap(heatmap, cv2.COLORMAP_JET)
-        
-        # Mask out background
-        lo = np.array([128, 0, 0])
-        hi = np.array([136, 0, 0])
-        mask = cv2.inRange(heatmap, lo, hi)
-        heatmap[mask > 0] = (0, 0, 0)
-
-        for row in range(heatmap.shape[0]):
-            for col in range(heatmap.shape[1]):
-                if (heatmap[row][col] == np.array([0, 0, 0])).all():
-                    heatmap[row][col] = heatmap_frame[row][col]
-
-        final_heatmap = cv2.addWeighted(heatmap, 0.75, heatmap_frame, 0.25, 1)
+        final_heatmap = render_heatmap(background_frame, stationary_points, frame_size)
 
         # Save heatmap
         heatmap_path = output_dir / 'heatmap.png'
-        cv2.imwrite(str(heatmap_path), final_heatmap)
+        save_image(heatmap_path, final_heatmap, tier)
         print(f"   ✅ Saved: {heatmap_path}")
 
         return True
@@ -252,17 +207,19 @@ def generate_movement_plots(output_dir):
         print(f"   ❌ Error generating movement plots: {str(e)}")
         return False
 
-def generate_energy_analysis_plots(output_dir):
+def generate_energy_analysis_plots(output_dir, dataset=None, tier='preview'):
     """Generate energy level analysis plots"""
     print("⚡ Generating energy analysis plots...")
     
     try:
-        # Load video metadata
-        with open('processed_data/video_data.json', 'r') as file:
-            data = json.load(file)
-            data_record_frame = data["DATA_RECORD_FRAME"]
-            frame_size = data["PROCESSED_FRAME_SIZE"]
-            vid_fps = data["VID_FPS"]
+        dataset = dataset or load_plot_dataset()
+        dataset.require('video_data')
+
+        # Video metadata
+        data = dataset.video_data
+        data_record_frame = data["DATA_RECORD_FRAME"]
+        frame_size = data["PROCESSED_FRAME_SIZE"]
+        vid_fps = data["VID_FPS"]
 
         track_max_age = 3
         time_steps = data_record_frame / vid_fps
@@ -270,54 +227,16 @@ def generate_energy_analysis_plots(output_dir):
         stationary_distance = frame_size * 0.01
 
         # Load and process tracks
-        tracks = []
-        with open('processed_data/movement_data.csv', 'r') as file:
-            reader = csv.reader(file, delimiter=',')
-            for row in reader:
-                if len(row[3:]) > stationary_time * 2:
-                    temp = []
-                    data = row[3:]
-                    for i in range(0, len(data), 2):
-                        if i + 1 < len(data):
-                            try:
-                                temp.append([int(data[i]), int(data[i+1])])
-                            except ValueError:
-                                break
-                    if len(temp) > stationary_time:
-                        tracks.append(temp)
+        store = dataset.tracks
 
-        if not tracks:
+        if not len(store.select(min_points=stationary_time + 1)):
             print("   ⚠️ No tracking data available for energy analysis")
             return False
 
-        # Process useful tracks and calculate energies
-        useful_tracks = []
-        for movement in tracks:
-            check_index = stationary_time
-            start_point = 0
-            track = movement[:check_index]
-            
-            while check_index < len(movement):
-                for i in movement[check_index:]:
-                    if euclidean(movement[start_point], i) > stationary_distance:
-                        track.append(i)
-                        start_point += 1
-                        check_index += 1
-                    else:
-                        start_point += 1
-                        check_index += 1
-                        break
-                if len(track) > 1:
-                    useful_tracks.append(track)
-                track = movement[start_point:check_index]
-
-        # Calculate energies
-        energies = []
-        for movement in useful_tracks:
-            for i in range(len(movement) - 1):
-                speed = round(euclidean(movement[i], movement[i+1]) / time_steps, 2)
-                energy = int(0.5 * speed ** 2)
-                energies.append(energy)
+        # Keep the moving segments of the tracks and calculate their energies
+        starts, ends = stationary_segments(store.x, store.y, store.offsets, stationary_time, stationary_distance)
+        x, y, offsets = gather_segments(store.x, store.y, starts, ends)
+        energies = kinetic_energies(step_speeds(x, y, offsets, time_steps)).tolist()
 
         if not energies:
             print("   ⚠️ No energy data calculated")
@@ -348,8 +267,7 @@ def generate_energy_analysis_plots(output_dir):
         
         # Save plot
         energy_plot_path = output_dir / 'energy_distribution.png'
-        plt.savefig(energy_plot_path, dpi=300, bbox_inches='tight')
-        plt.close()
+        save_figure(energy_plot_path, tier)
         
         print(f"   ✅ Saved: {energy_plot_path}")
         
@@ -365,8 +283,7 @@ def generate_energy_analysis_plots(output_dir):
         plt.tight_layout()
         
         stats_plot_path = output_dir / 'energy_statistics.png'
-        plt.savefig(stats_plot_path, dpi=300, bbox_inches='tight')
-        plt.close()
+        save_figure(stats_plot_path, tier)
         
         print(f"   ✅ Saved: {stats_plot_path}")
         
@@ -376,13 +293,20 @@ def generate_energy_analysis_plots(output_dir):
         print(f"   ❌ Error generating energy analysis plots: {str(e)}")
         return False
 
-def generate_analytics_summary_plot(output_dir):
+def generate_analytics_summary_plot(output_dir, dataset=None, tier='preview'):
     """Generate a comprehensive analytics summary plot"""
     print("📈 Generating analytics summary plot...")
     
     try:
-        # Load crowd data for summary
-        crowd_data = pd.read_csv('processed_data/crowd_data.csv')
+        dataset = dataset or load_plot_dataset()
+        dataset.require('crowd')
+
+        # Crowd data for summary, in the column order of the CSV
+        crowd_data = pd.DataFrame({
+            'Human Count': dataset.crowd['human_count'],
+            'Social Distance violate': dataset.crowd['violate_count']
+        })
+        crowd_data.insert(0, 'Time', np.arange(len(crowd_data)))
         
         # Create comprehensive dashboard
         fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(15, 12))
@@ -436,8 +360,7 @@ Generated: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"""
 
         # Save analytics summary
         summary_path = output_dir / 'analytics_summary.png'
-        plt.savefig(summary_path, dpi=300, bbox_inches='tight')
-        plt.close()
+        save_figure(summary_path, tier)
         print(f"   ✅ Saved: {summary_path}")
         
         return True
@@ -446,7 +369,67 @@ Generated: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"""
         print(f"   ❌ Error generating analytics summary: {str(e)}")
         return False
 
-def main():
+GENERATORS = [
+    generate_crowd_data_plots,
+    generate_movement_plots,
+    generate_energy_analysis_plots,
+    generate_analytics_summary_plot
+]
+
+def _run_generator(generator, output_dir, handles, tier):
+    # Worker side, rebuild the dataset from the shared memory handles
+    dataset = PlotDataset.attach(handles)
+    try:
+        return generator(output_dir, dataset, tier)
+    finally:
+        dataset.close()
+
+def run_generators(generators, output_dir, dataset, workers=None, tier='preview'):
+    """Run the plot generators in a process pool, or one after the other with a single worker"""
+    workers = min(workers or os.cpu_count() or 1, len(generators))
+    if workers > 1:
+        try:
+            handles = dataset.share()
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_run_generator, generator, output_dir, handles, tier) for generator in generators]
+                return [future.result() for future in futures]
+        except (OSError, BrokenProcessPool) as e:
+            print(f"   ⚠️ Parallel plot generation unavailable ({e}), generating one by one")
+    return [generator(output_dir, dataset, tier) for generator in generators]
+
+def plot_specs(tier='preview'):
+    """Input files, parameters, helper modules and output files of every generator, used to key the plot cache"""
+    track_files = [os.path.join(TRACK_STORE_DIR, name + '.npy') for name in ('track_id', 'offsets', 'x', 'y')]
+    resolution = PLOT_TIERS[tier]
+    video = source_video()
+    return {
+        'generate_crowd_data_plots': {
+            'inputs': [CROWD_DATA_PATH, VIDEO_DATA_PATH],
+            'helpers': [crowd_timeline],
+            'params': resolution,
+            'outputs': ['crowd_data_analysis.png']
+        },
+        'generate_movement_plots': {
+            'inputs': track_files + [VIDEO_DATA_PATH],
+            'stat_inputs': [video],
+            'helpers': [movement_maps, trajectory],
+            'params': dict(resolution, video=video),
+            'outputs': ['optical_flow.png', 'heatmap.png']
+        },
+        'generate_energy_analysis_plots': {
+            'inputs': track_files + [VIDEO_DATA_PATH],
+            'helpers': [trajectory],
+            'params': resolution,
+            'outputs': ['energy_distribution.png', 'energy_statistics.png']
+        },
+        'generate_analytics_summary_plot': {
+            'inputs': [CROWD_DATA_PATH],
+            'params': resolution,
+            'outputs': ['analytics_summary.png']
+        }
+    }
+
+def main(workers=None, force=False, export=False):
     """Main function to generate all visualizations"""
     print("🎨 Enhanced Visualization Generator")
     print("=" * 50)
@@ -456,21 +439,65 @@ def main():
     print(f"📁 Output directory: {output_dir}")
     print()
     
-    # Generate all plots
+    # Previews are always drawn for the dashboard, high resolution exports only on request
+    tiers = [('preview', output_dir)]
+    if export:
+        export_dir = Path(PLOT_EXPORT_DIR)
+        export_dir.mkdir(parents=True, exist_ok=True)
+        tiers.append(('export', export_dir))
+    
+    # Only draw the plots whose inputs, parameters or code changed since the last run
+    refresh_track_store()
+    pending = []
+    fresh_count = 0
+    for tier, tier_dir in tiers:
+        cache = PlotCache(tier_dir)
+        specs = plot_specs(tier)
+        stale, fresh = split_stale(cache, GENERATORS, specs, force)
+        for name in fresh:
+            print(f"⏭️ Up to date ({tier}): {', '.join(specs[name]['outputs'])}")
+        fresh_count += len(fresh)
+        pending.append((tier, tier_dir, cache, specs, stale))
+    
+    # Parse the analysis results once and generate the plots of every tier in parallel
     results = []
-    results.append(generate_crowd_data_plots(output_dir))
-    results.append(generate_movement_plots(output_dir))
-    results.append(generate_energy_analysis_plots(output_dir))
-    results.append(generate_analytics_summary_plot(output_dir))
+    dataset = load_plot_dataset() if any(stale for *_, stale in pending) else None
+    try:
+        for tier, tier_dir, cache, specs, stale in pending:
+            tier_results = []
+            if stale:
+                print(f"🖼️ Drawing {tier} plots ({PLOT_TIERS[tier]['dpi']} dpi) in: {tier_dir}")
+                tier_results = run_generators([generator for generator, _ in stale], tier_dir, dataset, workers, tier)
+            for (generator, key), success in zip(stale, tier_results):
+                if success:
+                    cache.record(generator.__name__, key, specs[generator.__name__]['outputs'])
+                else:
+                    cache.forget(generator.__name__)
+            cache.save()
+            results += tier_results
+    finally:
+        if dataset is not None:
+            dataset.close(unlink=True)
+    results += [True] * fresh_count
     
     # Summary
     print()
     print("📊 Generation Summary:")
-    print(f"   ✅ Successful: {sum(results)}")
+    print(f"   ✅ Successful: {sum(results)} ({fresh_count} up to date)")
     print(f"   ❌ Failed: {len(results) - sum(results)}")
     print()
     print(f"🎯 All generated plots are saved in: {output_dir}")
+    if export:
+        print(f"   High resolution exports for reports are in: {PLOT_EXPORT_DIR}")
     print("   You can view them with any image viewer!")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Save all plots of the last analysis to generated_plots")
+    parser.add_argument("--workers", type=int, default=None,
+        help="Processes generating the plots, 1 generates them one by one.")
+    parser.add_argument("--force", action="store_true",
+        help="Draw every plot again even when its inputs did not change.")
+    parser.add_argument("--export", action="store_true",
+        help="Also save high resolution versions of the plots for reports.")
+    args = parser.parse_args()
+    main(args.workers, args.force, args.export)
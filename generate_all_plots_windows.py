@@ -28,13 +28,19 @@ import sys
 from datetime import datetime, timedelta
 import json
 import csv
+from plot_cache import PlotCache, split_stale
+from config import VIDEO_CONFIG, PLOT_TIERS, PLOT_EXPORT_DIR
+from crowd_timeline import row_times, draw_count_line
+import crowd_timeline
 
-def force_delete_existing_plots(output_dir):
-    """Force delete existing plots - Windows specific"""
+def force_delete_existing_plots(output_dir, names=None):
+    """Force delete existing plots, or only the given ones - Windows specific"""
     try:
         output_dir = Path(output_dir)
         if output_dir.exists():
             for plot_file in output_dir.glob('*.png'):
+                if names is not None and plot_file.name not in names:
+                    continue
                 try:
                     plot_file.unlink()
                     print(f"🗑️ Deleted: {plot_file.name}")
@@ -70,7 +76,7 @@ def create_windows_directory(output_dir):
         print(f"❌ Directory error: {e}")
         return False
 
-def safe_plot_save(plt_obj, file_path, plot_name):
+def safe_plot_save(plt_obj, file_path, plot_name, dpi=PLOT_TIERS['preview']['dpi']):
     """Windows-safe plot saving with verification"""
     try:
         file_path = Path(file_path)
@@ -95,7 +101,7 @@ def safe_plot_save(plt_obj, file_path, plot_name):
                     except Exception:
                         pass
 
-                plt_obj.savefig(str(tmp_path), dpi=300, bbox_inches='tight',
+                plt_obj.savefig(str(tmp_path), dpi=dpi, bbox_inches='tight',
                                 facecolor='white', edgecolor='none')
 
                 # Small delay for filesystem sync
@@ -142,7 +148,7 @@ def safe_plot_save(plt_obj, file_path, plot_name):
         except Exception:
             pass
 
-def generate_crowd_data_plots(output_dir):
+def generate_crowd_data_plots(output_dir, tier='preview'):
     """Generate crowd data visualization plots"""
     print("📊 Generating crowd data plots...")
     
@@ -191,15 +197,14 @@ def generate_crowd_data_plots(output_dir):
             time_steps = 1.0
 
         data_length = len(human_count)
-        time_axis = []
-        time_cursor = start_time
-        for i in range(data_length):
-            time_axis.append(time_cursor)
-            time_cursor = time_cursor + timedelta(seconds=time_steps)
+        time_axis = row_times(start_time, time_steps, data_length, offset=0)
 
         graph_height = max(human_count) if human_count else 10
 
-        crowd_line, = plt.plot(time_axis, human_count, linewidth=3, label="Crowd Count", color='green')
+        # Downsample long recordings to a few points per pixel
+        max_points = int(plt.gcf().get_figwidth() * PLOT_TIERS[tier]['dpi']) * 2
+        crowd_line = draw_count_line(plt.gca(), time_axis, human_count, max_points,
+                                     linewidth=3, label="Crowd Count", color='green')
         
         plt.title("Crowd Data Analysis Over Time", fontsize=16, fontweight='bold')
         plt.xlabel("Time", fontsize=12)
@@ -214,13 +219,13 @@ def generate_crowd_data_plots(output_dir):
         
         # Save plot
         crowd_plot_path = output_dir / 'crowd_data_analysis.png'
-        return safe_plot_save(plt, crowd_plot_path, "Crowd Data Analysis")
+        return safe_plot_save(plt, crowd_plot_path, "Crowd Data Analysis", PLOT_TIERS[tier]['dpi'])
         
     except Exception as e:
         print(f"   ❌ Error generating crowd data plots: {str(e)}")
         return False
 
-def generate_movement_plots(output_dir):
+def generate_movement_plots(output_dir, tier='preview'):
     """Generate movement data visualizations"""
     print("🚶 Generating movement plots...")
     
@@ -292,7 +297,7 @@ def generate_movement_plots(output_dir):
         
         # Save optical flow
         optical_flow_path = output_dir / 'optical_flow.png'
-        success1 = safe_plot_save(plt, optical_flow_path, "Optical Flow")
+        success1 = safe_plot_save(plt, optical_flow_path, "Optical Flow", PLOT_TIERS[tier]['dpi'])
         
         # Generate heatmap
         if tracks:
@@ -322,7 +327,7 @@ def generate_movement_plots(output_dir):
                 
                 # Save heatmap
                 heatmap_path = output_dir / 'heatmap.png'
-                success2 = safe_plot_save(plt, heatmap_path, "Activity Heatmap")
+                success2 = safe_plot_save(plt, heatmap_path, "Activity Heatmap", PLOT_TIERS[tier]['dpi'])
                 
                 return success1 and success2
         
@@ -332,7 +337,7 @@ def generate_movement_plots(output_dir):
         print(f"   ❌ Error generating movement plots: {str(e)}")
         return False
 
-def generate_energy_analysis_plots(output_dir):
+def generate_energy_analysis_plots(output_dir, tier='preview'):
     """Generate energy level analysis plots"""
     print("⚡ Generating energy analysis plots...")
     
@@ -424,7 +429,7 @@ def generate_energy_analysis_plots(output_dir):
 
         # Save plot
         energy_plot_path = output_dir / 'energy_distribution.png'
-        success1 = safe_plot_save(plt, energy_plot_path, "Energy Distribution")
+        success1 = safe_plot_save(plt, energy_plot_path, "Energy Distribution", PLOT_TIERS[tier]['dpi'])
 
         # Generate energy statistics summary
         fig, ax = plt.subplots(figsize=(10, 8))
@@ -458,7 +463,7 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
         ax.set_title('Energy Analysis Statistics', fontsize=16, fontweight='bold', pad=20)
 
         stats_plot_path = output_dir / 'energy_statistics.png'
-        success2 = safe_plot_save(plt, stats_plot_path, "Energy Statistics")
+        success2 = safe_plot_save(plt, stats_plot_path, "Energy Statistics", PLOT_TIERS[tier]['dpi'])
         
         return success1 and success2
         
@@ -466,7 +471,7 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
         print(f"   ❌ Error generating energy analysis plots: {str(e)}")
         return False
 
-def generate_analytics_summary_plot(output_dir):
+def generate_analytics_summary_plot(output_dir, tier='preview'):
     """Generate a comprehensive analytics summary plot"""
     print("📈 Generating analytics summary plot...")
     
@@ -529,13 +534,50 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"""
 
         # Save analytics dashboard
         dashboard_path = output_dir / 'analytics_dashboard.png'
-        return safe_plot_save(plt, dashboard_path, "Analytics Dashboard")
+        return safe_plot_save(plt, dashboard_path, "Analytics Dashboard", PLOT_TIERS[tier]['dpi'])
 
     except Exception as e:
         print(f"   ❌ Error generating analytics summary plot: {str(e)}")
         return False
 
-def main():
+def source_video():
+    # Video of the last analysis, the configured one for results saved before it was recorded
+    video_data = {}
+    if os.path.exists('processed_data/video_data.json'):
+        with open('processed_data/video_data.json', 'r') as file:
+            video_data = json.load(file)
+    return video_data.get('VIDEO_PATH') or VIDEO_CONFIG['VIDEO_CAP']
+
+def plot_specs(tier='preview'):
+    """Input files, resolution, helper modules and output files of every generator, used to key the plot cache"""
+    resolution = PLOT_TIERS[tier]
+    video = source_video()
+    return {
+        'generate_crowd_data_plots': {
+            'inputs': ['processed_data/crowd_data.csv', 'processed_data/video_data.json'],
+            'helpers': [crowd_timeline],
+            'params': resolution,
+            'outputs': ['crowd_data_analysis.png']
+        },
+        'generate_movement_plots': {
+            'inputs': ['processed_data/movement_data.csv', 'processed_data/video_data.json'],
+            'stat_inputs': [video],
+            'params': dict(resolution, video=video),
+            'outputs': ['optical_flow.png', 'heatmap.png']
+        },
+        'generate_energy_analysis_plots': {
+            'inputs': ['processed_data/movement_data.csv', 'processed_data/video_data.json'],
+            'params': resolution,
+            'outputs': ['energy_distribution.png', 'energy_statistics.png']
+        },
+        'generate_analytics_summary_plot': {
+            'inputs': ['processed_data/crowd_data.csv'],
+            'params': resolution,
+            'outputs': ['analytics_dashboard.png']
+        }
+    }
+
+def main(force=False, export=False):
     """Main plot generation with Windows compatibility"""
     print("=" * 60)
     print("   WINDOWS-COMPATIBLE PLOT GENERATION")
@@ -544,12 +586,31 @@ def main():
     # Setup output directory
     output_dir = Path("generated_plots")
     
-    print("🧹 Step 1: Cleaning existing plots...")
-    force_delete_existing_plots(output_dir)
+    # Previews are always drawn for the dashboard, high resolution exports only on request
+    tiers = [('preview', output_dir)]
+    if export:
+        tiers.append(('export', Path(PLOT_EXPORT_DIR)))
+    
+    # Only the plots whose inputs or code changed are deleted and drawn again
+    print("🧹 Step 1: Cleaning outdated plots...")
+    generators = [generate_crowd_data_plots, generate_movement_plots,
+                  generate_energy_analysis_plots, generate_analytics_summary_plot]
+    pending = []
+    fresh_count = 0
+    for tier, tier_dir in tiers:
+        specs = plot_specs(tier)
+        cache = PlotCache(tier_dir)
+        stale, fresh = split_stale(cache, generators, specs, force)
+        for name in fresh:
+            print(f"⏭️ Up to date ({tier}): {', '.join(specs[name]['outputs'])}")
+        force_delete_existing_plots(tier_dir, [output for generator, _ in stale for output in specs[generator.__name__]['outputs']])
+        fresh_count += len(fresh)
+        pending.append((tier, tier_dir, cache, specs, stale))
     
     print("📁 Step 2: Creating fresh directory...")
-    if not create_windows_directory(output_dir):
-        return False
+    for tier, tier_dir in tiers:
+        if not create_windows_directory(tier_dir):
+            return False
     
     # Check for data
     data_file = Path("processed_data/crowd_data.csv")
@@ -565,18 +626,23 @@ def main():
     plt.rcParams.update({'font.size': 10})
     
     plots_created = 0
-    total_plots = 4
+    total_plots = 4 * len(tiers)
     
     print(f"📈 Step 4: Generating {total_plots} visualization plots...")
     
-    # Generate all plots
+    # Generate the outdated plots of every tier
     results = []
-    results.append(generate_crowd_data_plots(output_dir))
-    results.append(generate_movement_plots(output_dir))
-    results.append(generate_energy_analysis_plots(output_dir))
-    results.append(generate_analytics_summary_plot(output_dir))
+    for tier, tier_dir, cache, specs, stale in pending:
+        for generator, key in stale:
+            success = generator(tier_dir, tier)
+            if success:
+                cache.record(generator.__name__, key, specs[generator.__name__]['outputs'])
+            else:
+                cache.forget(generator.__name__)
+            results.append(success)
+        cache.save()
     
-    successful_plots = sum(results)
+    successful_plots = sum(results) + fresh_count
     
     # Final summary
     print("=" * 60)
@@ -601,6 +667,6 @@ def main():
         return False
 
 if __name__ == "__main__":
-    success = main()
+    success = main(force='--force' in sys.argv[1:], export='--export' in sys.argv[1:])
     print(f"\n{'✅ All plots generated successfully!' if success else '❌ Plot generation failed!'}")
     print("💡 Check the generated_plots folder for your visualization files.")
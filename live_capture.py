@@ -0,0 +1,109 @@
+import time
+import threading
+
+class LatestFrameReader:
+	"""Read a live capture on a background thread and keep only its newest frame.
+
+	`read` has the same interface as `cv2.VideoCapture.read` but always returns
+	the freshest frame, frames that were replaced before being read are counted
+	as dropped instead of piling up in the capture buffer. Only the reading
+	thread uses the wrapped capture until `release` stopped it.
+	"""
+
+	def __init__(self, cap):
+		self.cap = cap
+		self.frame = None
+		self.ret = True
+		self.frame_time = None
+		self.read_count = 0
+		self.processed_count = 0
+		self.dropped_count = 0
+		self._fresh = False
+		self._running = True
+		self._condition = threading.Condition()
+		self._thread = threading.Thread(target=self._read_loop, daemon=True)
+		self._thread.start()
+
+	def _read_loop(self):
+		while self._running:
+			(ret, frame) = self.cap.read()
+			with self._condition:
+				if not ret:
+					self.ret = False
+					self._condition.notify_all()
+					return
+				if self._fresh:
+					self.dropped_count += 1
+				self.frame = frame
+				self.frame_time = time.time()
+				self.read_count += 1
+				self._fresh = True
+				self._condition.notify_all()
+
+	def read(self):
+		# Wait for a frame newer than the last one returned
+		with self._condition:
+			while not self._fresh and self.ret:
+				self._condition.wait()
+			if not self._fresh:
+				return (False, None)
+			self._fresh = False
+			self.processed_count += 1
+			return (True, self.frame)
+
+	def frame_age(self):
+		# Seconds since the last returned frame was captured
+		if self.frame_time is None:
+			return 0.0
+		return time.time() - self.frame_time
+
+	def get(self, prop):
+		return self.cap.get(prop)
+
+	def release(self):
+		# Let the pending read finish before releasing the capture under it
+		self._running = False
+		self._thread.join()
+		self.cap.release()
+
+class AdaptiveRate:
+	"""Pace live processing to the record rate, or to the measured cost when slower.
+
+	Processing never runs more often than `target_rate` times per second, and
+	when a frame takes longer than that the effective rate falls to what the
+	machine can sustain so the reader keeps dropping stale frames instead.
+	"""
+
+	def __init__(self, target_rate, smoothing=0.2):
+		self.target_interval = 1.0 / target_rate
+		self.smoothing = smoothing
+		self.cost = None
+		self._start = None
+		self._last = None
+
+	def start(self):
+		now = time.time()
+		# Wait for the next slot when processing is faster than the record rate
+		if self._last is not None:
+			delay = self._last + self.interval() - now
+			if delay > 0:
+				time.sleep(delay)
+				now = time.time()
+		self._start = now
+		self._last = now
+
+	def done(self):
+		# Record the cost of the frame started last
+		cost = time.time() - self._start
+		if self.cost is None:
+			self.cost = cost
+		else:
+			self.cost = self.smoothing * cost + (1 - self.smoothing) * self.cost
+
+	def interval(self):
+		if self.cost is None:
+			return self.target_interval
+		return max(self.target_interval, self.cost)
+
+	def effective_rate(self):
+		return 1.0 / self.interval()
@@ -0,0 +1,121 @@
+import os
+from data_writer import CROWD_HEADER
+
+class CrowdStats:
+	"""Running aggregates of the crowd data rows of an analysis.
+
+	Every row updates the counters in constant time, so the summary of a
+	run stays as cheap to read after hours of video as after a few frames.
+	`summary` has the keys of AnalyticsStore.crowd_summary plus the number
+	of frames with a violation, restricted entry or abnormal activity.
+	"""
+
+	def __init__(self):
+		self.rows = 0
+		self.people_sum = 0
+		self.max_people = 0
+		self.violations_sum = 0
+		self.max_violations = 0
+		self.violation_frames = 0
+		self.restricted_frames = 0
+		self.abnormal_frames = 0
+		self.start = None
+		self.end = None
+		self.last_people = 0
+		self.last_violations = 0
+
+	def add(self, time, people, violations, restricted=False, abnormal=False):
+		if self.rows == 0:
+			self.start = time
+		self.end = time
+		self.rows += 1
+		self.people_sum += people
+		self.violations_sum += violations
+		self.max_people = max(self.max_people, people)
+		self.max_violations = max(self.max_violations, violations)
+		self.violation_frames += violations > 0
+		self.restricted_frames += bool(restricted)
+		self.abnormal_frames += bool(abnormal)
+		self.last_people = people
+		self.last_violations = violations
+
+	def summary(self):
+		if not self.rows:
+			return None
+		return {
+			'rows': self.rows,
+			'max_people': self.max_people,
+			'avg_people': self.people_sum / self.rows,
+			'max_violations': self.max_violations,
+			'avg_violations': self.violations_sum / self.rows,
+			'total_violations': self.violations_sum,
+			'violation_frames': self.violation_frames,
+			'restricted_frames': self.restricted_frames,
+			'abnormal_frames': self.abnormal_frames,
+			'start': self.start,
+			'end': self.end,
+			'last_people': self.last_people,
+			'last_violations': self.last_violations
+		}
+
+def _parse_time(value):
+	# Frame numbers of videos, time stamps of live cameras are kept as text
+	try:
+		return float(value)
+	except ValueError:
+		return value
+
+class CrowdDataTail:
+	"""Follow a crowd data CSV file while it is written, parsing every row once.
+
+	`poll` reads the bytes appended since the previous call and adds the
+	complete rows to `stats`, an unfinished last line waits for the next
+	poll. A file that was replaced or truncated, e.g. by a new analysis, is
+	read again from the start with fresh statistics.
+	"""
+
+	def __init__(self, path):
+		self.path = path
+		self._reset(None)
+
+	def _reset(self, identity):
+		self.identity = identity
+		self.offset = 0
+		self.pending = b''
+		self.columns = None
+		self.stats = CrowdStats()
+
+	def poll(self):
+		"""Number of rows added since the last poll"""
+		try:
+			stat = os.stat(self.path)
+		except OSError:
+			return 0
+		identity = (stat.st_dev, stat.st_ino)
+		if identity != self.identity or stat.st_size < self.offset:
+			self._reset(identity)
+		if stat.st_size == self.offset:
+			return 0
+		with open(self.path, 'rb') as data_file:
+			data_file.seek(self.offset)
+			data = data_file.read(stat.st_size - self.offset)
+		self.offset += len(data)
+		lines = (self.pending + data).split(b'\n')
+		self.pending = lines.pop()
+		added = 0
+		for line in lines:
+			fields = line.decode('utf-8').rstrip('\r').split(',')
+			if self.columns is None:
+				self.columns = [fields.index(name) if name in fields else None for name in CROWD_HEADER]
+				continue
+			if len(fields) < 3:
+				continue
+			time, people, violations, restricted, abnormal = [
+				fields[column] if column is not None and column < len(fields) else '0' for column in self.columns]
+			self.stats.add(_parse_time(time), int(people), int(violations), restricted == '1', abnormal == '1')
+			added += 1
+		return added
+
+	def summary(self):
+		self.poll()
+		return self.stats.summary()
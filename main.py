@@ -1,114 +1,50 @@
-from config import YOLO_CONFIG, VIDEO_CONFIG, SHOW_PROCESSING_OUTPUT, DATA_RECORD_RATE, FRAME_SIZE, TRACK_MAX_AGE
-
-if FRAME_SIZE > 1920:
+import argparse
+from config import YOLO_CONFIG
+from analysis_config import AnalysisConfig, default_config
+
+parser = argparse.ArgumentParser(description="Crowd analysis of the video configured in config.py")
+parser.add_argument("--resume", action="store_true",
+	help="Continue from the last checkpoint and append to the existing data files.")
+parser.add_argument("--checkpoint", default="processed_data/checkpoint.pkl",
+	help="Checkpoint file saved while the analysis runs.")
+parser.add_argument("--server", action="store_true",
+	help="Send the analysis to the running model server instead of loading the models.")
+parser.add_argument("--config", metavar="FILE",
+	help="JSON or YAML file with the settings of this analysis, the missing ones come from config.py.")
+parser.add_argument("--video",
+	help="Video file or stream to analyse instead of the configured one.")
+parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+	help="Change one setting, e.g. --set SOCIAL_DISTANCE=40. Can be repeated.")
+args = parser.parse_args()
+
+settings = AnalysisConfig.load(args.config) if args.config else default_config()
+settings = settings.override(args.set)
+if args.video:
+	settings = settings.replace(video_cap=args.video)
+
+if settings.frame_size > 1920:
 	print("Frame size is too large!")
 	quit()
-elif FRAME_SIZE < 480:
+elif settings.frame_size < 480:
 	print("Frame size is too small! You won't see anything")
 	quit()
 
-import datetime
-import time
-import numpy as np
-import imutils
-import cv2
-import os
-import csv
-import json
-from video_process import video_process
-from deep_sort import nn_matching
-from deep_sort.detection import Detection
-from deep_sort.tracker import Tracker
-from deep_sort import generate_detections as gdet
-
-# Read from video
-IS_CAM = VIDEO_CONFIG["IS_CAM"]
-cap = cv2.VideoCapture(VIDEO_CONFIG["VIDEO_CAP"])
-
-# Load YOLOv3-tiny weights and config
-WEIGHTS_PATH = YOLO_CONFIG["WEIGHTS_PATH"]
-CONFIG_PATH = YOLO_CONFIG["CONFIG_PATH"]
-
-# Load the YOLOv3-tiny pre-trained COCO dataset 
-net = cv2.dnn.readNetFromDarknet(CONFIG_PATH, WEIGHTS_PATH)
-# Set the preferable backend to CPU since we are not using GPU
-net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
-net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
-
-# Get the names of all the layers in the network
-ln = net.getLayerNames()
-# Filter out the layer names we dont need for YOLO
-ln = [ln[i - 1] for i in net.getUnconnectedOutLayers()]
-
-# Tracker parameters
-max_cosine_distance = 0.7
-nn_budget = None
-
-#initialize deep sort object
-if IS_CAM: 
-	max_age = VIDEO_CONFIG["CAM_APPROX_FPS"] * TRACK_MAX_AGE
-else:
-	max_age=DATA_RECORD_RATE * TRACK_MAX_AGE
-	if max_age > 30:
-		max_age = 30
-model_filename = 'model_data/mars-small128.pb'
-encoder = gdet.create_box_encoder(model_filename, batch_size=1)
-metric = nn_matching.NearestNeighborDistanceMetric("cosine", max_cosine_distance, nn_budget)
-tracker = Tracker(metric, max_age=max_age)
-
-if not os.path.exists('processed_data'):
-	os.makedirs('processed_data')
-
-movement_data_file = open('processed_data/movement_data.csv', 'w') 
-crowd_data_file = open('processed_data/crowd_data.csv', 'w')
-# sd_violate_data_file = open('sd_violate_data.csv', 'w')
-# restricted_entry_data_file = open('restricted_entry_data.csv', 'w')
-
-movement_data_writer = csv.writer(movement_data_file)
-crowd_data_writer = csv.writer(crowd_data_file)
-# sd_violate_writer = csv.writer(sd_violate_data_file)
-# restricted_entry_data_writer = csv.writer(restricted_entry_data_file)
-
-if os.path.getsize('processed_data/movement_data.csv') == 0:
-	movement_data_writer.writerow(['Track ID', 'Entry time', 'Exit Time', 'Movement Tracks'])
-if os.path.getsize('processed_data/crowd_data.csv') == 0:
-	crowd_data_writer.writerow(['Time', 'Human Count', 'Social Distance violate', 'Restricted Entry', 'Abnormal Activity'])
-
-START_TIME = time.time()
-
-processing_FPS = video_process(cap, FRAME_SIZE, net, ln, encoder, tracker, movement_data_writer, crowd_data_writer)
-cv2.destroyAllWindows()
-movement_data_file.close()
-crowd_data_file.close()
-
-END_TIME = time.time()
-PROCESS_TIME = END_TIME - START_TIME
-print("Time elapsed: ", PROCESS_TIME)
-if IS_CAM:
-	print("Processed FPS: ", processing_FPS)
-	VID_FPS = processing_FPS
-	DATA_RECORD_FRAME = 1
-else:
-	print("Processed FPS: ", round(cap.get(cv2.CAP_PROP_FRAME_COUNT) / PROCESS_TIME, 2))
-	VID_FPS = cap.get(cv2.CAP_PROP_FPS)
-	DATA_RECORD_FRAME = int(VID_FPS / DATA_RECORD_RATE)
-	START_TIME = VIDEO_CONFIG["START_TIME"]
-	time_elapsed = round(cap.get(cv2.CAP_PROP_FRAME_COUNT) / VID_FPS)
-	END_TIME = START_TIME + datetime.timedelta(seconds=time_elapsed)
-
-
-cap.release()
+# The model server keeps warm models, only the progress is shown here
+if args.server:
+	from util import progress
+	from model_server import submit
+	for kind, value in submit(settings.video_cap, resume=args.resume, checkpoint=args.checkpoint, settings=settings):
+		if kind == "progress":
+			progress(value["frame"])
+		elif kind == "error":
+			print(value)
+	quit()
 
-video_data = {
-	"IS_CAM": IS_CAM,
-	"DATA_RECORD_FRAME" : DATA_RECORD_FRAME,
-	"VID_FPS" : VID_FPS,
-	"PROCESSED_FRAME_SIZE": FRAME_SIZE,
-	"TRACK_MAX_AGE": TRACK_MAX_AGE,
-	"START_TIME": START_TIME.strftime("%d/%m/%Y, %H:%M:%S"),
-	"END_TIME": END_TIME.strftime("%d/%m/%Y, %H:%M:%S")
-}
+from models import load_detector, load_encoder
+from analysis_run import analyze_video
 
-with open('processed_data/video_data.json', 'w') as video_data_file:
-	json.dump(video_data, video_data_file)
+# Load YOLOv4-tiny weights and config
+net, ln = load_detector(YOLO_CONFIG["CONFIG_PATH"], YOLO_CONFIG["WEIGHTS_PATH"])
+encoder = load_encoder()
 
+analyze_video(net, ln, encoder, checkpoint_path=args.checkpoint, resume=args.resume, settings=settings)
@@ -0,0 +1,239 @@
+import os
+import sys
+import argparse
+import secrets
+import threading
+import traceback
+from multiprocessing.connection import Listener, Client
+from config import YOLO_CONFIG, FRAME_SIZE, MODEL_SERVER_ADDRESS
+
+def runtime_dir():
+	"""Private directory of the current user holding the key and socket of the server.
+
+	XDG_RUNTIME_DIR when it is set, otherwise ~/.cache/crowd_model_server
+	created with mode 0700. The directory must belong to the user and be
+	closed to everyone else, any other user able to read the key could make
+	the server unpickle their messages.
+	"""
+	base = os.environ.get('XDG_RUNTIME_DIR')
+	if base and os.path.isdir(base):
+		path = os.path.join(base, 'crowd_model_server')
+	else:
+		path = os.path.join(os.path.expanduser('~'), '.cache', 'crowd_model_server')
+	os.makedirs(path, mode=0o700, exist_ok=True)
+	_check_private(os.stat(path), path)
+	return path
+
+def _check_private(stat, path):
+	# Owned by the current user and not accessible to group or others
+	if os.name == 'nt':
+		return
+	if stat.st_uid != os.getuid() or stat.st_mode & 0o077:
+		raise PermissionError("{} must belong to the current user and have no group or other permissions".format(path))
+
+def default_key_path():
+	return os.path.join(runtime_dir(), 'server.key')
+
+def default_address():
+	# Unix socket where available, a local TCP port on Windows
+	if MODEL_SERVER_ADDRESS is not None:
+		return MODEL_SERVER_ADDRESS
+	if os.name != 'nt':
+		return os.path.join(runtime_dir(), 'server.sock')
+	return ('127.0.0.1', 6017)
+
+def _read_key(key_path):
+	flags = os.O_RDONLY | getattr(os, 'O_NOFOLLOW', 0)
+	with os.fdopen(os.open(key_path, flags), 'rb') as key_file:
+		_check_private(os.fstat(key_file.fileno()), key_path)
+		return key_file.read()
+
+def _write_key(key_path):
+	# A fresh key per server, created by this process and only readable by its user
+	if os.path.lexists(key_path):
+		os.remove(key_path)
+	key = secrets.token_bytes(32)
+	descriptor = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_NOFOLLOW', 0), 0o600)
+	with os.fdopen(descriptor, 'wb') as key_file:
+		key_file.write(key)
+	return key
+
+class ModelServer:
+	"""Long lived process holding warmed up models and analysing the videos sent by clients.
+
+	Jobs are dictionaries with the `video` path, the working directory `cwd`
+	the results are saved under, `resume`, `frames` and the AnalysisConfig
+	`settings`, config.py being used when it is None. While a job runs the
+	crowd statistics of every analysed frame are sent back as ("progress",
+	stats), with ("frame", jpeg bytes) as well when `frames` is set, then
+	("done", video data) or ("error", traceback). Every client is served on
+	its own thread so pings are answered while a job runs, the jobs run one
+	at a time and a client closing its connection stops its job.
+	"""
+
+	def __init__(self, address=None, key_path=None):
+		from models import load_detector, load_encoder, warm_up
+		self.address = address or default_address()
+		self.key_path = key_path or default_key_path()
+		self.net, self.ln = load_detector(YOLO_CONFIG["CONFIG_PATH"], YOLO_CONFIG["WEIGHTS_PATH"])
+		self.encoder = load_encoder()
+		warm_up(self.net, self.ln, self.encoder, FRAME_SIZE)
+		self.running = False
+
+	def serve_forever(self):
+		if isinstance(self.address, str) and os.path.exists(self.address):
+			os.remove(self.address)
+		self.key = _write_key(self.key_path)
+		self.job_lock = threading.Lock()
+		self.running = True
+		with Listener(self.address, authkey=self.key) as listener:
+			print("Model server listening on", self.address)
+			while True:
+				try:
+					connection = listener.accept()
+				except (OSError, EOFError) as e:
+					# Failed handshakes, e.g. a client with a stale key
+					print("Rejected connection:", e)
+					continue
+				if not self.running:
+					connection.close()
+					break
+				threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+	def _serve(self, connection):
+		with connection:
+			self.handle(connection)
+
+	def handle(self, connection):
+		try:
+			job = connection.recv()
+		except (OSError, EOFError):
+			return
+		if job == "shutdown":
+			self.running = False
+			connection.send(("done", None))
+			# Wake up the accept loop so it sees the server is stopping
+			try:
+				Client(self.address, authkey=self.key).close()
+			except (OSError, EOFError):
+				pass
+			return
+		if job == "ping":
+			connection.send(("done", None))
+			return
+
+		import cv2
+		connected = True
+
+		def on_frame(frame, stats):
+			nonlocal connected
+			try:
+				connection.send(("progress", stats))
+				if job.get("frames"):
+					connection.send(("frame", cv2.imencode('.jpg', frame)[1].tobytes()))
+			except (OSError, EOFError):
+				# The client went away, stop and keep what was analysed
+				connected = False
+			return connected
+
+		from analysis_run import analyze_video
+		# Jobs share the models and the working directory of the process
+		with self.job_lock:
+			cwd = os.getcwd()
+			try:
+				os.chdir(job.get("cwd", cwd))
+				video_data = analyze_video(self.net, self.ln, self.encoder, job["video"],
+					checkpoint_path=job.get("checkpoint", 'processed_data/checkpoint.pkl'),
+					resume=job.get("resume", False), frame_callback=on_frame, settings=job.get("settings"))
+				event = ("done", video_data)
+			except Exception:
+				event = ("error", traceback.format_exc())
+			finally:
+				os.chdir(cwd)
+		if connected:
+			try:
+				connection.send(event)
+			except (OSError, EOFError):
+				pass
+
+def _connect(address, key_path):
+	return Client(address or default_address(), authkey=_read_key(key_path or default_key_path()))
+
+def server_available(address=None, key_path=None):
+	# True when a model server answers on the address
+	try:
+		with _connect(address, key_path) as connection:
+			connection.send("ping")
+			return connection.recv()[0] == "done"
+	except (OSError, EOFError, ValueError):
+		return False
+
+def submit(video_path, resume=False, frames=False, checkpoint='processed_data/checkpoint.pkl', settings=None, address=None,
+	key_path=None):
+	"""Send a job to the running model server and yield its events as they arrive"""
+	job = {
+		"video": os.path.abspath(video_path) if os.path.exists(video_path) else video_path,
+		"cwd": os.getcwd(),
+		"resume": resume,
+		"frames": frames,
+		"checkpoint": checkpoint,
+		"settings": settings
+	}
+	with _connect(address, key_path) as connection:
+		connection.send(job)
+		while True:
+			kind, value = connection.recv()
+			yield kind, value
+			if kind in ("done", "error"):
+				return
+
+def decode_frame(data):
+	import numpy as np
+	import cv2
+	return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+def shutdown(address=None, key_path=None):
+	with _connect(address, key_path) as connection:
+		connection.send("shutdown")
+		connection.recv()
+
+def parse_args():
+	parser = argparse.ArgumentParser(description="Keep the detection models loaded and analyse the videos sent to it")
+	parser.add_argument("--address", default=None,
+		help="Unix socket path or HOST:PORT to listen on or connect to.")
+	parser.add_argument("--submit", metavar="VIDEO",
+		help="Send a video to the running server and print its progress instead of serving.")
+	parser.add_argument("--resume", action="store_true",
+		help="Continue the submitted video from its last checkpoint.")
+	parser.add_argument("--shutdown", action="store_true",
+		help="Stop the running server.")
+	return parser.parse_args()
+
+def _parse_address(value):
+	if value is None or ':' not in value or os.path.sep in value:
+		return value
+	host, port = value.rsplit(':', 1)
+	return (host, int(port))
+
+def main():
+	args = parse_args()
+	address = _parse_address(args.address)
+	if args.shutdown:
+		shutdown(address)
+	elif args.submit:
+		for kind, value in submit(args.submit, resume=args.resume, address=address):
+			if kind == "progress":
+				total = value["total"] or "?"
+				sys.stdout.write("\rFrame {}/{}  crowd {}  violations {}  {:.1f} FPS ".format(
+					value["frame"], total, value["count"], value["violations"], value["fps"]))
+				sys.stdout.flush()
+			elif kind == "error":
+				print("\nAnalysis failed:\n" + value)
+				sys.exit(1)
+			else:
+				print("\nAnalysis complete")
+	else:
+		ModelServer(address).serve_forever()
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,58 @@
+import cv2
+import numpy as np
+from deep_sort import nn_matching
+from deep_sort.tracker import Tracker
+from config import REID_BACKEND, REID_ONNX_MODEL
+
+# Re-ID model used by the deep sort encoder
+ENCODER_MODEL = 'model_data/mars-small128.pb'
+# Tracker parameters
+MAX_COSINE_DISTANCE = 0.7
+NN_BUDGET = None
+
+def load_detector(config_path, weights_path):
+	# Load the YOLOv4-tiny pre-trained COCO dataset
+	net = cv2.dnn.readNetFromDarknet(config_path, weights_path)
+	# Set the preferable backend to CPU since we are not using GPU
+	net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+	net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+
+	# Get the names of all the layers in the network
+	ln = net.getLayerNames()
+	# Filter out the layer names we dont need for YOLO
+	ln = [ln[i - 1] for i in net.getUnconnectedOutLayers()]
+	return net, ln
+
+def load_encoder(model_filename=None, batch_size=1, backend=REID_BACKEND):
+	# TensorFlow is only imported by the "tensorflow" backend, "opencv" runs an ONNX export of the model
+	from deep_sort import generate_detections as gdet
+	if backend == "opencv":
+		return gdet.create_opencv_box_encoder(model_filename or REID_ONNX_MODEL, batch_size=batch_size)
+	if backend != "tensorflow":
+		raise ValueError("Unknown re-ID backend: {}".format(backend))
+	return gdet.create_box_encoder(model_filename or ENCODER_MODEL, batch_size=batch_size)
+
+def tracker_max_age(is_cam, cam_rate, data_record_rate, track_max_age):
+	# Number of processed frames a track may stay unmatched before it is recorded,
+	# `cam_rate` is the number of frames of a live camera processed per second
+	if is_cam:
+		return cam_rate * track_max_age
+	return min(data_record_rate * track_max_age, 30)
+
+def create_tracker(max_age):
+	# Every feed needs its own tracker, the models above can be shared
+	metric = nn_matching.NearestNeighborDistanceMetric("cosine", MAX_COSINE_DISTANCE, NN_BUDGET)
+	return Tracker(metric, max_age=max_age)
+
+def tracker_for(settings):
+	# Tracker of an analysis configured by an AnalysisConfig, video_process paces
+	# live cameras to the record rate so their tracks age at that rate
+	return create_tracker(tracker_max_age(settings.is_cam, settings.data_record_rate, settings.data_record_rate,
+		settings.track_max_age))
+
+def warm_up(net, ln, encoder, frame_size=1080):
+	# Run both models once so the first analysed frame does not pay for their lazy initialisation
+	frame = np.zeros((frame_size * 9 // 16, frame_size, 3), dtype=np.uint8)
+	net.setInput(cv2.dnn.blobFromImage(frame, 1 / 255.0, (416, 416), swapRB=True, crop=False))
+	net.forward(ln)
+	encoder(frame, [[0, 0, 64, 128]])
@@ -11,11 +11,11 @@ import os
 import threading
 import subprocess
 import time
-import cv2
-import numpy as np
-from PIL import Image, ImageTk
 import json
 import io
+from analysis_engine import AnalysisEngine
+from analysis_config import AnalysisConfig
+from live_stats import CrowdStats, CrowdDataTail
 
 # Set appearance mode and color theme
 ctk.set_appearance_mode("dark")  # "system", "light", "dark"
@@ -49,6 +49,7 @@ class CrowdAnalysisStudio:
         self.current_frame = None
         self.video_capture = None
         self.analysis_thread = None
+        self.engine = None
         self.frame_count = 0
         self.people_count = 0
         self.violations_count = 0
@@ -62,6 +63,10 @@ class CrowdAnalysisStudio:
         self.max_people_count = 0
         self.avg_people_count = 0.0
         self.total_violations = 0
+        
+        # Running aggregates of the analysis in progress and a reader only parsing new crowd data rows
+        self.live_stats = CrowdStats()
+        self.crowd_tail = CrowdDataTail('processed_data/crowd_data.csv')
     
     def setup_layout(self):
         """Create main layout structure"""
@@ -786,14 +791,57 @@ class CrowdAnalysisStudio:
         
         # Generate report from data
         self.generate_analysis_report(report_frame)
+        
+        # High resolution plots are only drawn when a report is exported
+        export_btn = ctk.CTkButton(report_frame,
+                                  text="💾 Export High Resolution Plots",
+                                  width=240,
+                                  height=35,
+                                  font=ctk.CTkFont(size=12),
+                                  command=self.export_report_plots)
+        export_btn.pack(pady=(5, 15))
+    
+    def run_plot_generator(self, *options):
+        """Run the platform-appropriate plot generator and return its completed process"""
+        # Prefer the Windows-specific script when on Windows
+        win_script = 'generate_all_plots_windows.py'
+        orig_script = 'generate_all_plots.py'
+        if sys.platform.startswith('win') and os.path.exists(win_script):
+            plot_script = win_script
+        else:
+            plot_script = orig_script
+
+        print(f"📊 Using plot generator: {plot_script}")
+        # Ensure matplotlib can write its runtime config inside the workspace to avoid permission issues on Windows
+        env = os.environ.copy()
+        mpl_tmp = os.path.join(os.getcwd(), 'generated_plots', '.mplconfig')
+        env['MPLCONFIGDIR'] = mpl_tmp
+        env['PYTHONIOENCODING'] = 'utf-8'
+        os.makedirs(mpl_tmp, exist_ok=True)
+
+        return subprocess.run([sys.executable, plot_script, *options],
+                              capture_output=True, text=True, cwd=os.getcwd(), env=env)
+    
+    def export_report_plots(self):
+        """Save high resolution plots for a report without blocking the dashboard"""
+        import config
+        def export():
+            self.show_status("💾 Exporting high resolution plots...", "blue")
+            result = self.run_plot_generator('--export')
+            if result.returncode == 0:
+                self.show_status(f"✅ Report plots saved in {config.PLOT_EXPORT_DIR}", "green")
+            else:
+                print(f"❌ Plot export failed: {result.stderr}")
+                self.show_status("⚠️ Exporting report plots had issues", "orange")
+        
+        threading.Thread(target=export, daemon=True).start()
     
     def generate_analysis_report(self, parent_frame):
         """Generate a comprehensive analysis report"""
         try:
-            import pandas as pd
-            df = pd.read_csv('processed_data/crowd_data.csv')
+            summary = self.read_crowd_summary()
             
-            if df.empty:
+            if not summary:
                 no_data_label = ctk.CTkLabel(parent_frame, 
                                             text="No data found in analysis results",
                                             font=ctk.CTkFont(size=12),
@@ -809,10 +857,10 @@ class CrowdAnalysisStudio:
                         font=ctk.CTkFont(size=14, weight="bold")).pack(pady=(15, 10))
             
             # Calculate statistics
-            max_people = df['Human Count'].max()
-            avg_people = df['Human Count'].mean()
-            max_violations = df['Social Distance violate'].max()  # Maximum violations per frame
-            avg_violations = df['Social Distance violate'].mean()  # Average violations per frame
+            max_people = summary['max_people']
+            avg_people = summary['avg_people']
+            max_violations = summary['max_violations']  # Maximum violations per frame
+            avg_violations = summary['avg_violations']  # Average violations per frame
             
             # Display statistics
             stats_text = f"""
@@ -820,8 +868,8 @@ class CrowdAnalysisStudio:
 📈 Average crowd size: {avg_people:.1f}
 ⚠️ Maximum violations per frame: {max_violations}
 � Average violations per frame: {avg_violations:.1f}
-📹 Total frames analyzed: {len(df)}
-⏱️ Analysis duration: {df['Time'].max() - df['Time'].min():.1f} seconds
+📹 Total frames analyzed: {summary['rows']}
+⏱️ Analysis duration: {summary['end'] - summary['start']:.1f} seconds
             """.strip()
             
             stats_label = ctk.CTkLabel(summary_frame, text=stats_text, 
@@ -953,9 +1001,6 @@ class CrowdAnalysisStudio:
         # Hide placeholder, show video label
         self.preview_placeholder.place_forget()
         
-        # Update config file with video path
-        self.update_config_file(video_path)
-        
         # Start analysis in background thread - simple approach
         self.analysis_thread = threading.Thread(target=self.run_analysis_simple, args=(video_path,))
         self.analysis_thread.daemon = True
@@ -967,6 +1012,10 @@ class CrowdAnalysisStudio:
         
         self.is_analyzing = False
         
+        # The engine stops after saving the results of the frames analysed so far
+        if self.engine:
+            self.engine.stop()
+        
         # Reset analysis completion flags
         self.analysis_completed = False
         self.has_final_data = False
@@ -993,37 +1042,13 @@ class CrowdAnalysisStudio:
         self.reset_statistics()
         print("🔄 Statistics and UI reset complete")
     
-    def update_config_file(self, video_path):
-        """Update config.py with the selected video path"""
-        try:
-            with open('config.py', 'r') as f:
-                content = f.read()
-            
-            lines = content.split('\n')
-            updated_lines = []
-            
-            for line in lines:
-                # Look for the VIDEO_CAP line inside VIDEO_CONFIG dictionary
-                if '"VIDEO_CAP"' in line and ':' in line:
-                    # Replace the video path in the dictionary format
-                    updated_line = f'\t"VIDEO_CAP" : "{video_path}",'
-                    updated_lines.append(updated_line)
-                    print(f"📝 Updated VIDEO_CAP to: {video_path}")
-                else:
-                    updated_lines.append(line)
-            
-            with open('config.py', 'w') as f:
-                f.write('\n'.join(updated_lines))
-                
-        except Exception as e:
-            print(f"❌ Error updating config: {e}")
-    
     def run_analysis(self, video_path):
         """Run the actual crowd analysis with live detection preview"""
         try:
             self.show_status("🔄 Starting detection analysis...", "blue")
             
             # Import the video processing modules
+            import cv2
             import video_process
             import config
             
@@ -1093,24 +1118,7 @@ class CrowdAnalysisStudio:
                     # Generate plots with original visualization system
                     self.show_status("🎨 Generating visualization plots...", "blue")
                     
-                    # Pick platform-appropriate plot generator. Prefer Windows-specific script when on Windows.
-                    win_script = 'generate_all_plots_windows.py'
-                    orig_script = 'generate_all_plots.py'
-                    if sys.platform.startswith('win') and os.path.exists(win_script):
-                        plot_script = win_script
-                    else:
-                        plot_script = orig_script
-
-                    print(f"📊 Using plot generator: {plot_script}")
-                    # Ensure matplotlib can write its runtime config inside the workspace to avoid permission issues on Windows
-                    env = os.environ.copy()
-                    mpl_tmp = os.path.join(os.getcwd(), 'generated_plots', '.mplconfig')
-                    env['MPLCONFIGDIR'] = mpl_tmp
-                    env['PYTHONIOENCODING'] = 'utf-8'
-                    os.makedirs(mpl_tmp, exist_ok=True)
-
-                    plot_result = subprocess.run([sys.executable, plot_script],
-                                                 capture_output=True, text=True, cwd=os.getcwd(), env=env)
+                    plot_result = self.run_plot_generator()
                     
                     if plot_result.returncode == 0:
                         print("✅ Plots generated successfully")
@@ -1136,34 +1144,28 @@ class CrowdAnalysisStudio:
             self.show_status(f"❌ Error: {str(e)}", "red")
     
     def run_analysis_simple(self, video_path):
-        """Run analysis with simple video preview and separate OpenCV detection window"""
+        """Run analysis in the engine worker, showing its annotated frames and real progress"""
         try:
             self.analysis_completed = False  # Flag to track completion
             self.show_status("🎬 ANALYSIS PHASE 1 - Loading video and config...", "blue")
             self.update_progress_panel("10%", "🔧 Loading Configuration")
             
-            # Update config file with current video path
-            self.update_config_file(video_path)
-            
-            self.show_status("🎬 ANALYSIS PHASE 2 - Starting video preview...", "blue")
-            self.update_progress_panel("25%", "🎬 Starting Video Preview")
+            # Settings of this analysis, config.py is left untouched
+            settings = AnalysisConfig.from_config().replace(video_cap=os.path.abspath(video_path))
             
-            # Start simple video preview with live stats
-            self.start_simple_video_preview(video_path)
-            
-            # Give preview a moment to start
-            time.sleep(1)
+            # The engine keeps the models loaded, only the first analysis waits for them
+            if self.engine is None or not self.engine.is_alive():
+                self.show_status("🎬 ANALYSIS PHASE 2 - Loading detection models...", "blue")
+                self.update_progress_panel("25%", "🤖 Loading Models")
+                self.engine = AnalysisEngine()
             
             self.show_status("🎬 ANALYSIS PHASE 3 - Running AI detection analysis...", "blue")
             self.update_progress_panel("40%", "🤖 Running AI Detection")
+            self.engine.start(settings.video_cap, settings=settings)
+            outcome, detail = self.follow_engine()
             
-            # Run analysis using original main.py (opens separate OpenCV detection window)
-            print("🚀 Running main analysis with OpenCV detection window...")
-            result = subprocess.run([sys.executable, 'main.py'], 
-                                  capture_output=True, text=True, cwd=os.getcwd())
-            
-            if result.returncode != 0:
-                print(f"❌ Analysis failed: {result.stderr}")
+            if outcome != "done":
+                print(f"❌ Analysis failed: {detail}")
                 self.show_status("❌ ANALYSIS FAILED - Check console for details", "red")
                 self.update_progress_panel("❌", "Analysis Failed")
                 # Update UI state on failure
@@ -1178,21 +1180,7 @@ class CrowdAnalysisStudio:
                 self.show_status("📊 ANALYSIS PHASE 5 - Generating visualization plots...", "blue")
                 self.update_progress_panel("90%", "📈 Generating Plots")
                 print("📊 Generating visualization plots...")
-                win_script = 'generate_all_plots_windows.py'
-                orig_script = 'generate_all_plots.py'
-                if sys.platform.startswith('win') and os.path.exists(win_script):
-                    plot_script = win_script
-                else:
-                    plot_script = orig_script
-
-                env = os.environ.copy()
-                mpl_tmp = os.path.join(os.getcwd(), 'generated_plots', '.mplconfig')
-                env['MPLCONFIGDIR'] = mpl_tmp
-                env['PYTHONIOENCODING'] = 'utf-8'
-                os.makedirs(mpl_tmp, exist_ok=True)
-
-                plot_result = subprocess.run([sys.executable, plot_script], 
-                                           capture_output=True, text=True, cwd=os.getcwd(), env=env)
+                plot_result = self.run_plot_generator()
                 
                 if plot_result.returncode == 0:
                     print("✅ Plot generation completed successfully")
@@ -1249,52 +1237,45 @@ class CrowdAnalysisStudio:
         except Exception as e:
             print(f"❌ Error updating UI state: {e}")
     
-    def start_simple_video_preview(self, video_path):
-        """Start simple video preview without detection overlays"""
-        def preview_thread():
-            cap = cv2.VideoCapture(video_path)
-            if not cap.isOpened():
-                print("❌ Could not open video for preview")
-                self.show_status("❌ Could not open video for preview", "red")
-                return
-            
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            frame_count = 0
-            
-            print(f"🎬 Starting simple video preview ({total_frames} frames)")
-            
-            while cap.isOpened() and self.is_analyzing:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
-                # Update preview with original frame (no detection overlay)
+    def follow_engine(self):
+        """Show the frames and progress of the running analysis until the engine finishes it"""
+        while True:
+            frame = self.engine.frame()
+            if frame is not None:
                 self.update_video_preview_simple(frame)
-                
-                frame_count += 1
-                
-                # Update progress every 20 frames for status feedback only
-                if frame_count % 20 == 0:
-                    progress = (frame_count / total_frames) * 100
-                    print(f"📺 Preview: {progress:.1f}% ({frame_count}/{total_frames})")
-                    
-                    # Update status in main thread
-                    self.root.after(0, lambda: self.show_status(f"🔄 PROCESSING FRAMES: {progress:.1f}% ({frame_count}/{total_frames})", "blue"))
-                    
-                    # Update progress panel
-                    self.root.after(0, lambda: self.update_progress_panel(f"{progress:.1f}%", "🎬 Processing Video"))
-                
-                time.sleep(0.04)  # ~25 FPS preview
-            
-            cap.release()
-            print("📺 Video preview ended")
-        
-        # Start preview in separate thread
-        preview_thread_obj = threading.Thread(target=preview_thread, daemon=True)
-        preview_thread_obj.start()
+            for kind, value in self.engine.poll(timeout=0.04):
+                if kind == "progress":
+                    self.root.after(0, lambda stats=value: self.show_engine_progress(stats))
+                elif kind in ("done", "error"):
+                    return kind, value
+            if not self.engine.is_alive():
+                return "error", "Analysis engine exited"
+    
+    def show_engine_progress(self, stats):
+        """Update the progress panel and live counters with the statistics of the last analysed frame"""
+        if not self.is_analyzing:
+            return
+        self.live_stats.add(stats["frame"], stats["count"], stats["violations"], stats["restricted"], stats["abnormal"])
+        if stats["total"]:
+            progress = stats["frame"] / stats["total"] * 100
+            self.update_progress_panel(f"{progress:.1f}%", "🎬 Processing Video")
+            self.show_status(f"🔄 PROCESSING FRAMES: {progress:.1f}% ({stats['frame']}/{stats['total']})", "blue")
+        if hasattr(self, 'count_label') and self.count_label.winfo_exists():
+            self.count_label.configure(text=str(stats["count"]))
+        if hasattr(self, 'violations_label') and self.violations_label.winfo_exists():
+            self.violations_label.configure(text=str(stats["violations"]))
+        if hasattr(self, 'fps_label') and self.fps_label.winfo_exists():
+            self.fps_label.configure(text=f"{stats['fps']:.1f}")
+        if hasattr(self, 'max_crowd_label') and self.max_crowd_label.winfo_exists():
+            self.max_crowd_label.configure(text=str(self.live_stats.max_people))
+        if hasattr(self, 'avg_crowd_label') and self.avg_crowd_label.winfo_exists():
+            self.avg_crowd_label.configure(text=f"{self.live_stats.summary()['avg_people']:.1f}")
     
     def update_video_preview_simple(self, frame):
         """Update video preview with simple frame (no detection boxes)"""
+        # OpenCV and PIL are only loaded once frames are shown, keeping the launch fast
+        import cv2
+        from PIL import Image, ImageTk
         try:
             if not self.is_analyzing:
                 return
@@ -1364,48 +1345,28 @@ class CrowdAnalysisStudio:
             self.update_results_panel("📊 Analysis completed - Check dashboard for detailed results")
     
     def update_video_panel_live_stats(self):
-        """Update video panel live stats - random during analysis, accurate after completion"""
+        """Update video panel live stats - placeholders during analysis, accurate after completion"""
         try:
             if hasattr(self, 'has_final_data') and self.has_final_data:
                 # Show final accurate data
                 self.update_video_panel_stats()
+            elif self.is_analyzing and self.live_stats.rows:
+                # Aggregates of the frames analysed so far
+                summary = self.live_stats.summary()
+                values = {
+                    'count_label': str(summary['last_people']),
+                    'violations_label': str(summary['last_violations']),
+                    'max_crowd_label': str(summary['max_people']),
+                    'avg_crowd_label': f"{summary['avg_people']:.1f}"
+                }
+                for label, text in values.items():
+                    if hasattr(self, label) and getattr(self, label).winfo_exists():
+                        getattr(self, label).configure(text=text)
             elif self.is_analyzing:
-                # Show random values during analysis for live effect
-                import random
-                temp_people = random.randint(15, 35)
-                temp_violations = random.randint(0, min(8, temp_people//4))
-                temp_max = random.randint(temp_people, temp_people + 10)
-                temp_avg = random.uniform(temp_people - 5, temp_people + 5)
-                temp_fps = random.uniform(20.0, 30.0)
-                
-                # Update video panel stats with random values
-                if hasattr(self, 'count_label') and self.count_label.winfo_exists():
-                    # Color code based on crowd size
-                    count_color = "green"
-                    if temp_people > 20:
-                        count_color = "orange"
-                    elif temp_people > 30:
-                        count_color = "red"
-                    self.count_label.configure(text=str(temp_people), text_color=count_color)
-                
-                if hasattr(self, 'violations_label') and self.violations_label.winfo_exists():
-                    # Color code violations
-                    if temp_violations == 0:
-                        color = "green"
-                    elif temp_violations < 3:
-                        color = "orange"
-                    else:
-                        color = "red"
-                    self.violations_label.configure(text=str(temp_violations), text_color=color)
-                
-                if hasattr(self, 'max_crowd_label') and self.max_crowd_label.winfo_exists():
-                    self.max_crowd_label.configure(text=str(temp_max))
-                
-                if hasattr(self, 'avg_crowd_label') and self.avg_crowd_label.winfo_exists():
-                    self.avg_crowd_label.configure(text=f"{temp_avg:.1f}")
-                
-                if hasattr(self, 'fps_label') and self.fps_label.winfo_exists():
-                    self.fps_label.configure(text=f"{temp_fps:.1f}")
+                # The engine fills in the real values as soon as the first frame is analysed
+                for label in ('count_label', 'violations_label', 'max_crowd_label', 'avg_crowd_label', 'fps_label'):
+                    if hasattr(self, label) and getattr(self, label).winfo_exists():
+                        getattr(self, label).configure(text="...")
                 
                 if hasattr(self, 'status_label') and self.status_label.winfo_exists():
                     self.status_label.configure(text="🔄 Analyzing...", text_color="blue")
@@ -1471,76 +1432,86 @@ class CrowdAnalysisStudio:
         except Exception as e:
             print(f"❌ Error updating video panel stats: {e}")
     
+    def read_crowd_summary(self):
+        """Crowd statistics of the last analysis, from the analytics database when it is enabled"""
+        import config
+        if getattr(config, 'ANALYTICS_DB', False) and os.path.exists(config.ANALYTICS_DB_PATH):
+            from analytics_db import AnalyticsStore
+            store = AnalyticsStore(config.ANALYTICS_DB_PATH)
+            try:
+                summary = store.crowd_summary(store.latest_run())
+            finally:
+                store.close()
+            if summary:
+                return summary
+        
+        # Only the rows written since the last call are parsed
+        return self.crowd_tail.summary()
+    
     def load_final_statistics(self):
         """Load final accurate statistics from real analysis data"""
         try:
-            import pandas as pd
-            
-            # Load crowd data to get final statistics
-            csv_path = 'processed_data/crowd_data.csv'
-            if os.path.exists(csv_path):
-                df = pd.read_csv(csv_path)
-                if not df.empty:
-                    # Get statistics from the last row (final count)
-                    latest_row = df.iloc[-1]
-                    self.people_count = int(latest_row.get('Human Count', 0))
-                    
-                    # For violations, show the MAXIMUM violations detected (not just final frame)
-                    max_violations_per_frame = int(df['Social Distance violate'].max())
-                    final_frame_violations = int(latest_row.get('Social Distance violate', 0))
-                    
-                    # Use the maximum violations detected for better accuracy
-                    self.violations_count = max_violations_per_frame
-                    
-                    print(f"📊 VIOLATION ANALYSIS:")
-                    print(f"   🔍 Final frame violations: {final_frame_violations}")
-                    print(f"   📈 Maximum violations detected: {max_violations_per_frame}")
-                    print(f"   📊 Using maximum for dashboard: {self.violations_count}")
-                    
-                    # Calculate comprehensive statistics from all data
-                    self.max_people_count = int(df['Human Count'].max())
-                    self.avg_people_count = float(df['Human Count'].mean())
-                    self.total_violations = int(df['Social Distance violate'].sum())
-                    
-                    # Get FPS from video data if available
-                    if os.path.exists('processed_data/video_data.json'):
-                        try:
-                            import json
-                            with open('processed_data/video_data.json', 'r') as f:
-                                video_data = json.load(f)
-                                self.processing_fps = float(video_data.get('VID_FPS', 25.0))
-                        except:
-                            self.processing_fps = 25.0
-                    else:
+            summary = self.read_crowd_summary()
+            if summary:
+                # Get statistics from the last row (final count)
+                self.people_count = int(summary['last_people'])
+                
+                # For violations, show the MAXIMUM violations detected (not just final frame)
+                max_violations_per_frame = int(summary['max_violations'])
+                final_frame_violations = int(summary['last_violations'])
+                
+                # Use the maximum violations detected for better accuracy
+                self.violations_count = max_violations_per_frame
+                
+                print(f"📊 VIOLATION ANALYSIS:")
+                print(f"   🔍 Final frame violations: {final_frame_violations}")
+                print(f"   📈 Maximum violations detected: {max_violations_per_frame}")
+                print(f"   📊 Using maximum for dashboard: {self.violations_count}")
+                
+                # Calculate comprehensive statistics from all data
+                self.max_people_count = int(summary['max_people'])
+                self.avg_people_count = float(summary['avg_people'])
+                self.total_violations = int(summary['total_violations'])
+                
+                # Get FPS from video data if available
+                if os.path.exists('processed_data/video_data.json'):
+                    try:
+                        import json
+                        with open('processed_data/video_data.json', 'r') as f:
+                            video_data = json.load(f)
+                            self.processing_fps = float(video_data.get('VID_FPS', 25.0))
+                    except:
                         self.processing_fps = 25.0
-                    
-                    # Update all displays with accurate final data
-                    self.update_live_stats()
-                    self.update_video_panel_stats()
-                    self.update_dashboard_with_final_stats()
-                    
-                    print(f"📊 FINAL ACCURATE STATS LOADED:")
-                    print(f"   👥 Final People Count: {self.people_count}")
-                    print(f"   ⚠️ Final Violations: {self.violations_count}")
-                    print(f"   � Max People: {self.max_people_count}")
-                    print(f"   📊 Average People: {self.avg_people_count:.1f}")
-                    print(f"   🚨 Total Violations: {self.total_violations}")
-                    
-                    # Mark that we have real final data
-                    self.has_final_data = True
-                    
-                    # Create final_stats dictionary for use by other components
-                    self.final_stats = {
-                        'Total People Detected': self.max_people_count,
-                        'Social Distance Violations': self.violations_count,  # Using max violations
-                        'Average Crowd Density': (self.avg_people_count / max(self.max_people_count, 1)) * 100,
-                        'Average People Count': self.avg_people_count,
-                        'Processing FPS': self.processing_fps
-                    }
-                    
-                    # Ensure video panel also shows final accurate data
-                    self.update_video_panel_live_stats()
-                    
+                else:
+                    self.processing_fps = 25.0
+                
+                # Update all displays with accurate final data
+                self.update_live_stats()
+                self.update_video_panel_stats()
+                self.update_dashboard_with_final_stats()
+                
+                print(f"📊 FINAL ACCURATE STATS LOADED:")
+                print(f"   👥 Final People Count: {self.people_count}")
+                print(f"   ⚠️ Final Violations: {self.violations_count}")
+                print(f"   � Max People: {self.max_people_count}")
+                print(f"   📊 Average People: {self.avg_people_count:.1f}")
+                print(f"   🚨 Total Violations: {self.total_violations}")
+                
+                # Mark that we have real final data
+                self.has_final_data = True
+                
+                # Create final_stats dictionary for use by other components
+                self.final_stats = {
+                    'Total People Detected': self.max_people_count,
+                    'Social Distance Violations': self.violations_count,  # Using max violations
+                    'Average Crowd Density': (self.avg_people_count / max(self.max_people_count, 1)) * 100,
+                    'Average People Count': self.avg_people_count,
+                    'Processing FPS': self.processing_fps
+                }
+                
+                # Ensure video panel also shows final accurate data
+                self.update_video_panel_live_stats()
+                
         except Exception as e:
             print(f"❌ Error loading final statistics: {e}")
             # Set default values if loading fails
@@ -1574,6 +1545,7 @@ class CrowdAnalysisStudio:
     
     def process_frame_with_detection(self, frame, frame_number):
         """Process frame with detection overlays"""
+        import cv2
         try:
             # This is a simplified detection simulation
             # In a real implementation, you'd integrate with your YOLO detection here
@@ -1626,6 +1598,8 @@ class CrowdAnalysisStudio:
     
     def update_processed_frame(self, frame):
         """Update video preview with processed frame (with detection boxes)"""
+        import cv2
+        from PIL import Image, ImageTk
         if not self.is_analyzing:
             return
         
@@ -1745,14 +1719,10 @@ class CrowdAnalysisStudio:
     def load_real_stats(self):
         """Load real statistics from analysis data"""
         try:
-            import csv
-            with open('processed_data/crowd_data.csv', 'r') as f:
-                reader = csv.DictReader(f)
-                rows = list(reader)
-                if rows:
-                    latest_row = rows[-1]  # Get latest data
-                    self.people_count = int(latest_row.get('Human Count', 0))
-                    self.violations_count = int(latest_row.get('Social Distance violate', 0))
+            summary = self.crowd_tail.summary()
+            if summary:
+                self.people_count = int(summary['last_people'])
+                self.violations_count = int(summary['last_violations'])
                     
             # Try to get FPS from video data
             if os.path.exists('processed_data/video_data.json'):
@@ -1778,6 +1748,9 @@ class CrowdAnalysisStudio:
         self.max_people_count = 0
         self.avg_people_count = 0.0
         self.total_violations = 0
+        self.live_stats = CrowdStats()
+        # A new analysis rewrites the crowd data file, read it again from the start
+        self.crowd_tail = CrowdDataTail('processed_data/crowd_data.csv')
         
         # Update video panel stats (always present)
         try:
@@ -1828,6 +1801,8 @@ class CrowdAnalysisStudio:
     def run(self):
         """Start the application"""
         self.root.mainloop()
+        if self.engine:
+            self.engine.close()
 
 def main():
     """Main function"""
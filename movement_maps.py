@@ -0,0 +1,294 @@
+import os
+import math
+import time
+import threading
+import cv2
+import numpy as np
+
+# Stationary heatmap blobs
+MAX_STATIONARY_TIME = 120
+BLOB_LAYER = 50
+COLOR_START = 210
+COLOR_END = 0
+BLOB_SCALE = 1.5
+
+# Optical flow trails, from the first to the last point of a track
+TRAIL_COLOR_START = (255, 96, 0)
+TRAIL_COLOR_END = (0, 28, 255)
+
+def _blob_layers(time, layer_size):
+	if time >= MAX_STATIONARY_TIME:
+		return BLOB_LAYER
+	return math.ceil(time * BLOB_SCALE / layer_size)
+
+def _draw_layers(frame, coordinates, layers, layer_size):
+	color_steps = int((COLOR_START - COLOR_END) / BLOB_LAYER)
+	for x in reversed(range(layers)):
+		color = COLOR_START - (color_steps * x)
+		size = x * layer_size
+		cv2.circle(frame, coordinates, int(size), (color, color, color), -1)
+
+def draw_blob(frame, coordinates, time, frame_size):
+	# Concentric circles that grow and brighten with the time spent at a location
+	layer_size = frame_size * 0.1 / BLOB_LAYER
+	_draw_layers(frame, coordinates, _blob_layers(time, layer_size), layer_size)
+
+class DensityAccumulator:
+	"""Sum of the stationary blobs of many locations in a single frame sized grid.
+
+	A blob only depends on its number of layers, so every blob is drawn once
+	into a small stamp and then added to the grid at each of its locations.
+	Memory stays constant and the cost is linear in the number of points.
+	"""
+
+	def __init__(self, shape, frame_size):
+		self.frame_size = frame_size
+		self.layer_size = frame_size * 0.1 / BLOB_LAYER
+		self.grid = np.zeros(shape[:2], dtype=np.int32)
+		self._stamps = {}
+
+	def _stamp(self, layers):
+		stamp = self._stamps.get(layers)
+		if stamp is None:
+			radius = int(max(layers - 1, 0) * self.layer_size)
+			stamp = np.zeros((2 * radius + 1, 2 * radius + 1), dtype=np.uint8)
+			_draw_layers(stamp, (radius, radius), layers, self.layer_size)
+			stamp = stamp.astype(np.int32)
+			self._stamps[layers] = stamp
+		return stamp
+
+	def add(self, coordinates, time):
+		layers = _blob_layers(time, self.layer_size)
+		if layers <= 0:
+			return
+		stamp = self._stamp(layers)
+		radius = stamp.shape[0] // 2
+		x, y = int(coordinates[0]), int(coordinates[1])
+		height, width = self.grid.shape
+		# Clip the stamp to the part inside the frame
+		top, left = max(y - radius, 0), max(x - radius, 0)
+		bottom, right = min(y + radius + 1, height), min(x + radius + 1, width)
+		if top >= bottom or left >= right:
+			return
+		self.grid[top:bottom, left:right] += stamp[top - y + radius:bottom - y + radius, left - x + radius:right - x + radius]
+
+	def heatmap(self):
+		# Gray level heatmap saturating at 255, like adding the blobs with cv2.add
+		return np.minimum(self.grid, 255).astype(np.uint8)
+
+def stationary_heatmap(shape, stationary_points, frame_size):
+	# Gray level heatmap of the [location, time] pairs, saturating at 255
+	density = DensityAccumulator(shape, frame_size)
+	for points in stationary_points:
+		density.add(points[0], points[1])
+	return density.heatmap()
+
+def colorize_heatmap(heatmap):
+	# Apply the JET colormap and blank the pixels without any stationary time
+	heatmap = np.minimum(heatmap, COLOR_START).astype(np.uint8)
+	heatmap = cv2.applyColorMap(heatmap, cv2.COLORMAP_JET)
+	mask = cv2.inRange(heatmap, np.array([128, 0, 0]), np.array([136, 0, 0]))
+	heatmap[mask > 0] = (0, 0, 0)
+	return heatmap
+
+def composite_heatmap(heatmap, background):
+	# Show the background where the colored heatmap is blank and blend both
+	blank = ~heatmap.any(axis=2)
+	heatmap = np.where(blank[:, :, None], background, heatmap)
+	return cv2.addWeighted(heatmap, 0.75, background, 0.25, 1)
+
+def render_heatmap(background, stationary_points, frame_size):
+	"""Stationary location heatmap composited over a background frame"""
+	heatmap = stationary_heatmap(background.shape, stationary_points, frame_size)
+	return composite_heatmap(colorize_heatmap(heatmap), background)
+
+def gradient_lut(color1, color2, levels=64):
+	# Colors from `color1` to `color2` in `levels` steps, truncated like gradient_color_RGB
+	fractions = np.linspace(0, 1, levels)[:, None]
+	start, end = np.array(color1, dtype=np.float64), np.array(color2, dtype=np.float64)
+	return (start + fractions * (end - start)).astype(np.int64)
+
+def draw_trails(frame, x, y, offsets, color1=TRAIL_COLOR_START, color2=TRAIL_COLOR_END, thickness=2,
+	levels=64, density_alpha=False):
+	"""Draw tracks given as flat point arrays with a color gradient from their start to their end.
+
+	Every step is colored by its position along its track, quantized to
+	`levels` colors of a lookup table, and all the steps of a color are drawn
+	with a single `cv2.polylines` call. With `density_alpha` the trails are
+	blended over the frame with an opacity growing with the number of track
+	points around each pixel, so dense areas stay readable.
+	"""
+	lengths = np.diff(offsets)
+	steps = np.maximum(lengths - 1, 0)
+	tracks = np.repeat(np.arange(len(lengths)), steps)
+	if len(tracks) == 0:
+		return frame
+	# First point of every step and its position along its track
+	first_step = np.cumsum(steps) - steps
+	starts = offsets[:-1][tracks] + np.arange(len(tracks)) - first_step[tracks]
+	levels_of = np.rint((starts - offsets[:-1][tracks]) / steps[tracks] * (levels - 1)).astype(np.int64)
+	points = np.stack([x, y], axis=1).astype(np.int32)
+	segments = np.stack([points[starts], points[starts + 1]], axis=1)
+
+	lut = gradient_lut(color1, color2, levels)
+	order = np.argsort(levels_of, kind='stable')
+	bounds = np.searchsorted(levels_of[order], np.arange(levels + 1))
+	canvas = np.zeros_like(frame) if density_alpha else frame
+	for level in range(levels):
+		selected = order[bounds[level]:bounds[level + 1]]
+		if len(selected):
+			cv2.polylines(canvas, segments[selected], False, tuple(int(c) for c in lut[level]), thickness)
+	if not density_alpha:
+		return frame
+
+	# Faint isolated trails, opaque where many tracks pass
+	height, width = frame.shape[:2]
+	inside = (points[:, 0] >= 0) & (points[:, 0] < width) & (points[:, 1] >= 0) & (points[:, 1] < height)
+	pixels = points[inside, 1] * width + points[inside, 0]
+	density = np.bincount(pixels, minlength=height * width).reshape(height, width).astype(np.float32)
+	density = cv2.GaussianBlur(density, (0, 0), max(width * 0.01, 1))
+	alpha = 0.25 + 0.75 * np.log1p(density) / max(np.log1p(density.max()), 1e-6)
+	alpha[~canvas.any(axis=2)] = 0
+	alpha = alpha[:, :, None]
+	frame[:] = (frame * (1 - alpha) + canvas * alpha).astype(frame.dtype)
+	return frame
+
+class LiveOccupancyMap:
+	"""Occupancy, dwell and trail maps updated from the tracks of every processed frame.
+
+	All grids decay with a half life of `half_life` seconds. Instead of
+	multiplying every cell on each update, new values are scaled up by the
+	accumulated decay, so an update only touches the cells of the current
+	tracks. `snapshot` renders the current maps at any moment and `export`
+	saves it. With an `export_path` a copy of the maps is saved every
+	`export_interval` seconds by a background thread, e.g. for the GUI while
+	the analysis is still running, and `close` waits for the last one.
+	"""
+
+	def __init__(self, frame_size, cell=8, half_life=300.0, export_path=None, export_interval=5.0):
+		self.cell = cell
+		self.half_life = half_life
+		self.stationary_distance = frame_size * 0.05
+		self.shape = None
+		self._scale = 1.0
+		self._last_positions = {}
+		self.background = None
+
+		self.export_path = export_path
+		self.export_interval = export_interval
+		self._last_export = time.time()
+		self._condition = threading.Condition()
+		self._pending = None
+		self._closed = False
+		self._thread = None
+
+	def _allocate(self, shape):
+		# The grids get the size of the first processed frame
+		self.shape = shape[:2]
+		grid_shape = (math.ceil(self.shape[0] / self.cell), math.ceil(self.shape[1] / self.cell))
+		self.occupancy = np.zeros(grid_shape, dtype=np.float32)
+		self.dwell = np.zeros(grid_shape, dtype=np.float32)
+		self.trails = np.zeros(self.shape, dtype=np.float32)
+
+	def _decay(self, time_step):
+		# Grow the weight of new values instead of shrinking every stored one
+		self._scale *= 2 ** (time_step / self.half_life)
+		if self._scale > 1e6:
+			self.occupancy /= self._scale
+			self.dwell /= self._scale
+			self.trails /= self._scale
+			self._scale = 1.0
+
+	def update(self, tracks, time_step, frame):
+		if self.shape is None:
+			self._allocate(frame.shape)
+		self._decay(time_step)
+		positions = {}
+		for track in tracks:
+			x, y = track.positions[-1]
+			x = min(max(int(x), 0), self.shape[1] - 1)
+			y = min(max(int(y), 0), self.shape[0] - 1)
+			positions[track.track_id] = (x, y)
+			row, col = y // self.cell, x // self.cell
+			self.occupancy[row, col] += self._scale * time_step
+			last = self._last_positions.get(track.track_id)
+			if last is None:
+				continue
+			if math.hypot(x - last[0], y - last[1]) < self.stationary_distance:
+				self.dwell[row, col] += self._scale * time_step
+			cv2.line(self.trails, last, (x, y), self._scale, 2)
+		self._last_positions = positions
+		if self.export_path and time.time() - self._last_export >= self.export_interval:
+			self._queue_export(frame)
+
+	def _queue_export(self, frame):
+		# Rendering and encoding the image run on the export thread, the loop only copies the maps
+		self.background = frame.copy()
+		occupancy, dwell, trails = self.grids()
+		with self._condition:
+			self._pending = (dwell, trails, self.background)
+			self._condition.notify()
+		self._last_export = time.time()
+		if self._thread is None:
+			self._thread = threading.Thread(target=self._export_loop, daemon=True)
+			self._thread.start()
+
+	def _export_loop(self):
+		while True:
+			with self._condition:
+				while self._pending is None and not self._closed:
+					self._condition.wait()
+				if self._pending is None:
+					return
+				dwell, trails, background = self._pending
+				self._pending = None
+			_write_image(self.export_path, _render_snapshot(dwell, trails, background))
+
+	def close(self):
+		# Wait for the snapshot being saved in the background
+		with self._condition:
+			self._closed = True
+			self._condition.notify()
+		if self._thread is not None:
+			self._thread.join()
+			self._thread = None
+
+	def grids(self):
+		# Decayed occupancy and dwell seconds per cell and trail intensity per pixel
+		return self.occupancy / self._scale, self.dwell / self._scale, self.trails / self._scale
+
+	def snapshot(self, background=None):
+		"""Dwell heatmap and trails composited over `background`, or the last frame"""
+		if background is None:
+			background = self.background
+		if self.shape is None:
+			return background
+		if background is None:
+			background = np.zeros(self.shape + (3,), dtype=np.uint8)
+		occupancy, dwell, trails = self.grids()
+		return _render_snapshot(dwell, trails, background)
+
+	def export(self, path):
+		_write_image(path, self.snapshot())
+		self._last_export = time.time()
+
+def _render_snapshot(dwell, trails, background):
+	# Dwell heatmap scaled to the background with the trails drawn over it
+	peak = dwell.max()
+	levels = np.zeros(dwell.shape, dtype=np.uint8)
+	if peak > 0:
+		levels = (dwell / peak * COLOR_START).astype(np.uint8)
+	levels = cv2.resize(levels, (background.shape[1], background.shape[0]), interpolation=cv2.INTER_LINEAR)
+	image = composite_heatmap(colorize_heatmap(levels), background)
+	peak = trails.max()
+	if peak > 0:
+		trail_mask = trails / peak > 0.05
+		image[trail_mask] = (255, 96, 0)
+	return image
+
+def _write_image(path, image):
+	# Replace the previous snapshot in one step so readers never see a partial image
+	root, extension = os.path.splitext(path)
+	temp_path = root + '.tmp' + extension
+	cv2.imwrite(temp_path, image)
+	os.replace(temp_path, path)
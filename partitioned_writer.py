@@ -0,0 +1,259 @@
+import os
+import io
+import csv
+import gzip
+import json
+import shutil
+import datetime
+import threading
+
+# zstd compresses faster and smaller, gzip is the fallback of the standard library
+try:
+	import zstandard
+except ImportError:
+	zstandard = None
+
+PERIODS = {
+	'hour': '%Y%m%d-%H',
+	'day': '%Y%m%d'
+}
+
+def _period_start(value, period):
+	if period == 'hour':
+		return value.replace(minute=0, second=0, microsecond=0)
+	return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def _period_end(start, period):
+	return start + (datetime.timedelta(hours=1) if period == 'hour' else datetime.timedelta(days=1))
+
+def default_compression():
+	return 'zstd' if zstandard else 'gzip'
+
+def compress_file(path, compression):
+	# Compress a closed segment next to it and remove the plain file
+	if compression == 'zstd':
+		compressed_path = path + '.zst'
+		with open(path, 'rb') as source, open(compressed_path, 'wb') as target:
+			zstandard.ZstdCompressor().copy_stream(source, target)
+	else:
+		compressed_path = path + '.gz'
+		with open(path, 'rb') as source, gzip.open(compressed_path, 'wb') as target:
+			shutil.copyfileobj(source, target)
+	os.remove(path)
+	return compressed_path
+
+def _open_segment(path):
+	if path.endswith('.zst'):
+		return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(path, 'rb')), newline='')
+	if path.endswith('.gz'):
+		return gzip.open(path, 'rt', newline='')
+	return open(path, 'r', newline='')
+
+class PartitionedWriter:
+	"""A csv writer that splits the rows of a live feed into hourly or daily segments.
+
+	Rows go to the segment of the timestamp in `time_column`. Closed segments
+	are compressed on a background thread and `<name>_manifest.json` lists the time
+	range, row count and file of every segment so readers can open only the
+	segments a query needs. `resume` is the `checkpoint_state` saved by an
+	earlier writer, the rows written after it are dropped.
+	"""
+
+	def __init__(self, output_dir, name, header, time_column=0, period='hour', compression=None, resume=None):
+		if period not in PERIODS:
+			raise ValueError("Unknown partition period: " + str(period))
+		if not os.path.exists(output_dir):
+			os.makedirs(output_dir)
+		self.output_dir = output_dir
+		self.name = name
+		self.header = header
+		self.time_column = time_column
+		self.period = period
+		self.compression = compression or default_compression()
+		self.manifest_path = os.path.join(output_dir, name + '_manifest.json')
+		self.segments = load_manifest(output_dir, name)
+
+		self._lock = threading.Lock()
+		self._compressors = []
+		self._file = None
+		self._writer = None
+		self._segment = None
+		self._resumed = None
+		if resume:
+			self._restore(resume)
+
+	def writerow(self, row):
+		row_time = row[self.time_column]
+		start = _period_start(row_time, self.period)
+		# Rows of an earlier period, e.g. after a clock adjustment, stay in the open segment
+		if self._segment is None or start > self._segment_start:
+			self._rotate(start)
+		self._writer.writerow(row)
+		segment = self._segment
+		if segment['rows'] == 0:
+			segment['first'] = row_time.isoformat()
+		segment['last'] = row_time.isoformat()
+		segment['rows'] += 1
+
+	def writerows(self, rows):
+		for row in rows:
+			self.writerow(row)
+
+	def flush(self):
+		if self._file is not None:
+			self._file.flush()
+
+	def _rotate(self, start):
+		self._close_segment()
+		file_name = self.name + '-' + start.strftime(PERIODS[self.period]) + '.csv'
+		# The segment left open by a resumed checkpoint is compressed once a later period starts
+		resumed, self._resumed = self._resumed, None
+		if resumed is not None and resumed['file'] != file_name:
+			self._compress_later(resumed)
+		path = os.path.join(self.output_dir, file_name)
+		# A restarted feed continues the segment of the current period
+		segment = next((segment for segment in self.segments if segment['file'].startswith(file_name)), None)
+		if segment is None:
+			segment = {
+				'file': file_name,
+				'start': start.isoformat(),
+				'end': _period_end(start, self.period).isoformat(),
+				'first': None,
+				'last': None,
+				'rows': 0
+			}
+			with self._lock:
+				self.segments.append(segment)
+		elif segment['file'] != file_name:
+			self._reopen_compressed(segment)
+		new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+		self._file = open(path, 'a', newline='')
+		self._writer = csv.writer(self._file)
+		if new_file:
+			self._writer.writerow(self.header)
+		self._segment = segment
+		self._segment_start = start
+		self._save_manifest()
+
+	def _reopen_compressed(self, segment):
+		# Decompress a segment of the current period to append to it again
+		compressed_path = os.path.join(self.output_dir, segment['file'])
+		path = compressed_path.rsplit('.', 1)[0]
+		with _open_segment(compressed_path) as source, open(path, 'w', newline='') as target:
+			shutil.copyfileobj(source, target)
+		os.remove(compressed_path)
+		with self._lock:
+			segment['file'] = os.path.basename(path)
+
+	def _close_segment(self):
+		if self._file is None:
+			return
+		self._file.close()
+		segment = self._segment
+		path = os.path.join(self.output_dir, segment['file'])
+		self._file = None
+		self._segment = None
+		self._compress_later(segment)
+
+	def _compress_later(self, segment):
+		path = os.path.join(self.output_dir, segment['file'])
+		thread = threading.Thread(target=self._compress, args=(segment, path), daemon=True)
+		thread.start()
+		self._compressors.append(thread)
+
+	def _compress(self, segment, path):
+		compressed_path = compress_file(path, self.compression)
+		with self._lock:
+			segment['file'] = os.path.basename(compressed_path)
+		self._save_manifest()
+
+	def _save_manifest(self):
+		# Replace the manifest in one step so readers never see a partial one
+		with self._lock:
+			temp_path = self.manifest_path + '.tmp'
+			with open(temp_path, 'w') as manifest_file:
+				json.dump(self.segments, manifest_file, indent=1)
+			os.replace(temp_path, self.manifest_path)
+
+	def sync(self):
+		if self._file is not None:
+			self._file.flush()
+			os.fsync(self._file.fileno())
+
+	def checkpoint_state(self):
+		# Segments and write position of the open segment, saved in checkpoints
+		self.sync()
+		with self._lock:
+			return {
+				"segments": [dict(segment) for segment in self.segments],
+				"open": self._segment['file'] if self._segment else None,
+				"offset": self._file.tell() if self._file else 0
+			}
+
+	def _existing_file(self, plain_name):
+		# A segment is plain while it is written and compressed once it is closed
+		for file_name in (plain_name, plain_name + '.zst', plain_name + '.gz'):
+			if os.path.exists(os.path.join(self.output_dir, file_name)):
+				return file_name
+		return plain_name
+
+	def _restore(self, state):
+		# Remove the segments started after the checkpoint and cut the open one back to its saved size
+		kept = {_plain_name(segment['file']) for segment in state['segments']}
+		for segment in self.segments:
+			plain_name = _plain_name(segment['file'])
+			if plain_name not in kept:
+				for file_name in (plain_name, plain_name + '.zst', plain_name + '.gz'):
+					if os.path.exists(os.path.join(self.output_dir, file_name)):
+						os.remove(os.path.join(self.output_dir, file_name))
+		segments = []
+		for saved in state['segments']:
+			segment = dict(saved)
+			plain_name = _plain_name(segment['file'])
+			segment['file'] = self._existing_file(plain_name)
+			if plain_name == state['open']:
+				if segment['file'] != plain_name:
+					self._reopen_compressed(segment)
+				path = os.path.join(self.output_dir, plain_name)
+				if os.path.exists(path):
+					os.truncate(path, min(state['offset'], os.path.getsize(path)))
+				self._resumed = segment
+			segments.append(segment)
+		self.segments = segments
+		self._save_manifest()
+
+	def close(self):
+		# Close and compress the open segment and wait for every compression
+		self._close_segment()
+		for thread in self._compressors:
+			thread.join()
+		self._compressors = []
+
+def _plain_name(file_name):
+	for suffix in ('.zst', '.gz'):
+		if file_name.endswith(suffix):
+			return file_name[:-len(suffix)]
+	return file_name
+
+def load_manifest(output_dir, name):
+	manifest_path = os.path.join(output_dir, name + '_manifest.json')
+	if not os.path.exists(manifest_path):
+		return []
+	with open(manifest_path, 'r') as manifest_file:
+		return json.load(manifest_file)
+
+def read_partitions(output_dir, name, start=None, end=None):
+	"""Yield the rows of the segments overlapping [start, end), without their headers"""
+	for segment in load_manifest(output_dir, name):
+		if start is not None and datetime.datetime.fromisoformat(segment['end']) <= start:
+			continue
+		if end is not None and datetime.datetime.fromisoformat(segment['start']) >= end:
+			continue
+		path = os.path.join(output_dir, segment['file'])
+		if not os.path.exists(path):
+			continue
+		with _open_segment(path) as segment_file:
+			reader = csv.reader(segment_file)
+			next(reader, None)
+			for row in reader:
+				yield row
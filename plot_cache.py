@@ -0,0 +1,93 @@
+import os
+import json
+import hashlib
+import inspect
+
+MANIFEST_NAME = 'plot_manifest.json'
+
+class PlotCache:
+	"""Remember which inputs produced the plots of `output_dir`.
+
+	A plot is keyed by the content hash of its input files, its parameters,
+	the source of the function drawing it and of the helper modules it uses. The keys are kept in a manifest
+	next to the plots so a later run only redraws the plots whose key changed
+	or whose files are missing. File hashes are reused while the size and
+	modification time of a file stay the same.
+	"""
+
+	def __init__(self, output_dir):
+		self.output_dir = str(output_dir)
+		self.path = os.path.join(self.output_dir, MANIFEST_NAME)
+		self.manifest = {"files": {}, "plots": {}}
+		if os.path.exists(self.path):
+			try:
+				with open(self.path, 'r') as manifest_file:
+					self.manifest = json.load(manifest_file)
+			except ValueError:
+				# A broken manifest only costs a full regeneration
+				pass
+
+	def file_digest(self, path, content=True):
+		# Large inputs like the source video are identified by size and modification time only
+		if not os.path.exists(path):
+			return None
+		stat = os.stat(path)
+		signature = [stat.st_size, stat.st_mtime_ns]
+		known = self.manifest["files"].get(path)
+		if known and known["signature"] == signature:
+			return known["digest"]
+		if content:
+			digest = hashlib.sha256()
+			with open(path, 'rb') as input_file:
+				for block in iter(lambda: input_file.read(1 << 20), b''):
+					digest.update(block)
+			digest = digest.hexdigest()
+		else:
+			digest = 'stat:%d:%d' % tuple(signature)
+		self.manifest["files"][path] = {"signature": signature, "digest": digest}
+		return digest
+
+	def key(self, generator, inputs, params=None, stat_inputs=(), helpers=()):
+		parts = {
+			"source": hashlib.sha256(inspect.getsource(generator).encode()).hexdigest(),
+			"helpers": {module.__name__: hashlib.sha256(inspect.getsource(module).encode()).hexdigest()
+				for module in helpers},
+			"inputs": {path: self.file_digest(path) for path in inputs},
+			"stat_inputs": {path: self.file_digest(path, content=False) for path in stat_inputs},
+			"params": params or {}
+		}
+		return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+	def is_fresh(self, name, key):
+		entry = self.manifest["plots"].get(name)
+		if not entry or entry["key"] != key:
+			return False
+		return all(os.path.exists(os.path.join(self.output_dir, output)) for output in entry["outputs"])
+
+	def record(self, name, key, outputs):
+		self.manifest["plots"][name] = {"key": key, "outputs": list(outputs)}
+
+	def forget(self, name):
+		self.manifest["plots"].pop(name, None)
+
+	def save(self):
+		if not os.path.exists(self.output_dir):
+			os.makedirs(self.output_dir)
+		temp_path = self.path + '.tmp'
+		with open(temp_path, 'w') as manifest_file:
+			json.dump(self.manifest, manifest_file, indent=1)
+		os.replace(temp_path, self.path)
+
+def split_stale(cache, generators, specs, force=False):
+	"""Keys of the generators whose plots have to be drawn again and names of the up to date ones"""
+	stale = []
+	fresh = []
+	for generator in generators:
+		name = generator.__name__
+		spec = specs[name]
+		key = cache.key(generator, spec["inputs"], spec.get("params"), spec.get("stat_inputs", ()), spec.get("helpers", ()))
+		if not force and cache.is_fresh(name, key):
+			fresh.append(name)
+		else:
+			stale.append((generator, key))
+	return stale, fresh
@@ -0,0 +1,115 @@
+import os
+import csv
+import json
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+from track_store import load_movement_tracks, load_track_store, MOVEMENT_DATA_PATH, TRACK_STORE_DIR
+
+CROWD_DATA_PATH = 'processed_data/crowd_data.csv'
+VIDEO_DATA_PATH = 'processed_data/video_data.json'
+CROWD_COLUMNS = ['human_count', 'violate_count', 'restricted_entry', 'abnormal_activity']
+
+def load_crowd_data(path=CROWD_DATA_PATH):
+	# Count columns of the crowd data CSV as integer arrays
+	columns = [[] for _ in CROWD_COLUMNS]
+	with open(path, 'r') as file:
+		reader = csv.reader(file, delimiter=',')
+		next(reader, None)
+		for row in reader:
+			if len(row) < 5:
+				continue
+			for column, value in zip(columns, row[1:5]):
+				column.append(int(value))
+	return {name: np.array(column, dtype=np.int64) for name, column in zip(CROWD_COLUMNS, columns)}
+
+def _attach(name):
+	# Attach to a block created by the parent, which stays responsible for unlinking it
+	try:
+		return shared_memory.SharedMemory(name=name, track=False)
+	except TypeError:
+		block = shared_memory.SharedMemory(name=name)
+		resource_tracker.unregister(block._name, 'shared_memory')
+		return block
+
+class PlotDataset:
+	"""Analysis results loaded once and shared by every plot generator.
+
+	`share` copies the crowd arrays to shared memory and returns small handles
+	that worker processes turn back into a dataset with `attach`, without
+	copying or parsing anything again. The track store is memory mapped from
+	disk by every worker.
+	"""
+
+	def __init__(self, video_data, crowd, track_dir):
+		self.video_data = video_data
+		self.crowd = crowd
+		self.track_dir = track_dir
+		self._tracks = None
+		self._blocks = []
+
+	@property
+	def tracks(self):
+		if self._tracks is None:
+			if self.track_dir is None:
+				raise FileNotFoundError(MOVEMENT_DATA_PATH)
+			self._tracks = load_track_store(self.track_dir)
+		return self._tracks
+
+	def require(self, *names):
+		# Fail like a missing file when a generator needs data the analysis did not produce
+		paths = {'video_data': VIDEO_DATA_PATH, 'crowd': CROWD_DATA_PATH}
+		for name in names:
+			if getattr(self, name) is None:
+				raise FileNotFoundError(paths[name])
+
+	def share(self):
+		handles = {}
+		for name, array in (self.crowd or {}).items():
+			block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+			np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+			self._blocks.append(block)
+			handles[name] = (block.name, array.shape, array.dtype.str)
+		return {
+			"video_data": self.video_data,
+			"crowd": handles if self.crowd is not None else None,
+			"track_dir": self.track_dir
+		}
+
+	@classmethod
+	def attach(cls, handles):
+		crowd = None
+		blocks = []
+		if handles["crowd"] is not None:
+			crowd = {}
+			for name, (block_name, shape, dtype) in handles["crowd"].items():
+				block = _attach(block_name)
+				blocks.append(block)
+				crowd[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+		dataset = cls(handles["video_data"], crowd, handles["track_dir"])
+		dataset._blocks = blocks
+		return dataset
+
+	def close(self, unlink=False):
+		self.crowd = None
+		for block in self._blocks:
+			block.close()
+			if unlink:
+				block.unlink()
+		self._blocks = []
+
+def load_plot_dataset(crowd_path=CROWD_DATA_PATH, video_data_path=VIDEO_DATA_PATH,
+	movement_path=MOVEMENT_DATA_PATH, track_dir=TRACK_STORE_DIR):
+	"""Parse the results of the last analysis once, leaving out the files it did not write"""
+	video_data = None
+	if os.path.exists(video_data_path):
+		with open(video_data_path, 'r') as file:
+			video_data = json.load(file)
+	crowd = load_crowd_data(crowd_path) if os.path.exists(crowd_path) else None
+	return PlotDataset(video_data, crowd, refresh_track_store(movement_path, track_dir))
+
+def refresh_track_store(movement_path=MOVEMENT_DATA_PATH, track_dir=TRACK_STORE_DIR):
+	# Build or refresh the track store before the workers map it, None when there are no tracks
+	if os.path.exists(movement_path) or os.path.exists(os.path.join(track_dir, 'meta.json')):
+		load_movement_tracks(movement_path, track_dir)
+		return track_dir
+	return None
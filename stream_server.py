@@ -0,0 +1,210 @@
+import os
+import time
+import datetime
+import argparse
+import threading
+import imutils
+import cv2
+from config import YOLO_CONFIG, VIDEO_CONFIG, DATA_RECORD, DATA_RECORD_RATE, FRAME_SIZE, TRACK_MAX_AGE, BUFFERED_WRITERS, ENERGY_CALIBRATION
+from batch_scheduler import BatchScheduler
+from models import load_detector, load_encoder, tracker_max_age, create_tracker
+from data_writer import open_data_writers, close_data_writers, write_video_data
+from track_store import convert_csv
+from energy_calibration import load_calibrator, save_calibrator
+from video_process import _record_movement_data, _record_crowd_data, _end_video, _crowd_status
+
+class Stream:
+	"""A single camera or video feed with its own tracker and data files"""
+
+	def __init__(self, name, source, output_dir, frame_size=FRAME_SIZE):
+		self.name = name
+		self.source = source
+		self.output_dir = output_dir
+		self.frame_size = frame_size
+		# Camera indexes and network streams are processed as live feeds
+		self.is_cam = isinstance(source, int) or source.startswith(("rtsp://", "http://", "https://"))
+		self.cap = cv2.VideoCapture(source)
+
+		if self.is_cam:
+			self.vid_fps = None
+			self.data_record_frame = 1
+			self.time_step = 1
+		else:
+			self.vid_fps = self.cap.get(cv2.CAP_PROP_FPS)
+			self.data_record_frame = max(int(self.vid_fps / DATA_RECORD_RATE), 1)
+			self.time_step = self.data_record_frame / self.vid_fps
+
+		max_age = tracker_max_age(self.is_cam, VIDEO_CONFIG["CAM_APPROX_FPS"], DATA_RECORD_RATE, TRACK_MAX_AGE)
+		self.tracker = create_tracker(max_age)
+		self.data_files, self.movement_data_writer, self.crowd_data_writer = open_data_writers(output_dir, buffered=BUFFERED_WRITERS)
+		# Every feed keeps its own abnormal energy threshold
+		self.calibrator = load_calibrator(name, self.time_step, frame_size) if ENERGY_CALIBRATION else None
+
+		self.frame_count = 0
+		self.processed_count = 0
+		self.reader = None
+		self.active = True
+		self.finished = False
+		self.start_time = datetime.datetime.now()
+		self.t0 = time.time()
+
+	def next_frame(self):
+		# Read until the next frame that has to be processed, None once the feed ends
+		while True:
+			(ret, frame) = self.cap.read()
+			if not ret:
+				return None
+			self.frame_count += 1
+			# Skip frames according to given rate
+			if self.frame_count % self.data_record_frame == 0:
+				break
+		frame = imutils.resize(frame, width=self.frame_size)
+		if self.is_cam:
+			record_time = datetime.datetime.now()
+		else:
+			record_time = self.frame_count
+		return frame, record_time
+
+	def read_loop(self, scheduler):
+		# Feed frames into the scheduler until the feed ends or the server stops
+		while self.active:
+			item = self.next_frame()
+			if item is None:
+				break
+			scheduler.submit(self, item[0], item[1])
+		self.finished = True
+
+	def record(self, humans_detected, expired, record_time, current_datetime):
+		self.processed_count += 1
+		# Record movement data
+		for movement in expired:
+			_record_movement_data(self.movement_data_writer, movement)
+
+		violate_count, restricted_entry, abnormal = _crowd_status(humans_detected, current_datetime, self.time_step, self.calibrator)
+
+		# Record crowd data to file
+		if DATA_RECORD:
+			_record_crowd_data(record_time, len(humans_detected), violate_count, restricted_entry, abnormal, self.crowd_data_writer)
+
+	def start_reader(self, scheduler):
+		self.reader = threading.Thread(target=self.read_loop, args=(scheduler,), daemon=True)
+		self.reader.start()
+
+	def close(self):
+		# Let the reader leave its pending read before the capture is released,
+		# a reader blocked on the scheduler is woken by cancelling the stream there
+		self.active = False
+		if self.reader is not None:
+			self.reader.join()
+		# Record the movement of the tracks still on screen
+		_end_video(self.tracker, datetime.datetime.now() if self.is_cam else self.frame_count, self.movement_data_writer)
+		close_data_writers(self.data_files, self.movement_data_writer, self.crowd_data_writer)
+		if self.calibrator:
+			save_calibrator(self.name, self.calibrator)
+		convert_csv(os.path.join(self.output_dir, 'movement_data.csv'), os.path.join(self.output_dir, 'movement_tracks'))
+
+		if self.is_cam:
+			vid_fps = self.processed_count / max(time.time() - self.t0, 1e-6)
+			start_time = self.start_time
+			end_time = datetime.datetime.now()
+		else:
+			vid_fps = self.vid_fps
+			start_time = VIDEO_CONFIG["START_TIME"]
+			end_time = start_time + datetime.timedelta(seconds=round(self.frame_count / self.vid_fps))
+		self.cap.release()
+
+		write_video_data(self.output_dir, {
+			"IS_CAM": self.is_cam,
+			"DATA_RECORD_FRAME": self.data_record_frame,
+			"VID_FPS": vid_fps,
+			"PROCESSED_FRAME_SIZE": self.frame_size,
+			"TRACK_MAX_AGE": TRACK_MAX_AGE,
+			"START_TIME": start_time.strftime("%d/%m/%Y, %H:%M:%S"),
+			"END_TIME": end_time.strftime("%d/%m/%Y, %H:%M:%S")
+		})
+
+class StreamServer:
+	"""Process many feeds in one process, sharing a single detector and encoder"""
+
+	def __init__(self, sources, output_root='processed_data', frame_size=FRAME_SIZE, max_batch=8, max_wait=0.05):
+		# Load the models once, every stream only owns its tracker and writers
+		self.net, self.ln = load_detector(YOLO_CONFIG["CONFIG_PATH"], YOLO_CONFIG["WEIGHTS_PATH"])
+		self.encoder = load_encoder()
+		self.streams = [Stream(name, source, os.path.join(output_root, name), frame_size)
+			for name, source in sources]
+		self.scheduler = BatchScheduler(self.net, self.ln, self.encoder, max_batch=max_batch, max_wait=max_wait)
+		self.batches = 0
+
+	def step(self):
+		# Detect the next batch of frames and record the results of every stream
+		if not self.scheduler.wait_ready(timeout=0.5):
+			return
+		current_datetime = datetime.datetime.now()
+		for stream, record_time, (humans_detected, expired) in self.scheduler.flush():
+			stream.record(humans_detected, expired, record_time, current_datetime)
+		self.batches += 1
+		if self.batches % 100 == 0:
+			self.print_stats()
+
+	def _close_finished(self):
+		for stream in self.streams:
+			if stream.active and stream.finished and self.scheduler.pending(stream) == 0:
+				stream.close()
+
+	def run(self):
+		for stream in self.streams:
+			stream.start_reader(self.scheduler)
+		try:
+			while any(stream.active for stream in self.streams):
+				self.step()
+				self._close_finished()
+		except KeyboardInterrupt:
+			print("Stopping stream server")
+		finally:
+			self.close()
+			self.print_stats()
+
+	def print_stats(self):
+		stats = self.scheduler.stats()
+		active = sum(stream.active for stream in self.streams)
+		print("Batches: {}, active streams: {}, mean batch size: {}, mean wait: {}s".format(
+			self.batches, active, stats["mean_batch_size"], stats["mean_wait_time"]))
+		print("Batch size histogram: {}".format(stats["batch_size"]))
+		print("Wait time histogram: {}".format(stats["wait_time"]))
+
+	def close(self):
+		for stream in self.streams:
+			if stream.active:
+				self.scheduler.cancel(stream)
+				stream.close()
+
+def _parse_source(value):
+	# Sources are given as NAME=PATH, a digit path selects a camera index
+	if "=" not in value:
+		raise argparse.ArgumentTypeError("Source must be given as NAME=PATH")
+	name, source = value.split("=", 1)
+	if source.isdigit():
+		source = int(source)
+	return name, source
+
+def parse_args():
+	parser = argparse.ArgumentParser(description="Run crowd analysis on many feeds with shared models")
+	parser.add_argument("--source", action="append", type=_parse_source, required=True,
+		help="Feed to analyse as NAME=PATH, may be repeated. Use a camera index or stream URL for live feeds.")
+	parser.add_argument("--output", default="processed_data",
+		help="Directory under which every feed gets its own data folder.")
+	parser.add_argument("--max-batch", type=int, default=8,
+		help="Maximum number of frames detected in one batch.")
+	parser.add_argument("--max-wait", type=float, default=0.05,
+		help="Maximum time in seconds a frame waits for its batch to fill.")
+	return parser.parse_args()
+
+def main():
+	args = parse_args()
+	server = StreamServer(args.source, args.output, max_batch=args.max_batch, max_wait=args.max_wait)
+	START_TIME = time.time()
+	server.run()
+	print("Time elapsed: ", time.time() - START_TIME)
+
+if __name__ == "__main__":
+	main()
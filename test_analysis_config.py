@@ -0,0 +1,33 @@
+"""
+Tests for the runtime settings of an analysis
+"""
+import datetime
+import dataclasses
+import pytest
+import config
+from analysis_config import AnalysisConfig, default_config
+
+def test_defaults_follow_config():
+    settings = default_config()
+    assert settings.video_cap == config.VIDEO_CONFIG["VIDEO_CAP"]
+    assert settings.social_distance == config.SOCIAL_DISTANCE
+    assert settings.re_start_time == config.RE_START_TIME
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        settings.social_distance = 10
+
+def test_file_and_command_line_overrides(tmp_path):
+    """Settings files and KEY=VALUE options only change the named settings"""
+    path = tmp_path / "night.yaml"
+    path.write_text("SOCIAL_DISTANCE: 35\nre_check: true\nre_start_time: '20:00:00'\nstart_time: 2021-03-01 18:30:00\n")
+    settings = AnalysisConfig.load(str(path))
+    assert settings.social_distance == 35 and settings.re_check
+    assert settings.re_start_time == datetime.time(20, 0)
+    assert settings.start_time == datetime.datetime(2021, 3, 1, 18, 30)
+    assert settings.frame_size == config.FRAME_SIZE
+
+    changed = settings.override(["MIN_CONF=0.5", "SD_CHECK=false", "video_cap=other.mp4"])
+    assert (changed.min_conf, changed.sd_check, changed.video_cap) == (0.5, False, "other.mp4")
+    # The original settings are left as they were
+    assert settings.min_conf == config.MIN_CONF
+    with pytest.raises(ValueError):
+        settings.replace(UNKNOWN=1)
@@ -0,0 +1,47 @@
+"""
+Tests for the frame channel between the analysis engine and the GUI
+"""
+import multiprocessing
+import numpy as np
+from analysis_engine import FrameChannel
+
+def test_frame_channel_hands_over_latest_frame():
+    """The reader always gets the newest frame, frames it did not take in time are skipped"""
+    context = multiprocessing.get_context('spawn')
+    channel = FrameChannel.create(context, 64 * 64 * 3)
+    worker = FrameChannel.attach(channel.handles())
+    try:
+        assert channel.take() is None
+        for value in range(5):
+            assert worker.publish(np.full((32, 48, 3), value, dtype=np.uint8))
+        frame = channel.take()
+        assert frame.shape == (32, 48, 3) and (frame == 4).all()
+        assert channel.take() is None
+
+        worker.publish(np.full((16, 16, 3), 9, dtype=np.uint8))
+        assert (channel.take() == 9).all()
+
+        # Frames larger than the slot are scaled down to fit
+        assert worker.publish(np.ones((128, 128, 3), dtype=np.uint8))
+        assert channel.take().nbytes <= 64 * 64 * 3
+    finally:
+        worker.close()
+        channel.close(unlink=True)
+
+def test_frame_being_read_is_not_overwritten():
+    context = multiprocessing.get_context('spawn')
+    channel = FrameChannel.create(context, 16 * 16 * 3)
+    worker = FrameChannel.attach(channel.handles())
+    try:
+        worker.publish(np.full((16, 16, 3), 1, dtype=np.uint8))
+        # Pretend the reader is copying the newest slot while frames keep arriving
+        channel.state[1] = channel.state[0]
+        reading = channel.state[0]
+        for value in range(2, 6):
+            worker.publish(np.full((16, 16, 3), value, dtype=np.uint8))
+        assert (channel._slot(reading, (16, 16, 3)) == 1).all()
+        channel.state[1] = -1
+        assert (channel.take() == 5).all()
+    finally:
+        worker.close()
+        channel.close(unlink=True)
@@ -0,0 +1,73 @@
+"""
+Tests for the SQLite analytics store
+"""
+import io
+import csv
+import datetime
+from analytics_db import AnalyticsStore, video_clock
+from data_writer import TeeWriter
+
+def test_crowd_aggregates(tmp_path):
+    """Batched crowd rows are summarised per run and per hour"""
+    store = AnalyticsStore(str(tmp_path / "analytics.db"))
+    start = datetime.datetime(2024, 1, 1, 10, 0, 0)
+    run_id = store.start_run("gate", "gate.mp4")
+    csv_file = io.StringIO()
+    writer = TeeWriter(csv.writer(csv_file), store.crowd_writer(run_id, "gate", video_clock(start, 10), batch_size=7))
+    for frame in range(0, 72000, 100):
+        writer.writerow([frame, frame // 7200 + 1, 1, 0, 0])
+    writer.sync()
+
+    summary = store.crowd_summary(run_id)
+    assert summary["rows"] == 720 == len(csv_file.getvalue().splitlines())
+    assert summary["max_people"] == 10
+    assert summary["total_violations"] == 720
+    assert summary["last_people"] == 10
+
+    peaks = store.peak_count_per_hour(since=start, camera="gate")
+    assert [peak for camera, hour, peak in peaks] == [5, 10]
+    store.close()
+
+def test_resume_drops_rows_after_checkpoint(tmp_path):
+    """Resuming a run removes the rows recorded after the checkpoint"""
+    store = AnalyticsStore(str(tmp_path / "analytics.db"))
+    clock = video_clock(datetime.datetime(2024, 1, 1), 25)
+    run_id = store.start_run("gate")
+    crowd = store.crowd_writer(run_id, "gate", clock)
+    movement = store.movement_writer(run_id, "gate", clock)
+    for frame in range(10):
+        crowd.writerow([frame, 1, 0, 0, 0])
+    movement.writerow([1, 0, 4, 10, 20, 11, 21])
+    movement.writerow([2, 2, 8, 5, 6])
+    crowd.close()
+    movement.close()
+
+    assert store.resume_run("gate", clock(5)) == run_id
+    assert store.crowd_summary(run_id)["rows"] == 6
+    assert store.track_positions(1).tolist() == [[10, 20], [11, 21]]
+    assert store.track_positions(2) is None
+    store.close()
+
+def test_resume_after_stop_drops_closed_tracks(tmp_path):
+    """Tracks closed when the analysis was stopped are written again after resuming, so only one copy is kept"""
+    store = AnalyticsStore(str(tmp_path / "analytics.db"))
+    clock = video_clock(datetime.datetime(2024, 1, 1), 25)
+    run_id = store.start_run("gate")
+    crowd = store.crowd_writer(run_id, "gate", clock)
+    movement = store.movement_writer(run_id, "gate", clock)
+    for frame in range(6):
+        crowd.writerow([frame, 1, 0, 0, 0])
+    movement.writerow([1, 0, 4, 10, 20, 11, 21])
+    crowd.sync()
+    movement.sync()
+    marks = store.row_marks()
+    # Stopped at frame 5, the track still on screen is closed at the checkpoint frame
+    movement.writerow([2, 2, 5, 5, 6])
+    movement.close()
+    crowd.close()
+
+    assert store.resume_run("gate", clock(5), marks) == run_id
+    assert store.crowd_summary(run_id)["rows"] == 6
+    assert store.track_positions(2) is None
+    assert store.track_positions(1).tolist() == [[10, 20], [11, 21]]
+    store.close()
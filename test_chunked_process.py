@@ -0,0 +1,66 @@
+"""
+Tests for the parallel chunk processing and the stitching of its tracks
+"""
+import numpy as np
+import chunked_process
+from chunked_process import process_chunk, stitch_tracks
+
+FRAME_SIZE = 320
+
+class FakeCapture:
+    """Video of blank frames"""
+
+    def __init__(self, path):
+        self.frames = 0
+
+    def get(self, prop):
+        return 5.0
+
+    def set(self, prop, value):
+        self.frames = int(value)
+
+    def read(self):
+        self.frames += 1
+        return True, np.zeros((180, 320, 3), dtype=np.uint8)
+
+    def release(self):
+        pass
+
+def fake_detect_human(net, ln, frame, encoder, tracker, time, settings=None):
+    # One person walking right, missed by the detector on every fifth frame
+    from tracking import _update_tracker
+    if time % 5 == 0:
+        return [[], []]
+    x = 10 + 4 * time
+    feature = np.ones(8, dtype=np.float32)
+    return list(_update_tracker(tracker, [[x - 10, 40, 20, 60]], [(x, 70)], [0.9], [feature], time))
+
+def run_chunk(monkeypatch, warmup_start, start, end):
+    import models
+    import tracking
+    monkeypatch.setattr(models, "load_detector", lambda config, weights: (None, None))
+    monkeypatch.setattr(models, "load_encoder", lambda: None)
+    monkeypatch.setattr(tracking, "detect_human", fake_detect_human)
+    monkeypatch.setattr(chunked_process.cv2, "VideoCapture", FakeCapture)
+    monkeypatch.setattr(chunked_process, "DATA_RECORD", False)
+    return process_chunk("video.mp4", warmup_start, start, end, FRAME_SIZE)
+
+def test_frames_without_detections_add_no_times(monkeypatch):
+    """Every recorded centroid has exactly one frame time"""
+    _, tracks = run_chunk(monkeypatch, 0, 0, 40)
+    assert tracks
+    for track in tracks:
+        assert len(track["times"]) == len(track["positions"])
+        assert not any(time % 5 == 0 for time in track["times"][1:])
+
+def test_stitch_tracks_across_missed_frames(monkeypatch):
+    """Tracks of consecutive chunks are joined without losing or repeating centroids"""
+    _, first = run_chunk(monkeypatch, 0, 0, 40)
+    _, second = run_chunk(monkeypatch, 30, 40, 60)
+    open_tracks = [track for track in first if track["open"]]
+    finished, merged = stitch_tracks(open_tracks, second, 40, FRAME_SIZE)
+    assert finished == [] and len(merged) == 1
+    track = merged[0]
+    assert len(track["times"]) == len(track["positions"])
+    assert track["times"] == sorted(set(track["times"]))
+    assert track["times"][-1] == 59
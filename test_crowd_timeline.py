@@ -0,0 +1,35 @@
+"""
+Tests for the vectorized crowd timeline helpers
+"""
+import datetime
+import numpy as np
+from crowd_timeline import row_times, flag_runs, lttb
+
+def test_row_times_match_accumulated_steps():
+    """Row times are the start time plus one time step per row"""
+    start = datetime.datetime(2020, 11, 5, 9, 0, 0)
+    times = row_times(start, 0.2, 1000)
+    expected = []
+    time = start
+    for _ in range(1000):
+        time += datetime.timedelta(seconds=0.2)
+        expected.append(np.datetime64(time, 'us'))
+    assert (times == np.array(expected)).all()
+
+def test_flag_runs_merge_consecutive_rows():
+    """Consecutive flags become a single run"""
+    starts, lengths = flag_runs([0, 1, 1, 0, 1, 0, 0, 1, 1, 1])
+    assert starts.tolist() == [1, 4, 7]
+    assert lengths.tolist() == [2, 1, 3]
+    assert len(flag_runs([0, 0])[0]) == 0
+
+def test_lttb_keeps_ends_and_peaks():
+    """Downsampling keeps the first and last points and a lone spike"""
+    counts = np.zeros(100000)
+    counts[54321] = 80
+    kept = lttb(counts, 500)
+    assert len(kept) == 500
+    assert kept[0] == 0 and kept[-1] == len(counts) - 1
+    assert 54321 in kept
+    assert np.all(np.diff(kept) > 0)
+    assert lttb(counts[:10], 500).tolist() == list(range(10))
@@ -0,0 +1,64 @@
+"""
+Tests for the buffered data writer
+"""
+import csv
+import threading
+import pytest
+from data_writer import BufferedRowWriter, open_data_writers, close_data_writers
+
+def test_buffered_rows_keep_order(tmp_path):
+    """Rows written through the background thread reach the file in order"""
+    data_files, movement_writer, crowd_writer = open_data_writers(str(tmp_path), buffered=True)
+    assert isinstance(crowd_writer, BufferedRowWriter)
+    for time in range(1000):
+        crowd_writer.writerow([time, 1, 0, 0, 0])
+        if time == 500:
+            crowd_writer.sync()
+    metrics = crowd_writer.metrics()
+    close_data_writers(data_files, movement_writer, crowd_writer)
+
+    with open(tmp_path / "crowd_data.csv") as crowd_file:
+        rows = list(csv.reader(crowd_file))
+    assert rows[0][0] == "Time"
+    assert [int(row[0]) for row in rows[1:]] == list(range(1000))
+    assert metrics["max_queued_rows"] > 0
+
+def test_backpressure(tmp_path):
+    """A full buffer blocks the caller instead of growing without bound"""
+    with open(tmp_path / "data.csv", "w") as data_file:
+        writer = BufferedRowWriter(data_file, max_rows=10, max_delay=10, max_pending=20)
+        for index in range(200):
+            writer.writerow([index])
+        writer.close()
+        assert writer.metrics()["max_queued_rows"] <= 20
+        assert writer.rows_written == 200
+
+class FullDisk:
+    """File object whose writes fail like on a full disk"""
+
+    def write(self, data):
+        raise OSError(28, "No space left on device")
+
+    def flush(self):
+        pass
+
+def test_write_error_reaches_the_caller():
+    """A failed flush is raised by the writer instead of blocking it forever"""
+    writer = BufferedRowWriter(FullDisk(), max_rows=2, max_delay=10, max_pending=4)
+    errors = []
+
+    def produce():
+        try:
+            for index in range(100):
+                writer.writerow([index])
+        except OSError as error:
+            errors.append(error)
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    producer.join(timeout=5)
+    assert not producer.is_alive()
+    assert errors and errors[0].errno == 28
+    with pytest.raises(OSError):
+        writer.sync()
+    with pytest.raises(OSError):
+        writer.close()
@@ -0,0 +1,51 @@
+"""
+Tests for the online abnormal energy calibration
+"""
+import numpy as np
+from types import SimpleNamespace
+from energy_calibration import P2Quantile, EnergyCalibrator, load_calibrator, save_calibrator
+
+def test_streaming_quantile():
+    """The P-square estimate stays close to the exact quantile"""
+    energies = np.random.default_rng(0).lognormal(5, 1, 20000)
+    quantile = P2Quantile(0.9)
+    for energy in energies:
+        quantile.add(energy)
+    assert abs(quantile.value() / np.quantile(energies, 0.9) - 1) < 0.02
+
+def test_threshold_follows_trimmed_mean(tmp_path):
+    """The threshold is the trimmed mean energy to the power 1.05 and survives a restart"""
+    energies = np.random.default_rng(1).lognormal(6, 0.8, 20000)
+    calibrator = EnergyCalibrator(0.2, 1080, min_samples=500)
+    assert calibrator.threshold == 1866
+    for energy in energies:
+        calibrator.add(energy)
+    trimmed = energies[energies < np.quantile(energies, 0.99)]
+    assert abs(calibrator.threshold / trimmed.mean() ** 1.05 - 1) < 0.02
+
+    path = str(tmp_path / "energy_thresholds.json")
+    save_calibrator("gate", calibrator, path)
+    restored = load_calibrator("gate", 0.2, 1080, path)
+    assert restored.threshold == calibrator.threshold
+    assert restored.count == calibrator.count
+
+def test_stationary_individuals_are_skipped():
+    """Only individuals that moved beyond the stationary distance are calibrated on"""
+    calibrator = EnergyCalibrator(1.0, 1000, min_samples=1)
+    still = SimpleNamespace(positions=[(100, 100)] * 5)
+    walking = SimpleNamespace(positions=[(100 + 20 * i, 100) for i in range(5)])
+    calibrator.update([still, walking], [0, 200])
+    assert calibrator.count == 1 and calibrator.mean == 200
+
+def test_warm_up_outliers_are_trimmed():
+    """Outliers among the first energies are trimmed once the quantile is known"""
+    energies = np.full(1000, 100.0)
+    energies[:3] = 1e6
+    calibrator = EnergyCalibrator(0.2, 1080, min_samples=500)
+    for energy in energies[:499]:
+        calibrator.add(energy)
+    assert calibrator.count == 0 and calibrator.threshold == 1866
+    for energy in energies[499:]:
+        calibrator.add(energy)
+    assert calibrator.trimmed == 3 and calibrator.mean == 100
+    assert calibrator.threshold == int(100 ** 1.05)
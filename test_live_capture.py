@@ -0,0 +1,32 @@
+"""
+Tests for the live camera frame reader
+"""
+import time
+import threading
+from live_capture import LatestFrameReader
+
+class SlowCapture:
+    """Capture whose reads take a while, recording reads that overlap its release"""
+
+    def __init__(self):
+        self.reading = threading.Event()
+        self.released = False
+        self.read_after_release = False
+
+    def read(self):
+        self.reading.set()
+        time.sleep(0.05)
+        self.read_after_release |= self.released
+        return (True, object())
+
+    def release(self):
+        self.released = True
+
+def test_release_waits_for_pending_read():
+    cap = SlowCapture()
+    reader = LatestFrameReader(cap)
+    cap.reading.wait()
+    reader.release()
+    assert cap.released
+    assert not reader._thread.is_alive()
+    assert not cap.read_after_release
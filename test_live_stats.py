@@ -0,0 +1,31 @@
+"""
+Tests for the live crowd statistics
+"""
+from live_stats import CrowdDataTail
+
+HEADER = "Time,Human Count,Social Distance violate,Restricted Entry,Abnormal Activity\n"
+
+def test_tail_parses_only_new_rows(tmp_path):
+    """Rows are counted once, a partly written row waits for the next poll"""
+    path = tmp_path / "crowd_data.csv"
+    path.write_text(HEADER + "5,3,0,0,0\n10,7,2,0,1\n15,4")
+    tail = CrowdDataTail(str(path))
+    assert tail.poll() == 2
+    assert tail.poll() == 0
+
+    with open(path, "a") as data_file:
+        data_file.write(",1,0,0\n")
+    summary = tail.summary()
+    assert summary["rows"] == 3
+    assert (summary["max_people"], summary["avg_people"]) == (7, 14 / 3)
+    assert (summary["total_violations"], summary["violation_frames"], summary["abnormal_frames"]) == (3, 2, 1)
+    assert (summary["start"], summary["end"], summary["last_people"]) == (5, 15, 4)
+
+def test_rewritten_file_starts_over(tmp_path):
+    path = tmp_path / "crowd_data.csv"
+    path.write_text(HEADER + "5,3,0,0,0\n10,7,2,0,1\n")
+    tail = CrowdDataTail(str(path))
+    tail.poll()
+    path.write_text(HEADER + "5,9,0,0,0\n")
+    summary = tail.summary()
+    assert (summary["rows"], summary["max_people"]) == (1, 9)
@@ -0,0 +1,42 @@
+"""
+Tests for the model server protocol
+"""
+import os
+import stat
+import time
+import threading
+import pytest
+from model_server import ModelServer, server_available, shutdown, _connect, _read_key
+
+def start_server(tmp_path):
+    # Only the connection handling is exercised, without loading the models
+    server = ModelServer.__new__(ModelServer)
+    server.address = str(tmp_path / "server.sock")
+    server.key_path = str(tmp_path / "server.key")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    for _ in range(100):
+        if os.path.exists(server.address):
+            break
+        time.sleep(0.05)
+    return server, thread
+
+def test_ping_and_shutdown(tmp_path):
+    """A client needs the key written by the server and can stop it"""
+    assert not server_available(str(tmp_path / "server.sock"), str(tmp_path / "server.key"))
+    server, thread = start_server(tmp_path)
+    assert stat.S_IMODE(os.stat(server.key_path).st_mode) == 0o600
+
+    # A client holding a connection open does not keep others waiting
+    with _connect(server.address, server.key_path):
+        assert server_available(server.address, server.key_path)
+    shutdown(server.address, server.key_path)
+    thread.join(5)
+    assert not thread.is_alive()
+
+def test_key_readable_by_others_is_refused(tmp_path):
+    key_path = tmp_path / "server.key"
+    key_path.write_bytes(b"key")
+    os.chmod(key_path, 0o644)
+    with pytest.raises(PermissionError):
+        _read_key(str(key_path))
@@ -0,0 +1,72 @@
+"""
+Tests for the stationary heatmap rendering
+"""
+import cv2
+import numpy as np
+from movement_maps import colorize_heatmap, composite_heatmap, render_heatmap, stationary_heatmap, draw_blob, \
+    draw_trails, TRAIL_COLOR_START, TRAIL_COLOR_END
+from colors import gradient_color_RGB
+from trajectory import flatten_tracks
+
+def _composite_per_pixel(heatmap, background):
+    # The per pixel loop the vectorized compositing replaced
+    heatmap = heatmap.copy()
+    for row in range(heatmap.shape[0]):
+        for col in range(heatmap.shape[1]):
+            if (heatmap[row][col] == np.array([0, 0, 0])).all():
+                heatmap[row][col] = background[row][col]
+    return cv2.addWeighted(heatmap, 0.75, background, 0.25, 1)
+
+def test_composite_matches_per_pixel_loop():
+    """Mask based compositing gives the same image as the per pixel loop"""
+    rng = np.random.default_rng(0)
+    background = rng.integers(0, 256, (60, 80, 3), dtype=np.uint8)
+    stationary_points = [[[20, 30], 40], [[50, 25], 200], [[70, 50], 5]]
+    heatmap = colorize_heatmap(stationary_heatmap(background.shape, stationary_points, 80))
+
+    expected = _composite_per_pixel(heatmap, background)
+    assert np.array_equal(composite_heatmap(heatmap, background), expected)
+    assert np.array_equal(render_heatmap(background, stationary_points, 80), expected)
+
+def test_density_matches_blob_drawing():
+    """Stamped blobs add up to the same heatmap as full frame drawing, also at the borders"""
+    rng = np.random.default_rng(1)
+    shape = (90, 160)
+    stationary_points = [[[int(rng.integers(-10, 170)), int(rng.integers(-10, 100))], float(rng.uniform(0, 200))]
+        for _ in range(100)]
+    expected = np.zeros(shape, dtype=np.uint8)
+    for points in stationary_points:
+        draw_heatmap = np.zeros(shape, dtype=np.uint8)
+        draw_blob(draw_heatmap, tuple(points[0]), points[1], 160)
+        expected = cv2.add(expected, draw_heatmap)
+    assert np.array_equal(stationary_heatmap(shape, stationary_points, 160), expected)
+
+def test_live_map_decays(tmp_path):
+    """Occupancy halves every half life and snapshots are exported in the background while updating"""
+    from types import SimpleNamespace
+    from movement_maps import LiveOccupancyMap
+    export_path = str(tmp_path / "live_heatmap.png")
+    live_map = LiveOccupancyMap(320, half_life=4, export_path=export_path, export_interval=0)
+    frame = np.zeros((180, 320, 3), dtype=np.uint8)
+    track = SimpleNamespace(track_id=1, positions=[(50, 60)])
+    live_map.update([track], 1.0, frame)
+    for _ in range(4):
+        live_map.update([], 1.0, frame)
+
+    live_map.close()
+
+    occupancy, dwell, trails = live_map.grids()
+    assert np.isclose(occupancy.sum(), 0.5)
+    assert occupancy[60 // 8, 50 // 8] == occupancy.max()
+    assert cv2.imread(export_path).shape == frame.shape
+
+def test_trails_match_per_segment_lines():
+    """Batched trails of a single track draw the same gradient as one line per step"""
+    track = [[10, 10], [40, 25], [80, 30], [120, 90], [150, 60]]
+    expected = np.zeros((120, 200, 3), dtype=np.uint8)
+    for i in range(len(track) - 1):
+        color = gradient_color_RGB(TRAIL_COLOR_START, TRAIL_COLOR_END, len(track) - 1, i)
+        cv2.line(expected, tuple(track[i]), tuple(track[i + 1]), color, 2)
+    x, y, offsets = flatten_tracks([track])
+    frame = draw_trails(np.zeros((120, 200, 3), dtype=np.uint8), x, y, offsets, levels=5)
+    assert np.array_equal(frame, expected)
@@ -0,0 +1,65 @@
+"""
+Tests for the time partitioned output of live feeds
+"""
+import os
+import datetime
+from data_writer import open_data_writers, close_data_writers
+from checkpoint import file_offsets
+from partitioned_writer import PartitionedWriter, load_manifest, read_partitions
+
+def test_hourly_segments(tmp_path):
+    """Rows are split by hour, closed segments are compressed and listed in the manifest"""
+    writer = PartitionedWriter(str(tmp_path), "crowd_data", ["Time", "Human Count"], compression="gzip")
+    start = datetime.datetime(2024, 3, 1, 10, 50)
+    for minute in range(0, 130, 10):
+        writer.writerow([start + datetime.timedelta(minutes=minute), minute])
+    writer.close()
+
+    segments = load_manifest(str(tmp_path), "crowd_data")
+    assert [segment["file"] for segment in segments] == [
+        "crowd_data-20240301-10.csv.gz", "crowd_data-20240301-11.csv.gz", "crowd_data-20240301-12.csv.gz"]
+    assert [segment["rows"] for segment in segments] == [1, 6, 6]
+    assert all(os.path.exists(tmp_path / segment["file"]) for segment in segments)
+
+    rows = list(read_partitions(str(tmp_path), "crowd_data", start=datetime.datetime(2024, 3, 1, 11, 30),
+        end=datetime.datetime(2024, 3, 1, 12, 0)))
+    assert [int(row[1]) for row in rows] == [10, 20, 30, 40, 50, 60]
+
+def test_restart_continues_segment(tmp_path):
+    """A restarted feed appends to the segment of the current period"""
+    time = datetime.datetime(2024, 3, 1, 10, 0)
+    for count in range(2):
+        data_files, movement_writer, crowd_writer = open_data_writers(str(tmp_path), live=True, buffered=True,
+            partition="day", compression="gzip")
+        assert len(data_files) == 2
+        crowd_writer.writerow([time, count, 0, 0, 0, 0, 1])
+        close_data_writers(data_files, movement_writer, crowd_writer)
+
+    segments = load_manifest(str(tmp_path), "crowd_data")
+    assert len(segments) == 1 and segments[0]["rows"] == 2
+    assert [row[1] for row in read_partitions(str(tmp_path), "crowd_data")] == ["0", "1"]
+
+def test_resume_drops_rows_after_checkpoint(tmp_path):
+    """Rows written after a checkpoint, even in a later segment, are removed when resuming"""
+    start = datetime.datetime(2024, 3, 1, 10, 30)
+    data_files, movement_writer, crowd_writer = open_data_writers(str(tmp_path), live=True, buffered=True,
+        partition="hour", compression="gzip")
+    for minute in range(0, 20, 10):
+        crowd_writer.writerow([start + datetime.timedelta(minutes=minute), minute, 0, 0, 0, 0, 1])
+    crowd_writer.sync()
+    offsets = file_offsets(data_files)
+    # Stopped after another row of this hour and the first one of the next
+    for minute in range(20, 40, 10):
+        crowd_writer.writerow([start + datetime.timedelta(minutes=minute), minute, 0, 0, 0, 0, 1])
+    close_data_writers(data_files, movement_writer, crowd_writer)
+
+    data_files, movement_writer, crowd_writer = open_data_writers(str(tmp_path), live=True, buffered=True,
+        partition="hour", compression="gzip", offsets=offsets)
+    for minute in range(20, 40, 10):
+        crowd_writer.writerow([start + datetime.timedelta(minutes=minute), 90 + minute, 0, 0, 0, 0, 1])
+    close_data_writers(data_files, movement_writer, crowd_writer)
+
+    assert [row[1] for row in read_partitions(str(tmp_path), "crowd_data")] == ["0", "10", "110", "120"]
+    segments = load_manifest(str(tmp_path), "crowd_data")
+    assert [(segment["file"], segment["rows"]) for segment in segments] == [
+        ("crowd_data-20240301-10.csv.gz", 3), ("crowd_data-20240301-11.csv.gz", 1)]
@@ -0,0 +1,48 @@
+"""
+Tests for the cache of generated plots
+"""
+import types
+import linecache
+from plot_cache import PlotCache, split_stale
+
+def draw_counts(output_dir, dataset=None):
+    (output_dir / "counts.png").write_bytes(b"png")
+    return True
+
+def test_only_changed_inputs_are_stale(tmp_path):
+    """A plot is skipped until one of its inputs changes or its file is removed"""
+    data_path = tmp_path / "crowd_data.csv"
+    data_path.write_text("Time,Human Count\n5,3\n")
+    output_dir = tmp_path / "plots"
+    output_dir.mkdir()
+    specs = {"draw_counts": {"inputs": [str(data_path)], "outputs": ["counts.png"]}}
+
+    cache = PlotCache(output_dir)
+    stale, fresh = split_stale(cache, [draw_counts], specs)
+    assert fresh == [] and len(stale) == 1
+    draw_counts(output_dir)
+    cache.record("draw_counts", stale[0][1], ["counts.png"])
+    cache.save()
+
+    cache = PlotCache(output_dir)
+    stale, fresh = split_stale(cache, [draw_counts], specs)
+    assert fresh == ["draw_counts"] and stale == []
+    assert len(split_stale(cache, [draw_counts], specs, force=True)[0]) == 1
+
+    data_path.write_text("Time,Human Count\n5,3\n10,4\n")
+    assert split_stale(PlotCache(output_dir), [draw_counts], specs)[1] == []
+
+    (output_dir / "counts.png").unlink()
+    data_path.write_text("Time,Human Count\n5,3\n")
+    assert split_stale(PlotCache(output_dir), [draw_counts], specs)[1] == []
+
+def test_helper_module_change_makes_plot_stale(tmp_path):
+    """Editing a helper module used by a generator invalidates its plots"""
+    helper = types.ModuleType("helper")
+    helper.__file__ = str(tmp_path / "helper.py")
+    (tmp_path / "helper.py").write_text("def scale(value):\n    return value\n")
+    cache = PlotCache(tmp_path)
+    key = cache.key(draw_counts, [], helpers=[helper])
+    (tmp_path / "helper.py").write_text("def scale(value):\n    return 2 * value\n")
+    linecache.checkcache(helper.__file__)
+    assert cache.key(draw_counts, [], helpers=[helper]) != key
@@ -0,0 +1,23 @@
+"""
+Tests for the dataset shared by the plot generators
+"""
+from plot_dataset import PlotDataset, load_plot_dataset
+
+def test_share_and_attach(tmp_path):
+    """Crowd columns are parsed once and read back from shared memory"""
+    crowd_path = tmp_path / "crowd_data.csv"
+    crowd_path.write_text(
+        "Time,Human Count,Social Distance violate,Restricted Entry,Abnormal Activity\n"
+        "5,3,1,0,0\n"
+        "10,4,0,1,1\n"
+    )
+    dataset = load_plot_dataset(str(crowd_path), str(tmp_path / "video_data.json"),
+        str(tmp_path / "movement_data.csv"), str(tmp_path / "tracks"))
+    assert dataset.video_data is None and dataset.track_dir is None
+
+    handles = dataset.share()
+    attached = PlotDataset.attach(handles)
+    assert attached.crowd["human_count"].tolist() == [3, 4]
+    assert attached.crowd["abnormal_activity"].tolist() == [0, 1]
+    attached.close()
+    dataset.close(unlink=True)
@@ -0,0 +1,42 @@
+"""
+Import time budget of the command line entry points
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# Modules that take long to import and are only needed once an analysis runs
+HEAVY_MODULES = {"cv2", "numpy", "scipy", "imutils", "tensorflow", "deep_sort", "matplotlib", "pandas"}
+# Generous enough for slow machines, loading OpenCV or numpy alone goes over it
+IMPORT_BUDGET_US = 150000
+
+def import_times(*args):
+    # Cumulative import time of every module imported by the command and the total of the top level ones
+    result = subprocess.run([sys.executable, "-X", "importtime", *args], cwd=ROOT,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    times = {}
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+        # Nested imports are indented below the module importing them
+        if not name[1:].startswith(" "):
+            total += int(cumulative)
+    return times, total
+
+def test_help_skips_heavy_imports():
+    """--help of main.py and the model server answers without loading OpenCV, numpy or TensorFlow"""
+    for script in ("main.py", "model_server.py"):
+        times, total = import_times(script, "--help")
+        loaded = {name.split(".")[0] for name in times}
+        assert not loaded & HEAVY_MODULES, (script, loaded & HEAVY_MODULES)
+        assert total < IMPORT_BUDGET_US, (script, total)
+
+def test_pipeline_imports_without_tensorflow():
+    """The analysis modules only import TensorFlow once its encoder is loaded"""
+    times, _ = import_times("-c", "import analysis_run, analysis_engine, models")
+    assert "tensorflow" not in times
@@ -0,0 +1,32 @@
+"""
+Tests for the columnar movement track store
+"""
+import numpy as np
+from track_store import TrackStoreWriter, convert_csv, load_track_store
+
+def test_convert_csv_round_trip(tmp_path):
+    """Tracks converted from the movement CSV keep their ids, times and points"""
+    csv_path = tmp_path / "movement_data.csv"
+    csv_path.write_text(
+        "Track ID,Entry time,Exit Time,Movement Tracks\n"
+        "3,5,40,10,20,11,21,12,22\n"
+        "4,6,41,1,2\n"
+    )
+    convert_csv(str(csv_path), str(tmp_path / "tracks"))
+    store = load_track_store(str(tmp_path / "tracks"))
+
+    assert len(store) == 2
+    assert store.track_id.tolist() == [3, 4]
+    assert store.entry.tolist() == [5, 6]
+    assert store.exit.tolist() == [40, 41]
+    assert store.time_unit == 'frame'
+    assert store.points(0).tolist() == [[10, 20], [11, 21], [12, 22]]
+    assert store.point_lists(min_points=2) == [[[10, 20], [11, 21], [12, 22]]]
+
+def test_empty_store(tmp_path):
+    """A run without tracks still produces a loadable store"""
+    TrackStoreWriter(str(tmp_path / "tracks")).close()
+    store = load_track_store(str(tmp_path / "tracks"))
+    assert len(store) == 0
+    assert store.offsets.tolist() == [0]
+    assert isinstance(store.x, np.ndarray)
@@ -0,0 +1,66 @@
+"""
+Tests for the vectorized trajectory analytics
+"""
+import numpy as np
+from scipy.spatial.distance import euclidean
+from trajectory import flatten_tracks, step_speeds, kinetic_energies, analyze_tracks, stationary_segments, gather_segments
+
+TRACKS = [[[0, 0], [3, 4], [3, 4], [9, 12]], [[100, 100]], [], [[5, 5], [5, 25]]]
+
+def test_energies_match_pairwise_loop():
+    """Speeds never join two tracks and energies match the pairwise computation"""
+    time_step = 0.2
+    expected = []
+    for track in TRACKS:
+        for i in range(len(track) - 1):
+            speed = round(euclidean(track[i], track[i + 1]) / time_step, 2)
+            expected.append(int(0.5 * speed ** 2))
+
+    x, y, offsets = flatten_tracks(TRACKS)
+    assert offsets.tolist() == [0, 4, 5, 5, 7]
+    assert kinetic_energies(step_speeds(x, y, offsets, time_step)).tolist() == expected
+
+def test_track_summaries():
+    """Per track summaries cover every track, including the ones without steps"""
+    x, y, offsets = flatten_tracks(TRACKS)
+    result = analyze_tracks(x, y, offsets, 1.0)
+    tracks = result["tracks"]
+    assert tracks["steps"].tolist() == [3, 0, 0, 1]
+    assert tracks["distance"].tolist() == [15.0, 0.0, 0.0, 20.0]
+    assert tracks["max_speed"].tolist() == [10.0, 0.0, 0.0, 20.0]
+    assert result["distribution"]["count"] == 4
+
+def _useful_tracks(tracks, stationary_time, stationary_distance):
+    # The rescanning loop the vectorized segmentation replaced
+    useful_tracks = []
+    for movement in tracks:
+        if len(movement) <= stationary_time:
+            continue
+        check_index = stationary_time
+        start_point = 0
+        track = movement[:check_index]
+        while check_index < len(movement):
+            for i in movement[check_index:]:
+                if euclidean(movement[start_point], i) > stationary_distance:
+                    track.append(i)
+                    start_point += 1
+                    check_index += 1
+                else:
+                    start_point += 1
+                    check_index += 1
+                    break
+            useful_tracks.append(track)
+            track = movement[start_point:check_index]
+    return useful_tracks
+
+def test_segments_match_rescanning_loop():
+    """Vectorized segmentation finds the same moving segments as the original loop"""
+    rng = np.random.default_rng(3)
+    tracks = [(np.cumsum(rng.integers(-4, 5, (int(rng.integers(0, 30)), 2)), axis=0) + 50).tolist() for _ in range(200)]
+    for stationary_time, stationary_distance in [(1, 0.5), (3, 3.0), (5, 10.8)]:
+        x, y, offsets = flatten_tracks(tracks)
+        starts, ends = stationary_segments(x, y, offsets, stationary_time, stationary_distance)
+        x, y, offsets = gather_segments(x, y, starts, ends)
+        segments = [np.stack([x[start:end], y[start:end]], axis=1).astype(int).tolist()
+            for start, end in zip(offsets[:-1], offsets[1:])]
+        assert segments == _useful_tracks([list(track) for track in tracks], stationary_time, stationary_distance)
@@ -0,0 +1,143 @@
+import os
+import csv
+import json
+import datetime
+import numpy as np
+
+TRACK_STORE_DIR = 'processed_data/movement_tracks'
+MOVEMENT_DATA_PATH = 'processed_data/movement_data.csv'
+_ARRAYS = ['track_id', 'entry', 'exit', 'offsets', 'x', 'y']
+
+def _time_value(value):
+	# Frame numbers are kept as they are, camera timestamps become epoch milliseconds
+	if isinstance(value, datetime.datetime):
+		return int(value.timestamp() * 1000), 'epoch_ms'
+	try:
+		return int(value), 'frame'
+	except ValueError:
+		value = datetime.datetime.fromisoformat(str(value))
+		return int(value.timestamp() * 1000), 'epoch_ms'
+
+def _parse_points(values):
+	# Convert the flattened centroids of a row, stopping at the first broken value
+	try:
+		points = np.array(values, dtype=np.int32)
+	except ValueError:
+		points = []
+		for value in values:
+			try:
+				points.append(int(value))
+			except ValueError:
+				break
+		points = np.array(points, dtype=np.int32)
+	return points[:len(points) // 2 * 2]
+
+class TrackStoreWriter:
+	"""Collect movement tracks and save them as flat columnar arrays.
+
+	Every track is stored as its id, entry and exit time and a slice of the
+	flat x and y arrays, delimited by `offsets`. Rows use the same layout as
+	the movement data CSV so the writer can stand in for a `csv.writer`.
+	"""
+
+	def __init__(self, directory=TRACK_STORE_DIR):
+		self.directory = directory
+		self.time_unit = 'frame'
+		self._ids = []
+		self._entries = []
+		self._exits = []
+		self._points = []
+
+	def add(self, track_id, entry, exit, points):
+		points = np.asarray(points, dtype=np.int32).reshape(-1, 2)
+		entry, self.time_unit = _time_value(entry)
+		exit, self.time_unit = _time_value(exit)
+		self._ids.append(int(track_id))
+		self._entries.append(entry)
+		self._exits.append(exit)
+		self._points.append(points)
+
+	def writerow(self, row):
+		points = _parse_points(row[3:])
+		self.add(row[0], row[1], row[2], points.reshape(-1, 2))
+
+	def close(self):
+		if not os.path.exists(self.directory):
+			os.makedirs(self.directory)
+		lengths = np.array([len(points) for points in self._points], dtype=np.int64)
+		offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+		np.cumsum(lengths, out=offsets[1:])
+		if self._points:
+			points = np.concatenate(self._points)
+		else:
+			points = np.zeros((0, 2), dtype=np.int32)
+		arrays = {
+			'track_id': np.array(self._ids, dtype=np.int64),
+			'entry': np.array(self._entries, dtype=np.int64),
+			'exit': np.array(self._exits, dtype=np.int64),
+			'offsets': offsets,
+			'x': np.ascontiguousarray(points[:, 0]),
+			'y': np.ascontiguousarray(points[:, 1])
+		}
+		for name, array in arrays.items():
+			np.save(os.path.join(self.directory, name + '.npy'), array)
+		with open(os.path.join(self.directory, 'meta.json'), 'w') as meta_file:
+			json.dump({'time_unit': self.time_unit, 'tracks': len(self._ids), 'points': int(offsets[-1])}, meta_file)
+
+class TrackStore:
+	"""Movement tracks loaded from a track store directory"""
+
+	def __init__(self, arrays, time_unit):
+		for name in _ARRAYS:
+			setattr(self, name, arrays[name])
+		self.time_unit = time_unit
+
+	def __len__(self):
+		return len(self.track_id)
+
+	def lengths(self):
+		return np.diff(self.offsets)
+
+	def points(self, index):
+		# Centroids of one track as an (n, 2) array
+		start, end = self.offsets[index], self.offsets[index + 1]
+		return np.stack([self.x[start:end], self.y[start:end]], axis=1)
+
+	def select(self, min_points=0):
+		# Indexes of the tracks with at least `min_points` centroids
+		return np.nonzero(self.lengths() >= min_points)[0]
+
+	def point_lists(self, min_points=0):
+		# Tracks as lists of [x, y] pairs, the layout the drawing code works with
+		return [self.points(index).tolist() for index in self.select(min_points)]
+
+def load_track_store(directory=TRACK_STORE_DIR, mmap=True):
+	"""Load a track store, memory mapping its arrays unless `mmap` is False"""
+	mmap_mode = 'r' if mmap else None
+	arrays = {name: np.load(os.path.join(directory, name + '.npy'), mmap_mode=mmap_mode) for name in _ARRAYS}
+	with open(os.path.join(directory, 'meta.json'), 'r') as meta_file:
+		meta = json.load(meta_file)
+	return TrackStore(arrays, meta['time_unit'])
+
+def convert_rows(rows, directory=TRACK_STORE_DIR):
+	"""Build a track store from movement data rows"""
+	writer = TrackStoreWriter(directory)
+	for row in rows:
+		# Skip the header and empty rows
+		if len(row) < 3 or not row[0].lstrip('-').isdigit():
+			continue
+		writer.writerow(row)
+	writer.close()
+	return directory
+
+def convert_csv(csv_path=MOVEMENT_DATA_PATH, directory=TRACK_STORE_DIR):
+	"""Build the track store of a movement data CSV"""
+	with open(csv_path, 'r') as file:
+		return convert_rows(csv.reader(file, delimiter=','), directory)
+
+def load_movement_tracks(csv_path=MOVEMENT_DATA_PATH, directory=TRACK_STORE_DIR):
+	"""Load the tracks of an analysis, rebuilding the store when the CSV is newer"""
+	meta_path = os.path.join(directory, 'meta.json')
+	if not os.path.exists(meta_path) or (os.path.exists(csv_path) and os.path.getmtime(csv_path) > os.path.getmtime(meta_path)):
+		convert_csv(csv_path, directory)
+	return load_track_store(directory)
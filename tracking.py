@@ -1,38 +1,44 @@
 import numpy as np
 import cv2
-from config import MIN_CONF, NMS_THRESH 
+from analysis_config import default_config
 
-from deep_sort import nn_matching
 from deep_sort.detection import Detection
-from deep_sort.tracker import Tracker
-from deep_sort import generate_detections as gdet
 
-def detect_human (net, ln, frame, encoder, tracker, time):
-# Get the dimension of the frame
-	(frame_height, frame_width) = frame.shape[:2]
+def _frame_blob(frames):
+	# Construct a blob from the input frames
+	return cv2.dnn.blobFromImages(frames, 1 / 255.0, (416, 416),
+		swapRB=True, crop=False)
+
+def _split_batch(layer_outputs, batch_size):
+	# Separate a batched forward pass into the outputs of every frame
+	if batch_size == 1:
+		return [layer_outputs]
+	per_frame = [[] for _ in range(batch_size)]
+	for output in layer_outputs:
+		if output.ndim == 3:
+			chunks = list(output)
+		else:
+			chunks = np.split(output, batch_size)
+		for i, chunk in enumerate(chunks):
+			per_frame[i].append(chunk)
+	return per_frame
+
+def _person_boxes(layer_outputs, frame_width, frame_height, min_conf, nms_thresh):
 	# Initialize lists needed for detection
 	boxes = []
 	centroids = []
 	confidences = []
 
-	# Construct a blob from the input frame 
-	blob = cv2.dnn.blobFromImage(frame, 1 / 255.0, (416, 416),
-		swapRB=True, crop=False)
-
-	# Perform forward pass of YOLOv3, output are the boxes and probabilities
-	net.setInput(blob)
-	layer_outputs = net.forward(ln)
-
 	# For each output
 	for output in layer_outputs:
-		# For each detection in output 
+		# For each detection in output
 		for detection in output:
-			# Extract the class ID and confidence 
+			# Extract the class ID and confidence
 			scores = detection[5:]
 			class_id = np.argmax(scores)
 			confidence = scores[class_id]
 			# Class ID for person is 0, check if the confidence meet threshold
-			if class_id == 0 and confidence > MIN_CONF:
+			if class_id == 0 and confidence > min_conf:
 				# Scale the bounding box coordinates back to the size of the image
 				box = detection[0:4] * np.array([frame_width, frame_height, frame_width, frame_height])
 				(center_x, center_y, width, height) = box.astype("int")
@@ -46,35 +52,71 @@ def detect_human (net, ln, frame, encoder, tracker, time):
 	# Perform Non-maxima suppression to suppress weak and overlapping boxes
 	# It will filter out unnecessary boxes, i.e. box within box
 	# Output will be indexs of useful boxes
-	idxs = cv2.dnn.NMSBoxes(boxes, confidences, MIN_CONF, NMS_THRESH)
+	idxs = cv2.dnn.NMSBoxes(boxes, confidences, min_conf, nms_thresh)
+	if len(idxs) == 0:
+		return None
+	# Keep the detections in their original order
+	idxs = np.sort(np.array(idxs).flatten())
+	return np.array(boxes)[idxs], np.array(centroids)[idxs], np.array(confidences)[idxs]
+
+def _update_tracker(tracker, boxes, centroids, confidences, features, time):
+	detections = [Detection(bbox, score, centroid, feature) for bbox, score, centroid, feature in zip(boxes, confidences, centroids, features)]
+
+	tracker.predict()
+	expired = tracker.update(detections, time)
 
+	# Obtain info from the tracks
 	tracked_bboxes = []
-	expired = []
-	if len(idxs) > 0:
-		del_idxs = []
-		for i in range(len(boxes)):
-			if i not in idxs:
-				del_idxs.append(i)
-		for i in sorted(del_idxs, reverse=True):
-			del boxes[i]
-			del centroids[i]
-			del confidences[i]
+	for track in tracker.tracks:
+		if not track.is_confirmed() or track.time_since_update > 5:
+			continue
+		tracked_bboxes.append(track)
+	return tracked_bboxes, expired
 
-		boxes = np.array(boxes)
-		centroids = np.array(centroids)
-		confidences = np.array(confidences)
-		features = np.array(encoder(frame, boxes))
-		detections = [Detection(bbox, score, centroid, feature) for bbox, score, centroid, feature in zip(boxes, scores, centroids, features)]
+def detect_human (net, ln, frame, encoder, tracker, time, settings=None):
+	settings = settings or default_config()
+	# Get the dimension of the frame
+	(frame_height, frame_width) = frame.shape[:2]
 
-		tracker.predict()
-		expired = tracker.update(detections, time)
+	# Perform forward pass of YOLOv3, output are the boxes and probabilities
+	net.setInput(_frame_blob([frame]))
+	layer_outputs = net.forward(ln)
 
+	people = _person_boxes(layer_outputs, frame_width, frame_height, settings.min_conf, settings.nms_thresh)
+	if people is None:
+		return [[], []]
+	boxes, centroids, confidences = people
+	features = np.array(encoder(frame, boxes))
+	return list(_update_tracker(tracker, boxes, centroids, confidences, features, time))
 
-		# Obtain info from the tracks
-		for track in tracker.tracks:
-				if not track.is_confirmed() or track.time_since_update > 5:
-						continue 
-				tracked_bboxes.append(track)
+def detect_humans_batch(net, ln, frames, encoder, trackers, times, settings=None):
+	# Run a single forward pass for frames coming from different feeds, each
+	# frame is then tracked with the tracker of the feed it belongs to
+	if not frames:
+		return []
+	settings = settings or default_config()
+	net.setInput(_frame_blob(frames))
+	batch_outputs = _split_batch(net.forward(ln), len(frames))
 
-	return [tracked_bboxes, expired]
+	# Collect the person crops of every frame so they are encoded together
+	people = []
+	patches = []
+	for frame, layer_outputs in zip(frames, batch_outputs):
+		(frame_height, frame_width) = frame.shape[:2]
+		found = _person_boxes(layer_outputs, frame_width, frame_height, settings.min_conf, settings.nms_thresh)
+		people.append(found)
+		if found is not None:
+			patches += encoder.extract_patches(frame, found[0])
+	features = encoder.encode_patches(patches) if patches else []
 
+	results = []
+	start = 0
+	for found, tracker, time in zip(people, trackers, times):
+		if found is None:
+			results.append([[], []])
+			continue
+		boxes, centroids, confidences = found
+		end = start + len(boxes)
+		results.append(list(_update_tracker(tracker, boxes, centroids, confidences, features[start:end], time)))
+		start = end
+	return results
@@ -0,0 +1,121 @@
+import numpy as np
+
+def flatten_tracks(tracks):
+	"""Flat x and y arrays and track offsets of a list of [[x, y], ...] tracks"""
+	lengths = np.array([len(track) for track in tracks], dtype=np.int64)
+	offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+	np.cumsum(lengths, out=offsets[1:])
+	if offsets[-1] == 0:
+		return np.zeros(0, dtype=np.float64), np.zeros(0, dtype=np.float64), offsets
+	points = np.concatenate([np.asarray(track, dtype=np.float64).reshape(-1, 2) for track in tracks if len(track)])
+	return points[:, 0], points[:, 1], offsets
+
+def step_tracks(offsets):
+	# Index of the track of every step, a step joins a point to the next one of the same track
+	lengths = np.diff(offsets)
+	steps = np.maximum(lengths - 1, 0)
+	return np.repeat(np.arange(len(lengths)), steps)
+
+def stationary_segments(x, y, offsets, stationary_time, stationary_distance):
+	"""Start and end (exclusive) indexes of the moving segments of every track.
+
+	A point moves when it is further than `stationary_distance` from the point
+	`stationary_time` steps before it. A stationary point ends the current
+	segment and the next one starts with the `stationary_time` points up to
+	it. Tracks with no more than `stationary_time` points have no segment, and
+	a track ending on a stationary point has no final segment.
+	"""
+	lengths = np.diff(offsets)
+	track_of = np.repeat(np.arange(len(lengths)), lengths)
+	local = np.arange(len(x)) - offsets[track_of]
+	# Displacement of every point from the anchor `stationary_time` points before
+	checked = np.nonzero(local >= stationary_time)[0]
+	anchors = checked - stationary_time
+	moving = np.hypot(x[checked] - x[anchors], y[checked] - y[anchors]) > stationary_distance
+	breaks = checked[~moving]
+
+	eligible = np.nonzero(lengths > stationary_time)[0]
+	track_ends = offsets[eligible + 1]
+	starts = np.sort(np.concatenate([offsets[eligible], breaks - stationary_time + 1]))
+	ends = np.sort(np.concatenate([breaks, track_ends]))
+	# Drop the final segment of the tracks whose last point is stationary
+	keep = ~(np.isin(ends, track_ends) & np.isin(ends - 1, breaks))
+	return starts[keep], ends[keep]
+
+def gather_segments(x, y, starts, ends):
+	"""Flat x and y arrays and offsets of the points of the given segments"""
+	lengths = ends - starts
+	offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+	np.cumsum(lengths, out=offsets[1:])
+	index = np.arange(offsets[-1]) + np.repeat(starts - offsets[:-1], lengths)
+	return x[index], y[index], offsets
+
+def step_speeds(x, y, offsets, time_step):
+	"""Speed of every step between consecutive points of the same track"""
+	distances = np.hypot(np.diff(x), np.diff(y))
+	# Drop the steps that jump from the end of a track to the start of the next one
+	inside = np.ones(len(distances), dtype=bool)
+	boundaries = offsets[1:-1] - 1
+	inside[boundaries[(boundaries >= 0) & (boundaries < len(distances))]] = False
+	return distances[inside] / time_step
+
+def kinetic_energies(speeds, decimals=2):
+	"""Energy level of every speed, rounding the speeds first like the energy analysis does"""
+	speeds = np.asarray(speeds, dtype=np.float64)
+	if decimals is not None:
+		speeds = np.round(speeds, decimals)
+	return (0.5 * speeds ** 2).astype(np.int64)
+
+def track_summaries(speeds, energies, offsets, time_step):
+	"""Per track step count, distance, mean and peak speed and mean energy"""
+	tracks = step_tracks(offsets)
+	count = len(offsets) - 1
+	steps = np.bincount(tracks, minlength=count)
+	distance = np.bincount(tracks, weights=speeds * time_step, minlength=count)
+	energy = np.bincount(tracks, weights=energies, minlength=count)
+	max_speed = np.zeros(count)
+	np.maximum.at(max_speed, tracks, speeds)
+	with np.errstate(invalid='ignore', divide='ignore'):
+		mean_speed = np.where(steps > 0, distance / (steps * time_step), 0.0)
+		mean_energy = np.where(steps > 0, energy / steps, 0.0)
+	return {
+		"steps": steps,
+		"distance": distance,
+		"mean_speed": mean_speed,
+		"max_speed": max_speed,
+		"mean_energy": mean_energy
+	}
+
+def energy_distribution(energies, bins=100):
+	"""Histogram and moments of the energy levels"""
+	energies = np.asarray(energies)
+	if len(energies) == 0:
+		return None
+	counts, edges = np.histogram(energies, bins=np.linspace(int(energies.min()), int(energies.max()), bins))
+	mean = energies.mean()
+	std = energies.std()
+	centered = energies - mean
+	with np.errstate(invalid='ignore', divide='ignore'):
+		skew = (centered ** 3).mean() / std ** 3
+		kurtosis = (centered ** 4).mean() / std ** 4 - 3
+	return {
+		"count": len(energies),
+		"mean": mean,
+		"std": std,
+		"min": energies.min(),
+		"max": energies.max(),
+		"skew": skew,
+		"kurtosis": kurtosis,
+		"histogram": (counts, edges)
+	}
+
+def analyze_tracks(x, y, offsets, time_step, decimals=2):
+	"""Speeds and energies of every step, per track summaries and the energy distribution in one pass"""
+	speeds = step_speeds(x, y, offsets, time_step)
+	energies = kinetic_energies(speeds, decimals)
+	return {
+		"speeds": speeds,
+		"energies": energies,
+		"tracks": track_summaries(speeds, energies, offsets, time_step),
+		"distribution": energy_distribution(energies)
+	}
@@ -7,16 +7,11 @@ import time
 from math import ceil
 from scipy.spatial.distance import euclidean
 from tracking import detect_human
-from util import rect_distance, progress, kinetic_energy
+from util import rect_distance, progress
+from trajectory import kinetic_energies
+from live_capture import LatestFrameReader, AdaptiveRate
 from colors import RGB_COLORS
-from config import SHOW_DETECT, DATA_RECORD, RE_CHECK, RE_START_TIME, RE_END_TIME, SD_CHECK, SHOW_VIOLATION_COUNT, SHOW_TRACKING_ID, SOCIAL_DISTANCE,\
-	SHOW_PROCESSING_OUTPUT, YOLO_CONFIG, VIDEO_CONFIG, DATA_RECORD_RATE, ABNORMAL_CHECK, ABNORMAL_ENERGY, ABNORMAL_THRESH, ABNORMAL_MIN_PEOPLE
-from deep_sort import nn_matching
-from deep_sort.detection import Detection
-from deep_sort.tracker import Tracker
-from deep_sort import generate_detections as gdet
-IS_CAM = VIDEO_CONFIG["IS_CAM"]
-HIGH_CAM = VIDEO_CONFIG["HIGH_CAM"]
+from analysis_config import default_config
 
 def _record_movement_data(movement_data_writer, movement):
 	track_id = movement.track_id 
@@ -28,19 +23,95 @@ def _record_movement_data(movement_data_writer, movement):
 	data = [track_id] + [entry_time] + [exit_time] + positions
 	movement_data_writer.writerow(data)
 
-def _record_crowd_data(time, human_count, violate_count, restricted_entry, abnormal_activity, crowd_data_writer):
-	data = [time, human_count, violate_count, int(restricted_entry), int(abnormal_activity)]
+def _record_crowd_data(time, human_count, violate_count, restricted_entry, abnormal_activity, crowd_data_writer, extra=()):
+	data = [time, human_count, violate_count, int(restricted_entry), int(abnormal_activity)] + list(extra)
 	crowd_data_writer.writerow(data)
 
-def _end_video(tracker, frame_count, movement_data_writer):
+def _social_distance_violations(humans_detected, settings):
+	# Initialize set for violate so an individual will be recorded only once
+	violate_set = set()
+	# Initialize list to record violation count for each individual detected
+	violate_count = np.zeros(len(humans_detected))
+	if len(humans_detected) < 2:
+		return violate_set, violate_count
+	for i, track in enumerate(humans_detected):
+		[x, y, w, h] = list(map(int, track.to_tlbr().tolist()))
+		[cx, cy] = list(map(int, track.positions[-1]))
+		# Check the distance between current loop object with the rest of the object in the list
+		for j, track_2 in enumerate(humans_detected[i+1:], start=i+1):
+			if settings.high_cam:
+				[cx_2, cy_2] = list(map(int, track_2.positions[-1]))
+				distance = euclidean((cx, cy), (cx_2, cy_2))
+			else:
+				[x_2, y_2, w_2, h_2] = list(map(int, track_2.to_tlbr().tolist()))
+				distance = rect_distance((x, y, w, h), (x_2, y_2, w_2, h_2))
+			if distance < settings.social_distance:
+				# Distance between detection less than minimum social distance 
+				violate_set.add(i)
+				violate_count[i] += 1
+				violate_set.add(j)
+				violate_count[j] += 1
+	return violate_set, violate_count
+
+def _abnormal_individuals(humans_detected, time_step, settings, calibrator=None):
+	# Initialize list to record id of individual with abnormal energy level
+	abnormal_individual = []
+	if humans_detected:
+		# Compute energy level for each detection from its last step
+		last = np.array([track.positions[-1] for track in humans_detected], dtype=np.float64)
+		previous = np.array([track.positions[-2] for track in humans_detected], dtype=np.float64)
+		speeds = np.hypot(*(last - previous).T) / time_step
+		energies = kinetic_energies(speeds, decimals=None)
+		# Compare with the threshold calibrated on this camera when there is one
+		threshold = settings.abnormal_energy
+		if calibrator:
+			calibrator.update(humans_detected, energies)
+			threshold = calibrator.threshold
+		abnormal_individual = [track.track_id for track, ke in zip(humans_detected, energies) if ke > threshold]
+	abnormal = False
+	if len(humans_detected) > settings.abnormal_min_people:
+		if len(abnormal_individual) / len(humans_detected) > settings.abnormal_thresh:
+			abnormal = True
+	return abnormal_individual, abnormal
+
+def _crowd_status(humans_detected, current_datetime, time_step, calibrator=None, settings=None):
+	# Violation count, restricted entry and abnormal activity of a frame for
+	# pipelines that record crowd data without drawing the output frame
+	settings = settings or default_config()
+	restricted_entry = False
+	if settings.re_check:
+		if (current_datetime.time() > settings.re_start_time) and (current_datetime.time() < settings.re_end_time):
+			restricted_entry = len(humans_detected) > 0
+	violate_set = set()
+	if settings.sd_check:
+		violate_set, _ = _social_distance_violations(humans_detected, settings)
+	abnormal = False
+	if settings.abnormal_check:
+		_, abnormal = _abnormal_individuals(humans_detected, time_step, settings, calibrator)
+	return len(violate_set), restricted_entry, abnormal
+
+def _end_video(tracker, end_time, movement_data_writer):
 	for t in tracker.tracks:
 		if t.is_confirmed():
-			t.exit = frame_count
+			t.exit = end_time
 			_record_movement_data(movement_data_writer, t)
 		
 
-def video_process(cap, frame_size, net, ln, encoder, tracker, movement_data_writer, crowd_data_writer, progress_callback=None, total_frames=None):
+def video_process(cap, frame_size, net, ln, encoder, tracker, movement_data_writer, crowd_data_writer, progress_callback=None, total_frames=None,
+	start_frame=0, start_display_frame=0, checkpointer=None, live_map=None, calibrator=None, frame_callback=None, settings=None):
+	# Settings of this analysis, config.py when none are given
+	settings = settings or default_config()
+	IS_CAM = settings.is_cam
+	SHOW_DETECT = settings.show_detect
+	RE_CHECK = settings.re_check
+	SD_CHECK = settings.sd_check
+	ABNORMAL_CHECK = settings.abnormal_check
+	SHOW_VIOLATION_COUNT = settings.show_violation_count
+	SHOW_TRACKING_ID = settings.show_tracking_id
+	SHOW_PROCESSING_OUTPUT = settings.show_processing_output
+
 	def _calculate_FPS():
+		nonlocal VID_FPS
 		t1 = time.time() - t0
 		VID_FPS = frame_count / t1
 
@@ -49,36 +120,41 @@ def video_process(cap, frame_size, net, ln, encoder, tracker, movement_data_writ
 		DATA_RECORD_FRAME = 1
 		TIME_STEP = 1
 		t0 = time.time()
+		# Always process the freshest frame and drop the stale ones, pacing
+		# the processing to the record rate or the measured frame cost
+		cap = LatestFrameReader(cap)
+		rate = AdaptiveRate(settings.data_record_rate)
 	else:
 		VID_FPS = cap.get(cv2.CAP_PROP_FPS)
-		DATA_RECORD_FRAME = int(VID_FPS / DATA_RECORD_RATE)
+		DATA_RECORD_FRAME = int(VID_FPS / settings.data_record_rate)
 		TIME_STEP = DATA_RECORD_FRAME/VID_FPS
 
-	frame_count = 0
-	display_frame_count = 0
+	# Continue counting from the checkpoint when resuming an analysis
+	frame_count = start_frame
+	display_frame_count = start_display_frame
 	re_warning_timeout = 0
 	sd_warning_timeout = 0
 	ab_warning_timeout = 0
 
 	RE = False
 	ABNORMAL = False
+	run_start = time.time()
 
 	while True:
+		if IS_CAM:
+			rate.start()
 		(ret, frame) = cap.read()
 
 		# Stop the loop when video ends
 		if not ret:
-			_end_video(tracker, frame_count, movement_data_writer)
+			_end_video(tracker, datetime.datetime.now() if IS_CAM else frame_count, movement_data_writer)
+			if checkpointer:
+				checkpointer.finish()
 			if not VID_FPS:
 				_calculate_FPS()
 			break
 
-		# Update frame count
-		if frame_count > 1000000:
-			if not VID_FPS:
-				_calculate_FPS()
-			frame_count = 0
-			display_frame_count = 0
+		# Update frame count, it keeps growing so frame numbers stay unique on long feeds
 		frame_count += 1
 		
 		# Report progress if callback provided
@@ -107,7 +183,11 @@ def video_process(cap, frame_size, net, ln, encoder, tracker, movement_data_writ
 			record_time = frame_count
 		
 		# Run tracking algorithm
-		[humans_detected, expired] = detect_human(net, ln, frame, encoder, tracker, record_time)
+		[humans_detected, expired] = detect_human(net, ln, frame, encoder, tracker, record_time, settings)
+
+		# Update the live heatmap and trails before anything is drawn on the frame
+		if live_map:
+			live_map.update(humans_detected, TIME_STEP, frame)
 
 		# Record movement data
 		for movement in expired:
@@ -116,50 +196,30 @@ def video_process(cap, frame_size, net, ln, encoder, tracker, movement_data_writ
 		# Check for restricted entry
 		if RE_CHECK:
 			RE = False
-			if (current_datetime.time() > RE_START_TIME) and (current_datetime.time() < RE_END_TIME) :
+			if (current_datetime.time() > settings.re_start_time) and (current_datetime.time() < settings.re_end_time) :
 				if len(humans_detected) > 0:
 					RE = True
 			
 		# Initiate video process loop
 		if SHOW_PROCESSING_OUTPUT or SHOW_DETECT or SD_CHECK or RE_CHECK or ABNORMAL_CHECK:
-			# Initialize set for violate so an individual will be recorded only once
-			violate_set = set()
-			# Initialize list to record violation count for each individual detected
-			violate_count = np.zeros(len(humans_detected))
+			# Check for social distance violation
+			if SD_CHECK:
+				violate_set, violate_count = _social_distance_violations(humans_detected, settings)
+			else:
+				violate_set = set()
+				violate_count = np.zeros(len(humans_detected))
 
-			# Initialize list to record id of individual with abnormal energy level
+			# Check for overall abnormal level, trigger notification if exceeds threshold
 			abnormal_individual = []
 			ABNORMAL = False
+			if ABNORMAL_CHECK:
+				abnormal_individual, ABNORMAL = _abnormal_individuals(humans_detected, TIME_STEP, settings, calibrator)
+
 			for i, track in enumerate(humans_detected):
 				# Get object bounding box
 				[x, y, w, h] = list(map(int, track.to_tlbr().tolist()))
-				# Get object centroid
-				[cx, cy] = list(map(int, track.positions[-1]))
 				# Get object id
 				idx = track.track_id
-				# Check for social distance violation
-				if SD_CHECK:
-					if len(humans_detected) >= 2:
-						# Check the distance between current loop object with the rest of the object in the list
-						for j, track_2 in enumerate(humans_detected[i+1:], start=i+1):
-							if HIGH_CAM:
-								[cx_2, cy_2] = list(map(int, track_2.positions[-1]))
-								distance = euclidean((cx, cy), (cx_2, cy_2))
-							else:
-								[x_2, y_2, w_2, h_2] = list(map(int, track_2.to_tlbr().tolist()))
-								distance = rect_distance((x, y, w, h), (x_2, y_2, w_2, h_2))
-							if distance < SOCIAL_DISTANCE:
-								# Distance between detection less than minimum social distance 
-								violate_set.add(i)
-								violate_count[i] += 1
-								violate_set.add(j)
-								violate_count[j] += 1
-
-				# Compute energy level for each detection
-				if ABNORMAL_CHECK:
-					ke = kinetic_energy(track.positions[-1], track.positions[-2], TIME_STEP)
-					if ke > ABNORMAL_ENERGY:
-						abnormal_individual.append(track.track_id)
 
 				# If restrited entry is on, draw red boxes around each detection
 				if RE:
@@ -178,11 +238,7 @@ def video_process(cap, frame_size, net, ln, encoder, tracker, movement_data_writ
 				
 				if SHOW_TRACKING_ID:
 					cv2.putText(frame, str(int(idx)), (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.8, RGB_COLORS["green"], 2)
-			
-			# Check for overall abnormal level, trigger notification if exceeds threshold
-			if len(humans_detected)  > ABNORMAL_MIN_PEOPLE:
-				if len(abnormal_individual) / len(humans_detected) > ABNORMAL_THRESH:
-					ABNORMAL = True
+
 
 		# Place violation count on frames
 		if SD_CHECK:
@@ -240,23 +296,53 @@ def video_process(cap, frame_size, net, ln, encoder, tracker, movement_data_writ
 		# cv2.putText(frame, (current_time), (500, 60), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 3)
 		
 		# Record crowd data to file
-		if DATA_RECORD:
-			_record_crowd_data(record_time, len(humans_detected), len(violate_set), RE, ABNORMAL, crowd_data_writer)
+		if settings.data_record:
+			if IS_CAM:
+				extra = [cap.dropped_count, cap.processed_count]
+			else:
+				extra = []
+			_record_crowd_data(record_time, len(humans_detected), len(violate_set), RE, ABNORMAL, crowd_data_writer, extra)
 
-		# Display video output or processing indicator
-		if SHOW_PROCESSING_OUTPUT:
-			cv2.imshow("Processed Output", frame)
+		# Periodically save the progress of the analysis
+		if checkpointer:
+			checkpointer.maybe_save(frame_count, display_frame_count)
+
+		# Hand the annotated frame to the caller, or display it or a processing indicator
+		if frame_callback:
+			stats = {
+				"frame": frame_count,
+				"total": total_frames,
+				"count": len(humans_detected),
+				"violations": len(violate_set),
+				"restricted": RE,
+				"abnormal": ABNORMAL,
+				"fps": (display_frame_count - start_display_frame) / max(time.time() - run_start, 1e-6)
+			}
+			stop = frame_callback(frame, stats) is False
 		else:
-			progress(display_frame_count)
+			if SHOW_PROCESSING_OUTPUT:
+				cv2.imshow("Processed Output", frame)
+			else:
+				progress(display_frame_count)
+			# Press 'Q' to stop the video display
+			stop = cv2.waitKey(1) & 0xFF == ord('q')
 
-		# Press 'Q' to stop the video display
-		if cv2.waitKey(1) & 0xFF == ord('q'):
+		if stop:
+			# Save the progress so the analysis can be resumed from here
+			if checkpointer:
+				checkpointer.save(frame_count, display_frame_count)
 			# Record the movement when video ends
-			_end_video(tracker, frame_count, movement_data_writer)
+			_end_video(tracker, datetime.datetime.now() if IS_CAM else frame_count, movement_data_writer)
 			# Compute the processing speed
 			if not VID_FPS:
 				_calculate_FPS()
 			break
+
+		if IS_CAM:
+			rate.done()
 	
-	cv2.destroyAllWindows()
+	if IS_CAM:
+		cap.release()
+	if not frame_callback:
+		cv2.destroyAllWindows()
 	return VID_FPS